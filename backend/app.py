@@ -1,5 +1,7 @@
-from flask import Flask, request, jsonify, send_from_directory, session, redirect
-import pickle, uuid, json, os
+from flask import Flask, request, jsonify, send_file, session, redirect, Response, stream_with_context, g
+import pickle, uuid, json, os, sqlite3, threading, time
+from contextlib import contextmanager, nullcontext
+from datetime import date, timedelta
 from flask_cors import CORS
 
 
@@ -8,7 +10,19 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 import sys
 if BASE_DIR not in sys.path:
     sys.path.insert(0, BASE_DIR)
-from db import init_db as db_init, fetch_all as db_fetch_all, replace_all as db_replace_all, DB_FILE
+from db import init_db as db_init, is_empty as db_is_empty, replace_all as db_replace_all, DB_FILE
+from db import pool as db_pool, TABLE_COLUMNS, PET_COLUMNS, encode_cursor, decode_cursor
+from store import EntityStore, open_store
+from bulk import export_ndjson, import_ndjson
+from scheduler import Scheduler
+from blobstore import BLOB_NAME, BlobStore, clean_ext
+from snapshot import exporter_from_env
+from sync import ChangeFeed
+import auth, metrics, profiling
+from llm_batcher import GenerationBatcher
+from response_cache import cache_from_env, make_key as cache_key
+from llm_backend import BACKENDS as LLM_BACKENDS, load_seq2seq, selected_backend as selected_llm_backend, selected_model as selected_llm_model
+from triage_rules import FastPathStats, assess, species_group, symptom_flags, triage_category
 DATA_FILE = os.path.join(BASE_DIR, "data.json")
 UPLOAD_FOLDER = os.path.join(BASE_DIR, "uploads")
 MODEL_DIR = os.path.join(BASE_DIR, "model")
@@ -16,93 +30,138 @@ FRONTEND_DIR = os.path.join(BASE_DIR, "..", "frontend")
 
 # Frontend
 app = Flask(__name__, static_folder=FRONTEND_DIR, static_url_path="")
-app.secret_key = "dev-secret-key"
-CORS(app, supports_credentials=True)
+# Set PETMS_SECRET_KEY in production; every worker must share it
+app.secret_key = os.environ.get("PETMS_SECRET_KEY", "dev-secret-key")
+CORS(app, supports_credentials=True, expose_headers=["X-Next-Cursor"])
 
 
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 app.config["UPLOAD_FOLDER"] = UPLOAD_FOLDER
+# Applied in upload_file only: /bulk/<table> streams imports of any size
+UPLOAD_MAX_BYTES = int(os.environ.get("PETMS_UPLOAD_MAX_MB", 50)) * 1024 * 1024
+# Content-addressed uploads (see blobstore.py)
+blobs = BlobStore(UPLOAD_FOLDER)
+
+# Data access (SQLite by default, see store.open_store)
+store = open_store()
+# Background data.json export
+snapshots = exporter_from_env(DATA_FILE)
+# Other workers' writes, read from the change log (see sync.py)
+changes = ChangeFeed()
+
+
+@app.teardown_appcontext
+def _release_db(exc=None):
+    db_pool.release()
+
+
+# Metrics (GET /metrics) and opt-in profiling (see profiling.py)
+@app.before_request
+def _start_request_metrics():
+    g.metrics_started = metrics.begin_request()
+    header = request.headers.get(profiling.HEADER)
+    if header:
+        g.profile = profiling.start(header, f"{request.method}-{request.path}")
+
+
+@app.after_request
+def _finish_request_metrics(resp):
+    prof = g.pop("profile", None)
+    if prof is not None:
+        name = prof.stop()
+        if name:
+            resp.headers["X-Profile-File"] = name
+    started = g.pop("metrics_started", None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        seconds, queries, db_seconds = metrics.end_request(started, request.method, route, resp.status_code)
+        resp.headers["Server-Timing"] = f'app;dur={seconds * 1000:.2f}, db;dur={db_seconds * 1000:.2f};desc="{queries} queries"'
+    return resp
+
+
+@app.teardown_request
+def _stop_request_profile(exc):
+    # after_request is skipped when a request raises; stop here so cProfile's lock is released
+    prof = g.pop("profile", None)
+    if prof is not None:
+        prof.stop()
+
+
+def prepare_db():
+    """Init SQLite (migrations) and import data.json if the DB is empty.
+
+    Safe to run from several processes; gunicorn.conf.py runs it once in the master.
+    """
+    # Init DB
+    db_init()
 
-# Cache
-users = []
-pets = []
-medical_history = []
-vaccines = []
-weights = []
-appointments = []
+    # Migrate JSON
+    if db_is_empty() and os.path.exists(DATA_FILE):
+        try:
+            with open(DATA_FILE, "r", encoding="utf-8") as f:
+                json_data = json.load(f)
+            for k in ["users", "pets", "medical_history", "vaccines", "weights", "appointments"]:
+                json_data.setdefault(k, [])
+            db_replace_all(json_data)
+            print("Migrated legacy data.json into SQLite:", DB_FILE)
+        except Exception as e:
+            print(f"Error migrating data.json to DB: {e}")
 
 
 def load_data():
-    """Populate in-memory lists from SQLite (and migrate from data.json if present)."""
-    global users, pets, medical_history, vaccines, weights, appointments
-    try:
-        # Init DB
-        db_init()
+    """Prepare the store: init SQLite, migrate data.json if the DB is empty.
 
-        data = db_fetch_all()
-        # Migrate JSON
-        if not any(data.values()) and os.path.exists(DATA_FILE):
-            try:
-                with open(DATA_FILE, "r", encoding="utf-8") as f:
-                    json_data = json.load(f)
-                for k in ["users", "pets", "medical_history", "vaccines", "weights", "appointments"]:
-                    json_data.setdefault(k, [])
-                db_replace_all(json_data)
-                data = db_fetch_all()
-                print("Migrated legacy data.json into SQLite:", DB_FILE)
-            except Exception as e:
-                print(f"Error migrating data.json to DB: {e}")
-
-        users = data.get("users", [])
-        pets = data.get("pets", [])
-        medical_history = data.get("medical_history", [])
-        vaccines = data.get("vaccines", [])
-        weights = data.get("weights", [])
-        appointments = data.get("appointments", [])
+    Called once, by warm() or the first request (see _ensure_data).
+    """
+    global store
+    try:
+        prepare_db()
+        # Follow the change log from here on, then load (replaying overlap is harmless)
+        changes.start()
+        store.load()
     except Exception as e:
         print(f"Error initializing/loading DB: {e}")
-        # JSON fallback
+        # JSON fallback (memory only)
+        data = {}
         if os.path.exists(DATA_FILE):
             try:
                 with open(DATA_FILE, "r", encoding="utf-8") as f:
                     data = json.load(f)
-                    users = data.get("users", [])
-                    pets = data.get("pets", [])
-                    medical_history = data.get("medical_history", [])
-                    vaccines = data.get("vaccines", [])
-                    weights = data.get("weights", [])
-                    appointments = data.get("appointments", [])
             except Exception as e2:
                 print(f"Error loading legacy JSON: {e2}")
-                users, pets, medical_history, vaccines, weights, appointments = [], [], [], [], [], []
-        else:
-            users, pets, medical_history, vaccines, weights, appointments = [], [], [], [], [], []
+                data = {}
+        changes.stop()
+        store = EntityStore()
+        store.load(data)
+        snapshots.source = lambda: nullcontext(store.as_dict())
 
 
 def save_data():
-    data = {
-        "users": users,
-        "pets": pets,
-        "medical_history": medical_history,
-        "vaccines": vaccines,
-        "weights": weights,
-        "appointments": appointments,
-    }
-    # Save DB
-    try:
-        db_init()
-        db_replace_all(data)
-    except Exception as e:
-        print(f"Error saving to DB: {e}")
-    # Save JSON
-    try:
-        with open(DATA_FILE, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=4, ensure_ascii=False)
-    except Exception as e:
-        print(f"Error saving legacy JSON: {e}")
+    """Schedule a background data.json snapshot (DB writes are row-level)."""
+    snapshots.mark_dirty()
+
+
+# Startup: nothing heavy runs at import; warm() (or the first request) does it
+_data_ready = False
+_init_lock = threading.Lock()
 
 
-load_data()
+def _ensure_data():
+    global _data_ready
+    if _data_ready:
+        return
+    with _init_lock:
+        if not _data_ready:
+            load_data()
+            _data_ready = True
+
+
+@app.before_request
+def _lazy_init():
+    if request.endpoint != "ready":
+        _ensure_data()
+        changes.poll()
+
 
 # Models
 
@@ -117,14 +176,36 @@ def _load_model(path: str):
         return None
 
 
-diagnose_vectorizer = _load_model(os.path.join(MODEL_DIR, "diagnose_vectorizer.pkl"))
-diagnose_model = _load_model(os.path.join(MODEL_DIR, "diagnose_model.pkl"))
+_diagnose_models = None
+# mtime/size of the loaded pickles; part of the response cache key so a retrain is a miss
+_diagnose_models_id = ""
+DIAGNOSE_MODEL_FILES = ("diagnose_vectorizer.pkl", "diagnose_model.pkl")
+
+
+def _file_id(path: str) -> str:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return "-"
+    return f"{st.st_mtime_ns:x}.{st.st_size:x}"
+
+
+def get_diagnose_models():
+    """(vectorizer, model) loaded on first use (unpickling imports sklearn); Nones if missing."""
+    global _diagnose_models, _diagnose_models_id
+    if _diagnose_models is None:
+        with _init_lock:
+            if _diagnose_models is None:
+                paths = [os.path.join(MODEL_DIR, f) for f in DIAGNOSE_MODEL_FILES]
+                _diagnose_models_id = "/".join(_file_id(p) for p in paths)
+                _diagnose_models = tuple(_load_model(p) for p in paths)
+    return _diagnose_models
 
 
 # LLM
 _vet_llm_pipe = None
 _vet_llm_device = "cpu"
-import threading
+_vet_llm_backend = None
 _vet_llm_lock = threading.Lock()
 
 
@@ -137,36 +218,17 @@ def get_vet_llm_pipeline():
             return _vet_llm_pipe
         try:
             import torch
-            from transformers import AutoTokenizer, AutoModelForSeq2SeqLM, pipeline
+            from transformers import pipeline
 
-            model_name = os.environ.get(
-                "VET_QA_MODEL", "ahmed807762/flan-t5-base-veterinaryQA_data-v2"
-            )
+            model_name = selected_llm_model()
+            backend = selected_llm_backend()
 
             # Force CPU
             device = "cuda" if (hasattr(torch, "cuda") and torch.cuda.is_available()) else "cpu"
             if os.environ.get("VET_QA_FORCE_CPU", "1") == "1":
                 device = "cpu"
 
-            tok = AutoTokenizer.from_pretrained(model_name)
-
-            def _load_model():
-                try:
-                    return AutoModelForSeq2SeqLM.from_pretrained(
-                        model_name,
-                        dtype=torch.float32,
-                        low_cpu_mem_usage=False,
-                    )
-                except TypeError:
-                    # Older transformers
-                    return AutoModelForSeq2SeqLM.from_pretrained(
-                        model_name,
-                        torch_dtype=torch.float32,
-                        low_cpu_mem_usage=False,
-                    )
-
-            mdl = _load_model()
-            mdl.eval()
+            mdl, tok, device = load_seq2seq(model_name, backend, device)
 
             # Pipeline device
             device_arg = -1 if device == "cpu" else 0
@@ -178,11 +240,12 @@ def get_vet_llm_pipeline():
                 framework="pt",
             )
             print(f"Device set to use {device}")
-            print(f"Loaded veterinary QA model: {model_name}")
+            print(f"Loaded veterinary QA model: {model_name} (backend: {backend})")
 
             # Cache
-            global _vet_llm_device
+            global _vet_llm_device, _vet_llm_backend
             _vet_llm_device = device
+            _vet_llm_backend = backend
             _vet_llm_pipe = _pipe
             return _vet_llm_pipe
         except Exception as e:
@@ -191,11 +254,40 @@ def get_vet_llm_pipeline():
             return None
 
 
+def reset_vet_llm_pipeline(backend=None, model=None):
+    """Drop the loaded pipeline; the next request reloads it (optionally with another
+    VET_QA_BACKEND / VET_QA_MODEL). Affects this process only."""
+    global _vet_llm_pipe, _vet_llm_device, _vet_llm_backend
+    with _vet_llm_lock:
+        if backend:
+            os.environ["VET_QA_BACKEND"] = backend
+        if model:
+            os.environ["VET_QA_MODEL"] = model
+        _vet_llm_pipe = None
+        _vet_llm_device = "cpu"
+        _vet_llm_backend = None
+
+
+# LLM micro-batching (VET_QA_MAX_BATCH=1 disables)
+_vet_llm_batcher = GenerationBatcher(
+    get_vet_llm_pipeline,
+    max_batch=int(os.environ.get("VET_QA_MAX_BATCH", 8)),
+    max_wait=float(os.environ.get("VET_QA_MAX_WAIT_MS", 15)) / 1000.0,
+)
+
+
+def _vet_llm_generate(pipe, prompt, **gen_kwargs):
+    if _vet_llm_batcher.max_batch > 1:
+        return _vet_llm_batcher.generate(prompt, **gen_kwargs)
+    started = time.perf_counter()
+    text = pipe(prompt, **gen_kwargs)[0]["generated_text"].strip()
+    metrics.LLM_GENERATE_SECONDS.observe(time.perf_counter() - started, "direct")
+    return text
+
+
 # LLM warmup
 def _warmup_llm_async():
     try:
-        import threading
-
         def _task():
             pipe = get_vet_llm_pipeline()
             if pipe is None:
@@ -205,34 +297,64 @@ def _warmup_llm_async():
             except Exception:
                 pass
 
-        if os.environ.get("VET_QA_WARMUP", "1") == "1":
-            threading.Thread(target=_task, daemon=True).start()
+        threading.Thread(target=_task, daemon=True).start()
     except Exception:
         pass
 
-_warmup_llm_async()
+
+def warm(llm=None):
+    """Explicit warm phase: data and classifier now, the LLM in the background.
+
+    llm defaults to VET_QA_WARMUP (1). Without warm() each piece loads on first use.
+    """
+    _ensure_data()
+    get_diagnose_models()
+    if llm if llm is not None else os.environ.get("VET_QA_WARMUP", "1") == "1":
+        _warmup_llm_async()
+
+
+def create_app(warm_up=True):
+    """Entry point for servers: the app, warmed unless warm_up=False."""
+    if warm_up:
+        warm()
+    return app
+
+
+@app.get("/ready")
+def ready():
+    """Readiness: 200 once data access is up; per-component status either way."""
+    vectorizer, model = _diagnose_models or (None, None)
+    if _diagnose_models is None:
+        classifier = "pending"
+    else:
+        classifier = "ready" if vectorizer is not None and model is not None else "unavailable"
+    components = {
+        "data": {"status": "ready" if _data_ready else "pending", "store": type(store).__name__},
+        "classifier": {"status": classifier},
+        "llm": {"status": "ready" if _vet_llm_pipe is not None else "pending", "backend": _vet_llm_backend},
+        "sync": changes.stats(),
+    }
+    return jsonify({"ready": _data_ready, "components": components}), (200 if _data_ready else 503)
+
+
+metrics.REGISTRY.gauge("petms_llm_queue_depth", "LLM prompts waiting for a batch.", lambda: _vet_llm_batcher.stats()["queued"])
+metrics.REGISTRY.gauge("petms_snapshot_pending_changes", "Changes not yet exported to data.json.", lambda: snapshots.dirty)
+metrics.REGISTRY.gauge("petms_db_idle_connections", "Pooled SQLite connections not checked out.", lambda: len(db_pool._idle))
+
+
+@app.get("/metrics")
+def get_metrics():
+    """Prometheus text format: request latency, DB, snapshot and LLM timings."""
+    return Response(metrics.REGISTRY.render(), content_type=metrics.CONTENT_TYPE)
 
 
 # Fallback rules
 
 def _species_group(name: str) -> str:
-    s = (name or "").strip().lower()
-    small = {"hamster", "guinea pig", "guinea-pig", "rabbit", "bunny", "gerbil", "rat", "mouse", "mice", "chinchilla"}
-    birds = {"bird", "parrot", "budgie", "budgerigar", "cockatiel", "finch"}
-    reptiles = {"reptile", "turtle", "tortoise", "snake", "lizard", "gecko", "bearded dragon"}
-    if s in small or any(k in s for k in ["hamster", "guinea", "rabbit", "gerbil", "rat", "mouse", "chinch"]):
-        return "small_mammal"
-    if s in birds or any(k in s for k in ["parrot", "budg", "cockatiel", "finch", "bird"]):
-        return "bird"
-    if s in reptiles or any(k in s for k in ["turtle", "tortoise", "snake", "lizard", "gecko", "dragon"]):
-        return "reptile"
-    if any(k in s for k in ["dog", "cat", "canine", "feline"]):
-        return "dogcat"
-    return "other"
-
-
-def _fallback_suggestions(species: str, age, symptoms: str):
-    text = (symptoms or "").lower()
+    return species_group(name)
+
+
+def _fallback_suggestions(species: str, age, symptoms: str, flags=None):
     grp = _species_group(species)
     conds = []
     reds = []
@@ -242,16 +364,18 @@ def _fallback_suggestions(species: str, age, symptoms: str):
         if len(conds) < 3:
             conds.append({"name": name, "reason": reason})
 
-    # Symptom flags
-    lethargy = "letharg" in text or "tired" in text
-    anorexia = "no appetite" in text or "not eating" in text or "reduced appetite" in text or "anorex" in text
-    gi = any(k in text for k in ["vomit", "diarr", "stool", "poop", "constipat"])  # GI signs
-    resp = any(k in text for k in ["cough", "sneez", "wheeze", "breath", "runny nose", "nasal"])  # respiratory
-    pain = any(k in text for k in ["pain", "aggress", "hunch", "limp", "sore", "guard"])  # pain/behaviour
+    # Symptom flags (one pass, see triage_rules)
+    if flags is None:
+        flags = symptom_flags(symptoms)
+    lethargy = "lethargy" in flags
+    anorexia = "anorexia" in flags
+    gi = "gi" in flags  # GI signs
+    resp = "resp" in flags  # respiratory
+    pain = "pain" in flags  # pain/behaviour
     # Wound keywords
-    bleeding = any(k in text for k in ["bleed", "blood"]) and any(k in text for k in ["paw", "pad", "nail", "claw", "dewclaw", "toe", "foot", "leg"])
-    paw_wound = any(k in text for k in ["paw", "pad", "nail", "claw", "dewclaw", "toe"]) and any(k in text for k in ["cut", "wound", "tear", "lacer", "broken", "rip"])
-    lameness = any(k in text for k in ["limp", "non weight", "non-weight", "not weight", "not pressing", "holding up", "favoring", "not putting weight"]) or ("not pressing" in text)
+    bleeding = "blood" in flags and ("paw" in flags or "limb" in flags)
+    paw_wound = "paw" in flags and "wound" in flags
+    lameness = "lameness" in flags
 
     if grp == "small_mammal":
         if anorexia or lethargy or gi:
@@ -357,27 +481,108 @@ def _fallback_suggestions(species: str, age, symptoms: str):
     return {"conditions": conds, "red_flags": reds, "care": care}
 
 
-def _update_entry(collection, item_id, data):
-    for item in collection:
-        if item.get("id") == item_id:
-            item.update(data)
-            save_data()
-            return item
-    return None
+def _insert_entry(table, item):
+    """Persist one new row. Returns (row as stored, None) or (None, error message)."""
+    try:
+        saved = store.insert(table, item)
+    except sqlite3.IntegrityError as e:
+        return None, f"invalid record: {e}"
+    except Exception as e:
+        print(f"Error saving to DB: {e}")
+        return None, "database error"
+    save_data()
+    return saved, None
+
+
+def _update_entry(table, item_id, data):
+    """Update one row. Returns (row or None if missing, None) or (None, error message)."""
+    try:
+        item = store.update(table, item_id, data)
+    except sqlite3.IntegrityError as e:
+        return None, f"invalid record: {e}"
+    except Exception as e:
+        print(f"Error saving to DB: {e}")
+        return None, "database error"
+    if item is not None:
+        save_data()
+    return item, None
 
-def _delete_entry(collection, item_id):
-    for item in list(collection):
-        if item.get("id") == item_id:
-            collection.remove(item)
-            save_data()
-            return True
-    return False
+
+def _delete_entry(table, item_id):
+    try:
+        deleted = store.delete(table, item_id)
+    except Exception as e:
+        print(f"Error saving to DB: {e}")
+        return False
+    if deleted:
+        save_data()
+    return deleted
+
+
+# Never serialised by list endpoints
+HIDDEN_FIELDS = {"users": {"password"}}
+MAX_PAGE_SIZE = 1000
+DEFAULT_PAGE_SIZE = 50
+
+
+def _list_response(table, field=None, value=None, with_pets=False):
+    """List rows with optional ?limit=&cursor=&fields=.
+
+    Without limit/cursor the whole (ordered) list is returned as before. With
+    them the body is one page and X-Next-Cursor carries the key of the next one.
+    with_pets adds each record's petName and ownerId (per-pet tables only).
+    """
+    hidden = HIDDEN_FIELDS.get(table, set())
+    allowed = [c for c in TABLE_COLUMNS[table] if c not in hidden]
+    if with_pets:
+        allowed += PET_COLUMNS
+
+    fields = allowed if hidden else None
+    raw_fields = request.args.get("fields")
+    if raw_fields:
+        fields = [f.strip() for f in raw_fields.split(",") if f.strip()]
+        unknown = [f for f in fields if f not in allowed]
+        if unknown:
+            return jsonify({"error": f"unknown fields: {', '.join(unknown)}"}), 400
+
+    cursor = request.args.get("cursor")
+    limit = request.args.get("limit")
+    after = None
+    try:
+        if limit is not None:
+            limit = int(limit)
+            if not 1 <= limit <= MAX_PAGE_SIZE:
+                raise ValueError
+        elif cursor:
+            limit = DEFAULT_PAGE_SIZE
+        if cursor:
+            after = decode_cursor(cursor)
+    except ValueError:
+        return jsonify({"error": f"limit must be 1-{MAX_PAGE_SIZE} and cursor must come from X-Next-Cursor"}), 400
+
+    if with_pets:
+        rows, next_key = store.page_with_pets(table, limit=limit, after=after, fields=fields)
+    else:
+        rows, next_key = store.page(table, field, value, limit=limit, after=after, fields=fields)
+    resp = jsonify(rows)
+    if next_key is not None:
+        resp.headers["X-Next-Cursor"] = encode_cursor(next_key)
+    return resp
 
 
 def generate_id():
     return str(uuid.uuid4())
 
 
+# Logged-in principal per session (see auth.PrincipalCache)
+principals = auth.PrincipalCache()
+
+
+def current_user():
+    """The session's user without its password, or None; cached, so O(1) per request."""
+    return principals.get(session.get("user_id"), lambda user_id: store.get("users", user_id))
+
+
 # Routes
 
 
@@ -392,10 +597,17 @@ def root():
 
 
 # Auth
+def _strings(data, *fields):
+    """True if each field is absent, null or a string (JSON numbers would break strip/hash)."""
+    return all(data.get(f) is None or isinstance(data.get(f), str) for f in fields)
+
+
 @app.post("/register")
 def register():
     data = request.json or {}
 
+    if not _strings(data, "name", "email", "password"):
+        return jsonify({"error": "name, email and password must be strings"}), 400
     name = (data.get("name") or "").strip()
     email = (data.get("email") or "").strip()
     password = data.get("password") or ""
@@ -403,53 +615,64 @@ def register():
     if not name or not email or not password:
         return jsonify({"error": "Missing fields"}), 400
 
-    for u in users:
-        if u.get("email") == email:
-            return jsonify({"error": "User already exists"}), 400
+    if store.first("users", "email", email) is not None:
+        return jsonify({"error": "User already exists"}), 400
 
     user = {
         "id": generate_id(),
         "name": name,
         "email": email,
-        "password": password,
+        "password": auth.hash_password(password),
         "role": "vet",
     }
 
-    users.append(user)
-    save_data()
+    user, err = _insert_entry("users", user)
+    if err:
+        return jsonify({"error": err}), 400
 
     # Auto login
     session["user_id"] = user["id"]
 
-    return jsonify({"status": "ok", "user": user})
+    return jsonify({"status": "ok", "user": principals.put(user)})
 
 
 @app.post("/login")
 def login():
     data = request.json or {}
+    if not _strings(data, "email", "password"):
+        return jsonify({"status": "error", "message": "email and password must be strings"}), 400
 
     email = (data.get("email") or "").strip()
     password = data.get("password") or ""
 
-    for u in users:
-        if u.get("email") == email and u.get("password") == password:
+    # Email index lookup; owners may share an email, so check each candidate
+    candidates = store.find("users", "email", email) if email else []
+    for u in candidates:
+        ok, rehash = auth.verify_password(password, u.get("password"))
+        if ok:
+            if rehash:
+                _update_entry("users", u["id"], {"password": auth.hash_password(password)})
             session["user_id"] = u["id"]   # valid login
-            return jsonify({"status": "ok", "user": u})
+            return jsonify({"status": "ok", "user": principals.put(u)})
+    if not candidates:
+        auth.reject(password)
 
     return jsonify({"status": "error", "message": "Invalid credentials"}), 401
 
 @app.post("/logout")
 def logout():
+    principals.invalidate(session.get("user_id"))
     session.clear()
     return jsonify({"status": "ok"})
 
 @app.get("/users")
 def get_users():
-    return jsonify(users)
+    return _list_response("users")
 
 @app.get("/me")
 def me():
-    return jsonify({"user_id": session.get("user_id")})
+    user = current_user()
+    return jsonify({"user_id": user["id"] if user else None, "user": user})
 
 
 # Owners
@@ -461,7 +684,7 @@ def add_owner():
         "id": data.get("id") or generate_id(),
         "name": data.get("name", ""),
         "email": data.get("email", ""),
-        "password": "123",  # default
+        "password": None,  # no login until one is set through /owner/edit
         "role": "owner",
         "phone": data.get("phone", ""),
         "address": data.get("address", ""),
@@ -469,51 +692,100 @@ def add_owner():
     if not user["id"] or not user["name"]:
         return jsonify({"error": "ID and Name are required"}), 400
 
-    users.append(user)
-    save_data()
-    return jsonify(user)
+    user, err = _insert_entry("users", user)
+    if err:
+        return jsonify({"error": err}), 400
+    return jsonify(auth.principal(user))
 
 
 @app.post("/owner/edit")
 def edit_owner():
     data = request.json or {}
-    updated = _update_entry(users, data.get("id"), data)
+    if not _strings(data, "password"):
+        return jsonify({"error": "password must be a string"}), 400
+    if data.get("password"):
+        data["password"] = auth.hash_password(data["password"])
+    updated, err = _update_entry("users", data.get("id"), data)
+    if err:
+        return jsonify({"error": err}), 400
     if updated:
-        return jsonify(updated)
+        principals.invalidate(updated["id"])
+        return jsonify(auth.principal(updated))
     return jsonify({"error": "not found"}), 404
 
 
 @app.post("/owner/delete")
 def delete_owner():
     data = request.json or {}
-    if _delete_entry(users, data.get("id")):
+    if _delete_entry("users", data.get("id")):
+        principals.invalidate(data.get("id"))
         return jsonify({"status": "ok"})
     return jsonify({"error": "not found"}), 404
 
 
 # Uploads
 
+def _send_upload(path, name, variant="", immutable=True):
+    """File response with Range support; content-addressed names are cached forever.
+
+    variant tells representations of one upload apart in the ETag ("-thumb");
+    immutable=False makes clients revalidate (a stand-in that may be replaced).
+    """
+    if path is None or not os.path.isfile(path):
+        return jsonify({"error": "not found"}), 404
+    m = BLOB_NAME.match(name)
+    if not m:
+        return send_file(path, conditional=True)
+    if not immutable:
+        resp = send_file(path, conditional=True, etag=m.group(1) + variant, max_age=0)
+        resp.cache_control.no_cache = True
+        return resp
+    resp = send_file(path, conditional=True, etag=m.group(1) + variant, max_age=31536000)
+    resp.cache_control.public = True
+    resp.cache_control.immutable = True
+    return resp
+
+
 @app.get("/uploads/<filename>")
 def uploaded_file(filename):
-    return send_from_directory(app.config["UPLOAD_FOLDER"], filename)
+    return _send_upload(blobs.path(filename), filename)
+
+
+@app.get("/uploads/thumb/<filename>")
+def uploaded_thumb(filename):
+    """Downsized image (made on upload, or now for older files); the original if none can be made."""
+    thumb = blobs.make_thumb(filename)
+    if thumb is None:
+        # Not cached for good: a thumbnail may exist on the next request
+        return _send_upload(blobs.path(filename), filename, immutable=False)
+    return _send_upload(thumb, filename, variant="-thumb")
 
 
 @app.post("/upload")
 def upload_file():
+    request.max_content_length = UPLOAD_MAX_BYTES
     if "file" not in request.files:
         return jsonify({"error": "No file part"}), 400
     file = request.files["file"]
     if file.filename == "":
         return jsonify({"error": "No selected file"}), 400
 
-    ext = file.filename.split(".")[-1]
-    filename = f"{uuid.uuid4()}.{ext}"
-    filepath = os.path.join(app.config["UPLOAD_FOLDER"], filename)
-    file.save(filepath)
+    try:
+        filename, size, deduplicated = blobs.put(file.stream, clean_ext(file.filename))
+    except OSError as e:
+        print(f"Error saving upload: {e}")
+        return jsonify({"error": "could not save file"}), 500
+    has_thumb = blobs.make_thumb(filename) is not None
 
     # Local dev URL
     url = f"http://127.0.0.1:5000/uploads/{filename}"
-    return jsonify({"url": url})
+    return jsonify({
+        "url": url,
+        "thumbUrl": f"http://127.0.0.1:5000/uploads/thumb/{filename}" if has_thumb else url,
+        "sha256": filename.split(".")[0],
+        "size": size,
+        "deduplicated": deduplicated,
+    })
 
 
 # Pets
@@ -532,20 +804,23 @@ def add_pet():
     if not pet["name"] or pet["photo"] is None:
         return jsonify({"error": "Missing fields"}), 400
 
-    pets.append(pet)
-    save_data()
+    pet, err = _insert_entry("pets", pet)
+    if err:
+        return jsonify({"error": err}), 400
     return jsonify(pet)
 
 
 @app.get("/pets")
 def get_pets():
-    return jsonify(pets)
+    return _list_response("pets")
 
 
 @app.post("/edit_pet")
 def edit_pet():
     data = request.json or {}
-    updated = _update_entry(pets, data.get("id"), data)
+    updated, err = _update_entry("pets", data.get("id"), data)
+    if err:
+        return jsonify({"error": err}), 400
     if updated:
         return jsonify(updated)
     return jsonify({"error": "not found"}), 404
@@ -554,7 +829,9 @@ def edit_pet():
 @app.post("/delete_pet")
 def delete_pet():
     data = request.json or {}
-    if _delete_entry(pets, data.get("id")):
+    if _delete_entry("pets", data.get("id")):
+        # Its appointments went with it (ON DELETE CASCADE)
+        scheduler.invalidate()
         return jsonify({"status": "ok"})
     return jsonify({"status": "not_found"}), 404
 
@@ -573,21 +850,50 @@ def add_medical():
         "notes": data.get("notes", ""),
         "attachment": data.get("attachment", ""),
     }
-    medical_history.append(rec)
-    save_data()
+    rec, err = _insert_entry("medical_history", rec)
+    if err:
+        return jsonify({"error": err}), 400
     return jsonify(rec)
 
 
 @app.get("/medical/<pet_id>")
 def get_medical(pet_id):
-    result = [m for m in medical_history if m.get("petId") == pet_id]
-    return jsonify(result)
+    return _list_response("medical_history", "petId", pet_id)
+
+
+@app.get("/search/medical")
+def search_medical():
+    """BM25-ranked search over diagnosis/treatment/notes: ?q=&petId=&ownerId=&limit=&cursor=."""
+    text = (request.args.get("q") or "").strip()
+    if not text:
+        return jsonify({"error": "q is required"}), 400
+    try:
+        limit = int(request.args.get("limit", 20))
+        if not 1 <= limit <= 100:
+            raise ValueError
+        cursor = request.args.get("cursor")
+        offset = int(decode_cursor(cursor)[0]) if cursor else 0
+    except (ValueError, TypeError, IndexError):
+        return jsonify({"error": "limit must be 1-100 and cursor must come from X-Next-Cursor"}), 400
+    try:
+        rows, more = store.search_medical(
+            text, request.args.get("petId"), request.args.get("ownerId"), limit=limit, offset=offset
+        )
+    except sqlite3.OperationalError as e:
+        print(f"Error searching medical history: {e}")
+        return jsonify({"error": "full-text search unavailable"}), 503
+    resp = jsonify(rows)
+    if more:
+        resp.headers["X-Next-Cursor"] = encode_cursor([offset + limit])
+    return resp
 
 
 @app.post("/medical/edit")
 def edit_medical():
     data = request.json or {}
-    updated = _update_entry(medical_history, data.get("id"), data)
+    updated, err = _update_entry("medical_history", data.get("id"), data)
+    if err:
+        return jsonify({"error": err}), 400
     if updated:
         return jsonify(updated)
     return jsonify({"error": "not found"}), 404
@@ -596,7 +902,7 @@ def edit_medical():
 @app.post("/medical/delete")
 def delete_medical():
     data = request.json or {}
-    if _delete_entry(medical_history, data.get("id")):
+    if _delete_entry("medical_history", data.get("id")):
         return jsonify({"status": "ok"})
     return jsonify({"error": "not found"}), 404
 
@@ -613,21 +919,23 @@ def add_vaccine():
         "dateGiven": data.get("dateGiven"),
         "nextDue": data.get("nextDue"),
     }
-    vaccines.append(rec)
-    save_data()
+    rec, err = _insert_entry("vaccines", rec)
+    if err:
+        return jsonify({"error": err}), 400
     return jsonify(rec)
 
 
 @app.get("/vaccine/<pet_id>")
 def get_vaccines(pet_id):
-    result = [v for v in vaccines if v.get("petId") == pet_id]
-    return jsonify(result)
+    return _list_response("vaccines", "petId", pet_id)
 
 
 @app.post("/vaccine/edit")
 def edit_vaccine():
     data = request.json or {}
-    updated = _update_entry(vaccines, data.get("id"), data)
+    updated, err = _update_entry("vaccines", data.get("id"), data)
+    if err:
+        return jsonify({"error": err}), 400
     if updated:
         return jsonify(updated)
     return jsonify({"error": "not found"}), 404
@@ -636,7 +944,7 @@ def edit_vaccine():
 @app.post("/vaccine/delete")
 def delete_vaccine():
     data = request.json or {}
-    if _delete_entry(vaccines, data.get("id")):
+    if _delete_entry("vaccines", data.get("id")):
         return jsonify({"status": "ok"})
     return jsonify({"error": "not found"}), 404
 
@@ -652,21 +960,53 @@ def add_weight():
         "weight": data.get("weight"),
         "date": data.get("date"),
     }
-    weights.append(rec)
-    save_data()
+    rec, err = _insert_entry("weights", rec)
+    if err:
+        return jsonify({"error": err}), 400
     return jsonify(rec)
 
 
 @app.get("/weight/<pet_id>")
 def get_weight(pet_id):
-    result = [w for w in weights if w.get("petId") == pet_id]
+    return _list_response("weights", "petId", pet_id)
+
+
+@app.get("/weight/<pet_id>/analytics")
+def weight_analytics_for_pet(pet_id):
+    """Rolling mean, trend (kg/month), % change and z-score anomalies for one pet."""
+    import weight_analytics
+
+    try:
+        window = min(max(int(request.args.get("window", 3)), 1), 52)
+        z = float(request.args.get("z", 2.5))
+    except ValueError:
+        return jsonify({"error": "window must be an integer and z a number"}), 400
+    series = store.weight_series(pet_id)
+    result = weight_analytics.analyze(((w["date"], w["weight"]) for w in series), window=window, z_threshold=z)
+    result["petId"] = pet_id
     return jsonify(result)
 
 
+@app.get("/analytics/weights")
+def weight_analytics_all():
+    """Trend for every pet in one pass; ?flagged=1 returns only rapid weight loss."""
+    import weight_analytics
+
+    scores = weight_analytics.score_all(store.weight_points())
+    if request.args.get("flagged") == "1":
+        scores = [s for s in scores if s["rapidLoss"]]
+    names = {p["id"]: p.get("name") for p in store.all("pets")}
+    for s in scores:
+        s["petName"] = names.get(s["petId"])
+    return jsonify(scores)
+
+
 @app.post("/weight/edit")
 def edit_weight():
     data = request.json or {}
-    updated = _update_entry(weights, data.get("id"), data)
+    updated, err = _update_entry("weights", data.get("id"), data)
+    if err:
+        return jsonify({"error": err}), 400
     if updated:
         return jsonify(updated)
     return jsonify({"error": "not found"}), 404
@@ -675,16 +1015,80 @@ def edit_weight():
 @app.post("/weight/delete")
 def delete_weight():
     data = request.json or {}
-    if _delete_entry(weights, data.get("id")):
+    if _delete_entry("weights", data.get("id")):
         return jsonify({"status": "ok"})
     return jsonify({"error": "not found"}), 404
 
 
 # Appointments
 
+# Per-vet slot index, rebuilt lazily from the appointments table
+scheduler = Scheduler(lambda: store.all("appointments"))
+
+
+def _apply_changes(changed):
+    """Bring this worker's caches up to date with rows other workers wrote."""
+    store.apply_changes(changed)
+    if changed.get("appointments"):
+        scheduler.refresh(changed["appointments"], lambda appt_id: store.get("appointments", appt_id))
+    for user_id in changed.get("users", ()):
+        principals.invalidate(user_id)
+
+
+def _reset_caches():
+    store.load()
+    scheduler.invalidate()
+    principals.invalidate()
+
+
+changes.subscribe(_apply_changes, _reset_caches)
+
+
+@contextmanager
+def _booking_transaction():
+    """Check-then-book atomically across workers.
+
+    BEGIN IMMEDIATE takes SQLite's write lock, so no other process can book
+    in between; the change log is replayed under it so the slot index is
+    current. The insert/update commits; any early return rolls back.
+    """
+    if isinstance(store, EntityStore):
+        yield
+        return
+    conn = db_pool.get()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        changes.poll(conn, force=True)
+        yield
+    finally:
+        if conn.in_transaction:
+            conn.rollback()
+
+
+def _duration_arg(value):
+    """Minutes as a positive int (None if absent); raises ValueError otherwise."""
+    if value in (None, ""):
+        return None
+    minutes = int(value)
+    if not 0 < minutes <= 24 * 60:
+        raise ValueError
+    return minutes
+
+
+def _booking_conflict(rec):
+    clash = scheduler.conflict(rec)
+    if clash is None:
+        return None
+    return jsonify({"error": "vet already booked at that time", "conflict": clash}), 409
+
+
 @app.post("/appointment/add")
 def add_appointment():
     data = request.json or {}
+    try:
+        duration = _duration_arg(data.get("duration"))
+    except (TypeError, ValueError):
+        return jsonify({"error": "duration must be minutes (1-1440)"}), 400
     rec = {
         "id": generate_id(),
         "petId": data.get("petId"),
@@ -692,37 +1096,273 @@ def add_appointment():
         "time": data.get("time"),
         "reason": data.get("reason"),
         "vetId": data.get("vetId"),
+        "duration": duration,
     }
-    appointments.append(rec)
-    save_data()
+    with scheduler.lock, _booking_transaction():
+        conflict = _booking_conflict(rec)
+        if conflict:
+            return conflict
+        rec, err = _insert_entry("appointments", rec)
+        if err:
+            return jsonify({"error": err}), 400
+        scheduler.add(rec)
     return jsonify(rec)
 
 
 @app.get("/appointment/<pet_id>")
 def get_appointment(pet_id):
-    result = [a for a in appointments if a.get("petId") == pet_id]
-    return jsonify(result)
+    return _list_response("appointments", "petId", pet_id)
 
 
 @app.post("/appointment/edit")
 def edit_appointment():
     data = request.json or {}
-    updated = _update_entry(appointments, data.get("id"), data)
-    if updated:
-        return jsonify(updated)
+    if "duration" in data:
+        try:
+            data["duration"] = _duration_arg(data["duration"])
+        except (TypeError, ValueError):
+            return jsonify({"error": "duration must be minutes (1-1440)"}), 400
+    with scheduler.lock, _booking_transaction():
+        current = store.get("appointments", data.get("id"))
+        if current is None:
+            return jsonify({"error": "not found"}), 404
+        conflict = _booking_conflict({**current, **data, "id": current["id"]})
+        if conflict:
+            return conflict
+        updated, err = _update_entry("appointments", current["id"], data)
+        if err:
+            return jsonify({"error": err}), 400
+        if updated:
+            scheduler.remove(current["id"])
+            scheduler.add(updated)
+            return jsonify(updated)
     return jsonify({"error": "not found"}), 404
 
 
 @app.post("/appointment/delete")
 def delete_appointment():
     data = request.json or {}
-    if _delete_entry(appointments, data.get("id")):
+    if _delete_entry("appointments", data.get("id")):
+        scheduler.remove(data.get("id"))
         return jsonify({"status": "ok"})
     return jsonify({"error": "not found"}), 404
 
 
+@app.get("/schedule/<vet_id>")
+def vet_schedule(vet_id):
+    """A vet's appointments on ?date= (default today), in time order."""
+    day = request.args.get("date") or date.today().isoformat()
+    return jsonify(store.vet_schedule(vet_id, day))
+
+
+@app.get("/schedule/<vet_id>/free")
+def vet_free_slots(vet_id):
+    """Next ?count= free slots of ?duration= minutes from ?date= [?after=HH:MM], within clinic hours."""
+    day = request.args.get("date") or date.today().isoformat()
+    try:
+        date.fromisoformat(day)
+        count = min(max(int(request.args.get("count", 5)), 1), 100)
+        days = min(max(int(request.args.get("days", 14)), 1), 90)
+        duration = _duration_arg(request.args.get("duration"))
+    except ValueError:
+        return jsonify({"error": "date must be YYYY-MM-DD; count, days and duration must be integers"}), 400
+    slots = scheduler.free_slots(vet_id, day, after=request.args.get("after"), count=count, duration=duration, days=days)
+    return jsonify(slots)
+
+
+# Dashboard / aggregates
+
+RECORD_KINDS = {
+    "medical": "medical_history",
+    "vaccine": "vaccines",
+    "weight": "weights",
+    "appointment": "appointments",
+}
+
+
+@app.get("/dashboard/summary")
+def dashboard_summary():
+    """Counts plus upcoming appointments and vaccines due, in one response."""
+    try:
+        days = int(request.args.get("days", 30))
+        limit = int(request.args.get("limit", DEFAULT_PAGE_SIZE))
+    except ValueError:
+        return jsonify({"error": "days and limit must be integers"}), 400
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        return jsonify({"error": f"limit must be 1-{MAX_PAGE_SIZE}"}), 400
+    today = request.args.get("today") or date.today().isoformat()
+    try:
+        until = (date.fromisoformat(today) + timedelta(days=days)).isoformat()
+    except ValueError:
+        return jsonify({"error": "today must be YYYY-MM-DD"}), 400
+    except OverflowError:
+        return jsonify({"error": "days is out of range"}), 400
+    data = store.dashboard(today, until, limit)
+    data.update({"today": today, "until": until})
+    return jsonify(data)
+
+
+MAX_REMINDERS = 1000
+
+
+@app.get("/reminders/vaccines")
+def vaccine_reminders():
+    """Vaccines due within ?days= (default 7) of ?today=, grouped by owner; ?overdue=1 adds past-due ones."""
+    try:
+        days = int(request.args.get("days", 7))
+        limit = min(int(request.args.get("limit", MAX_REMINDERS)), MAX_REMINDERS)
+    except ValueError:
+        return jsonify({"error": "days and limit must be integers"}), 400
+    if limit < 1:
+        return jsonify({"error": "limit must be at least 1"}), 400
+    today = request.args.get("today") or date.today().isoformat()
+    try:
+        until = (date.fromisoformat(today) + timedelta(days=days)).isoformat()
+    except ValueError:
+        return jsonify({"error": "today must be YYYY-MM-DD"}), 400
+    except OverflowError:
+        return jsonify({"error": "days is out of range"}), 400
+    start = "" if request.args.get("overdue") == "1" else today
+
+    owners = {}
+    rows = store.vaccine_reminders(start, until, limit)
+    # Count only when the limit cut the list short
+    total = store.vaccines_due_count(start, until) if len(rows) >= limit else len(rows)
+    # Rows arrive soonest first, so each owner's group (and the group order) is by due date
+    for row in rows:
+        oid = row.get("ownerId")
+        group = owners.get(oid)
+        if group is None:
+            group = owners[oid] = {
+                "ownerId": oid,
+                "ownerName": row.get("ownerName"),
+                "email": row.get("ownerEmail"),
+                "phone": row.get("ownerPhone"),
+                "vaccines": [],
+            }
+        group["vaccines"].append({
+            "id": row["id"],
+            "petId": row["petId"],
+            "petName": row.get("petName"),
+            "vaccineName": row.get("vaccineName"),
+            "nextDue": row.get("nextDue"),
+            "dueDate": row["dueDate"],
+            "overdue": row["dueDate"] < today,
+        })
+    return jsonify({"today": today, "until": until, "total": total, "returned": len(rows), "owners": list(owners.values())})
+
+
+@app.get("/records/<kind>")
+def list_records(kind):
+    """All medical/vaccine/weight/appointment rows with pet names (replaces per-pet fan-out).
+
+    Ordered by date; pages with ?limit=&cursor=&fields= like the per-pet lists.
+    """
+    table = RECORD_KINDS.get(kind)
+    if table is None:
+        return jsonify({"error": "unknown record type"}), 404
+    return _list_response(table, with_pets=True)
+
+
+# Bulk NDJSON (one JSON object per line)
+@app.get("/bulk/<table>")
+def bulk_export(table):
+    """Stream a whole table as NDJSON; passwords are never exported over HTTP."""
+    if table not in TABLE_COLUMNS:
+        return jsonify({"error": "unknown table"}), 404
+    if isinstance(store, EntityStore):
+        return jsonify({"error": "database unavailable"}), 503
+    lines = export_ndjson(table, exclude=HIDDEN_FIELDS.get(table, ()))
+    return Response(
+        stream_with_context(lines),
+        mimetype="application/x-ndjson",
+        headers={"Content-Disposition": f"attachment; filename={table}.ndjson"},
+    )
+
+
+@app.post("/bulk/<table>")
+def bulk_import(table):
+    """Upsert NDJSON from the request body in chunked transactions."""
+    if table not in TABLE_COLUMNS:
+        return jsonify({"error": "unknown table"}), 404
+    if isinstance(store, EntityStore):
+        return jsonify({"error": "database unavailable"}), 503
+    try:
+        chunk_size = int(request.args.get("chunk", 1000))
+    except ValueError:
+        return jsonify({"error": "chunk must be an integer"}), 400
+    try:
+        stats = import_ndjson(table, request.stream, conn=db_pool.get(), chunk_size=max(1, chunk_size))
+    except sqlite3.Error as e:
+        print(f"Error importing {table}: {e}")
+        return jsonify({"error": f"import failed: {e}"}), 400
+    if stats["upserted"]:
+        # Refresh the memory copy (no-op for the SQLite store)
+        store.load()
+        scheduler.invalidate()
+        if table == "users":
+            principals.invalidate()
+        save_data()
+    return jsonify(stats)
+
+
 # AI
 
+# Diagnosis response cache (VET_QA_CACHE=0 disables)
+_response_cache = cache_from_env()
+
+
+DIAGNOSIS_NOTES = {
+    "Gastroenteritis": "Common signs include vomiting/diarrhea. Watch hydration. If severe, persistent, or there is blood, consult a vet urgently.",
+    "Upper Respiratory Infection": "Coughing/sneezing can be mild or contagious. If breathing is difficult, fever is high, or symptoms persist, consult a vet.",
+    "Ear Infection": "Ear pain/odor/discharge often needs proper treatment. Avoid putting random drops; consult a vet for the right medication.",
+    "Fleas / Skin Irritation": "Itching and hair loss can be fleas or allergies. Use safe flea control and check bedding. If skin is red/raw, consult a vet.",
+    "Arthritis / Joint Pain": "Stiffness/limping can indicate joint pain. Avoid heavy exercise. If limping lasts >24-48h, consult a vet.",
+    "Diabetes Warning": "Excess thirst/urination and weight loss can be serious. A vet visit for blood/urine tests is recommended.",
+}
+
+DIAGNOSE_DISCLAIMER = "Educational only — not a diagnosis. For urgent symptoms (breathing trouble, seizures, collapse, severe pain, continuous vomiting/diarrhea, blood), seek veterinary care immediately."
+
+
+def _case_text(species, age, symptoms):
+    parts = []
+    if species:
+        parts.append(species)
+    if age is not None:
+        parts.append(f"age {age}")
+    parts.append(symptoms)
+    return " ".join(parts)
+
+
+def _classify_texts(texts, k=3):
+    """One sparse transform + one predict_proba for all texts; top-k via argpartition."""
+    import numpy as np
+
+    diagnose_vectorizer, diagnose_model = get_diagnose_models()
+    X = diagnose_vectorizer.transform(texts)
+    P = np.asarray(diagnose_model.predict_proba(X))
+    classes = diagnose_model.classes_
+    k = max(1, min(k, P.shape[1]))
+
+    idx = np.argpartition(-P, k - 1, axis=1)[:, :k]
+    rows = np.arange(P.shape[0])[:, None]
+    order = np.argsort(-P[rows, idx], axis=1, kind="stable")
+    idx = idx[rows, order]
+    top_p = P[rows, idx]
+
+    results = []
+    for labels_i, probs_i in zip(idx.tolist(), top_p.tolist()):
+        topk = [{"label": str(classes[j]), "prob": float(p)} for j, p in zip(labels_i, probs_i)]
+        diagnosis = topk[0]["label"]
+        results.append({
+            "diagnosis": diagnosis,
+            "confidence": topk[0]["prob"],
+            "top": topk,
+            "note": DIAGNOSIS_NOTES.get(diagnosis, ""),
+        })
+    return results
+
+
 @app.route("/ai/diagnose", methods=["POST"])
 def ai_diagnose():
     """Very lightweight symptom -> condition estimator.
@@ -730,7 +1370,7 @@ def ai_diagnose():
     IMPORTANT: This is NOT a veterinary diagnosis. It is an educational estimate
     based on a small synthetic training set.
     """
-    if diagnose_model is None or diagnose_vectorizer is None:
+    if None in get_diagnose_models():
         return jsonify({"error": "diagnosis model not loaded. Run: python3 train_models.py"}), 400
 
     data = request.json or {}
@@ -741,131 +1381,164 @@ def ai_diagnose():
     if not symptoms:
         return jsonify({"error": "symptoms is required"}), 400
 
-    # Build text
-    parts = []
-    if species:
-        parts.append(species)
-    if age is not None:
-        parts.append(f"age {age}")
-    parts.append(symptoms)
-    text = " ".join(parts)
-
-    X = diagnose_vectorizer.transform([text])
-    probs = diagnose_model.predict_proba(X)[0]
-    classes = list(diagnose_model.classes_)
-
-    # Top 3
-    top_idx = sorted(range(len(probs)), key=lambda i: float(probs[i]), reverse=True)[:3]
-    top3 = [{"label": classes[i], "prob": float(probs[i])} for i in top_idx]
-
-    best_i = top_idx[0]
-    diagnosis = classes[best_i]
-    confidence = float(probs[best_i])
-
-    notes = {
-        "Gastroenteritis": "Common signs include vomiting/diarrhea. Watch hydration. If severe, persistent, or there is blood, consult a vet urgently.",
-        "Upper Respiratory Infection": "Coughing/sneezing can be mild or contagious. If breathing is difficult, fever is high, or symptoms persist, consult a vet.",
-        "Ear Infection": "Ear pain/odor/discharge often needs proper treatment. Avoid putting random drops; consult a vet for the right medication.",
-        "Fleas / Skin Irritation": "Itching and hair loss can be fleas or allergies. Use safe flea control and check bedding. If skin is red/raw, consult a vet.",
-        "Arthritis / Joint Pain": "Stiffness/limping can indicate joint pain. Avoid heavy exercise. If limping lasts >24-48h, consult a vet.",
-        "Diabetes Warning": "Excess thirst/urination and weight loss can be serious. A vet visit for blood/urine tests is recommended.",
+    key = cache_key(species, age, symptoms, "classifier", {"model": _diagnose_models_id}) if _response_cache is not None else None
+    if key is not None:
+        hit = _response_cache.get(key)
+        if hit is not None:
+            return jsonify(hit)
+
+    result = _classify_texts([_case_text(species, age, symptoms)])[0]
+    # Response shape predates the batch endpoint's top_k
+    result["top3"] = result.pop("top")
+    result["disclaimer"] = DIAGNOSE_DISCLAIMER
+    if key is not None:
+        _response_cache.set(key, result)
+    return jsonify(result)
+
+
+@app.post("/ai/diagnose_batch")
+def ai_diagnose_batch():
+    """Classify many cases in one request.
+
+    Body: {"cases": [{"symptoms", "species", "age"}, ...], "top_k": 3}.
+    Each result lists its top_k labels under "top"; results keep the input
+    order and cases without symptoms get an "error" entry.
+    """
+    if None in get_diagnose_models():
+        return jsonify({"error": "diagnosis model not loaded. Run: python3 train_models.py"}), 400
+
+    data = request.json or {}
+    cases = data.get("cases")
+    if not isinstance(cases, list) or not cases:
+        return jsonify({"error": "cases must be a non-empty list"}), 400
+    max_batch = int(os.environ.get("VET_DIAG_MAX_BATCH", 1000))
+    if len(cases) > max_batch:
+        return jsonify({"error": f"too many cases (max {max_batch})"}), 400
+    try:
+        top_k = int(data.get("top_k", 3))
+    except (TypeError, ValueError):
+        return jsonify({"error": "top_k must be an integer"}), 400
+
+    results = [None] * len(cases)
+    texts, positions = [], []
+    for i, case in enumerate(cases):
+        case = case if isinstance(case, dict) else {}
+        symptoms = (case.get("symptoms") or "").strip()
+        if not symptoms:
+            results[i] = {"error": "symptoms is required"}
+            continue
+        species = (case.get("species") or "").strip()
+        texts.append(_case_text(species, case.get("age", None), symptoms))
+        positions.append(i)
+
+    if texts:
+        for i, res in zip(positions, _classify_texts(texts, top_k)):
+            results[i] = res
+
+    return jsonify({"results": results, "disclaimer": DIAGNOSE_DISCLAIMER})
+
+
+def _llm_only_gen_kwargs():
+    return {
+        "max_new_tokens": int(os.environ.get("VET_QA_MAX_TOKENS", 200)),
+        "do_sample": True,
+        "temperature": 0.8,
+        "top_p": 0.95,
+        "repetition_penalty": 1.2,
+        "early_stopping": True,
     }
 
-    return jsonify({
-        "diagnosis": diagnosis,
-        "confidence": confidence,
-        "top3": top3,
-        "note": notes.get(diagnosis, ""),
-        "disclaimer": "Educational only — not a diagnosis. For urgent symptoms (breathing trouble, seizures, collapse, severe pain, continuous vomiting/diarrhea, blood), seek veterinary care immediately."
-    })
 
+def _json_gen_kwargs():
+    sampling = os.environ.get("VET_QA_SAMPLING", "0") == "1"
+    gen_kwargs = {
+        "max_new_tokens": int(os.environ.get("VET_QA_MAX_TOKENS", 220)),
+        "no_repeat_ngram_size": int(os.environ.get("VET_QA_NGRAM", 5)),
+        "repetition_penalty": float(os.environ.get("VET_QA_REP", 1.2)),
+        "early_stopping": True,
+    }
+    if sampling:
+        gen_kwargs.update({
+            "do_sample": True,
+            "temperature": float(os.environ.get("VET_QA_TEMP", 0.5)),
+            "top_p": float(os.environ.get("VET_QA_TOP_P", 0.9)),
+            "top_k": int(os.environ.get("VET_QA_TOP_K", 50)),
+        })
+    else:
+        gen_kwargs.update({
+            "do_sample": False,
+            "num_beams": int(os.environ.get("VET_QA_BEAMS", 4)),
+            "length_penalty": float(os.environ.get("VET_QA_LEN_PEN", 1.0)),
+        })
+    return gen_kwargs
 
-@app.post("/ai/diagnose_llm")
-def ai_diagnose_llm():
-    """Diagnosis-style answer using a veterinary QA LLM (FLAN-T5 base fine-tune).
 
-    Returns a concise text answer. This is strictly educational — not medical advice.
-    """
-    body = request.json or {}
-    symptoms = (body.get("symptoms") or "").strip()
-    species = (body.get("species") or "").strip()
-    age = body.get("age", None)
-    mode = (body.get("mode") or "").strip().lower()  # llm_only
-    fallback_enabled = os.environ.get("VET_QA_FALLBACK", "1") == "1"
-    if mode == "llm_only":
-        fallback_enabled = False
+def _cacheable(gen_kwargs):
+    # Sampled output is not reproducible; cache it only when asked to
+    if _response_cache is None:
+        return False
+    return not gen_kwargs.get("do_sample") or os.environ.get("VET_QA_CACHE_SAMPLING", "0") == "1"
 
-    if not symptoms:
-        return jsonify({"error": "symptoms is required"}), 400
 
-    pipe = get_vet_llm_pipeline()
-    if pipe is None:
-        return (
-            jsonify(
-                {
-                    "error": "veterinary QA model not available",
-                    "hint": "Install transformers+torch then restart: pip install transformers torch",
-                }
-            ),
-            500,
-        )
+@app.post("/ai/llm/reload")
+def ai_llm_reload():
+    """Switch the vet QA backend/model without a restart (logged-in vets; this worker only)."""
+    user = current_user()
+    if user is None or user.get("role") != "vet":
+        return jsonify({"error": "vet login required"}), 403
+    data = request.json or {}
+    backend, model = data.get("backend"), data.get("model")
+    if backend is not None and backend not in LLM_BACKENDS:
+        return jsonify({"error": f"backend must be one of {', '.join(LLM_BACKENDS)}"}), 400
+    if model is not None and (not isinstance(model, str) or not model.strip()):
+        return jsonify({"error": "model must be a model id"}), 400
+    reset_vet_llm_pipeline(backend, model and model.strip())
+    _warmup_llm_async()
+    return jsonify({"status": "reloading", "backend": selected_llm_backend(), "model": selected_llm_model()})
 
-    parts = []
-    if species:
-        parts.append(species)
-    if age is not None:
-        parts.append(f"age {age}")
-    parts.append(symptoms)
-    ctx = ", ".join(parts)
 
-    # Triage category
-    def _triage_category(txt: str) -> str:
-        t = (txt or "").lower()
-        if any(k in t for k in ["bleed", "blood", "cut", "wound", "lacer", "nail", "claw", "paw", "pad", "limp", "non weight", "not pressing", "holding up"]):
-            return "wound/trauma"
-        if any(k in t for k in ["vomit", "diarr", "stool", "poop", "constipat", "nausea"]):
-            return "gastrointestinal"
-        if any(k in t for k in ["cough", "sneez", "wheeze", "breath", "nasal", "runny nose"]):
-            return "respiratory"
-        if any(k in t for k in ["itch", "rash", "skin", "flea", "hot spot", "wound"]):
-            return "dermatologic"
-        if any(k in t for k in ["seizure", "collapse", "stagger", "head tilt"]):
-            return "neurologic"
-        return "general"
-
-    category = _triage_category(symptoms)
+@app.get("/ai/cache_stats")
+def ai_cache_stats():
+    if _response_cache is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **_response_cache.stats()})
 
-    # LLM-only response
-    if mode == "llm_only":
-        # Prompt
-        bullet_prompt = (
-            f"The likely medical causes for a {age} year old {species} with {symptoms} are:\n"
-        )
 
-        gen_kwargs = {
-            "max_new_tokens": int(os.environ.get("VET_QA_MAX_TOKENS", 200)),
-            "do_sample": True,
-            "temperature": 0.8,
-            "top_p": 0.95,
-            "repetition_penalty": 1.2,
-            "early_stopping": True,
-        }
+# Triage category
+def _triage_category(txt: str) -> str:
+    return triage_category(symptom_flags(txt))
 
-        try:
-            out = pipe(bullet_prompt, **gen_kwargs)[0]["generated_text"].strip()
 
-        except Exception as e:
-            return jsonify({"error": f"generation failed: {e}"}), 500
+# Rule fast path (VET_QA_FASTPATH=0 disables)
+_fastpath_stats = FastPathStats()
 
-        return jsonify({
-            "answer": out,
-            "source": "llm_fallback",
-            "disclaimer": "Educational only — not a diagnosis. For urgent symptoms (breathing trouble, seizures, collapse, severe pain, continuous vomiting/diarrhea, blood), seek veterinary care immediately.",
-            "model": os.environ.get("VET_QA_MODEL", "ahmed807762/flan-t5-base-veterinaryQA_data-v2"),
-        })
 
-    # JSON response
-    prompt = (
+def _rule_fast_path(species, age, symptoms, fallback_enabled):
+    """Answer confident rule matches without the LLM; None when the model is needed."""
+    if not fallback_enabled or os.environ.get("VET_QA_FASTPATH", "1") != "1":
+        return None
+    verdict = assess(species, symptoms)
+    absorbed = verdict["confidence"] >= float(os.environ.get("VET_QA_FASTPATH_MIN", 0.9))
+    _fastpath_stats.record(absorbed, verdict["rule"])
+    if not absorbed:
+        return None
+    fb = _fallback_suggestions(species, age, symptoms, flags=frozenset(verdict["flags"]))
+    resp = _normalize_llm_json(fb, None, species, age, symptoms, fallback_enabled)
+    resp.update({"source": "rules", "confidence": verdict["confidence"], "category": verdict["category"]})
+    return resp
+
+
+@app.get("/ai/fastpath_stats")
+def ai_fastpath_stats():
+    return jsonify(_fastpath_stats.snapshot())
+
+
+def _llm_only_prompt(species, age, symptoms):
+    return f"The likely medical causes for a {age} year old {species} with {symptoms} are:\n"
+
+
+def _json_prompt(species, age, symptoms, category):
+    return (
         "You are a veterinary assistant. Analyze the case and reply with JSON ONLY.\n"
         f"Case -> species: {species or 'Unknown'}, age: {age if age is not None else 'Unknown'}, symptoms: {symptoms}.\n"
         f"Category hint: {category}. Prioritize guidance for this category.\n"
@@ -881,66 +1554,55 @@ def ai_diagnose_llm():
         "- No extra text, headers, or explanations — JSON ONLY.\n"
     )
 
+
+def _alt_json_prompt(species, age, symptoms):
+    parts = []
+    if species:
+        parts.append(species)
+    if age is not None:
+        parts.append(f"age {age}")
+    parts.append(symptoms)
+    ctx = ", ".join(parts)
+    return (
+        "Vet assistant concise JSON. Case: "
+        f"{ctx}. Keys: conditions(3x{{name,reason}}), red_flags[], care[]."
+    )
+
+
+def _try_parse(s: str):
     try:
-        import json as _json
-
-        # JSON decoding
-        sampling = os.environ.get("VET_QA_SAMPLING", "0") == "1"
-        gen_kwargs = {
-            "max_new_tokens": int(os.environ.get("VET_QA_MAX_TOKENS", 220)),
-            "no_repeat_ngram_size": int(os.environ.get("VET_QA_NGRAM", 5)),
-            "repetition_penalty": float(os.environ.get("VET_QA_REP", 1.2)),
-            "early_stopping": True,
-        }
-        if sampling:
-            gen_kwargs.update({
-                "do_sample": True,
-                "temperature": float(os.environ.get("VET_QA_TEMP", 0.5)),
-                "top_p": float(os.environ.get("VET_QA_TOP_P", 0.9)),
-                "top_k": int(os.environ.get("VET_QA_TOP_K", 50)),
-            })
-        else:
-            gen_kwargs.update({
-                "do_sample": False,
-                "num_beams": int(os.environ.get("VET_QA_BEAMS", 4)),
-                "length_penalty": float(os.environ.get("VET_QA_LEN_PEN", 1.0)),
-            })
-
-        raw = pipe(prompt, **gen_kwargs)[0]["generated_text"].strip()
-        
-        def _try_parse(s: str):
+        return json.loads(s)
+    except Exception:
+        import re as _re
+        m = _re.search(r"\{[\s\S]*\}", s)
+        if m:
             try:
-                return _json.loads(s)
+                return json.loads(m.group(0))
             except Exception:
-                import re as _re
-                m = _re.search(r"\{[\s\S]*\}", s)
-                if m:
-                    try:
-                        return _json.loads(m.group(0))
-                    except Exception:
-                        return None
                 return None
+        return None
 
-        js = _try_parse(raw)
-        if js is None:
-            # Fallback prompt
-            alt_prompt = (
-                "Vet assistant concise JSON. Case: "
-                f"{ctx}. Keys: conditions(3x{{name,reason}}), red_flags[], care[]."
-            )
-            raw = pipe(alt_prompt, **gen_kwargs)[0]["generated_text"].strip()
-            js = _try_parse(raw)
+
+def _llm_only_response(out):
+    return {
+        "answer": out,
+        "source": "llm_fallback",
+        "disclaimer": "Educational only — not a diagnosis. For urgent symptoms (breathing trouble, seizures, collapse, severe pain, continuous vomiting/diarrhea, blood), seek veterinary care immediately.",
+        "model": selected_llm_model(),
+    }
+
+
+def _normalize_llm_json(js, raw, species, age, symptoms, fallback_enabled):
+    """Parsed model output (or None) -> the /ai/diagnose_llm response body."""
+    source = "llm"
+    if js is None and fallback_enabled:
+        # Rule fallback
+        fb = _fallback_suggestions(species, age, symptoms)
+        js = {**fb, "raw": raw}
+        source = "fallback"
+    elif js is None:
+        js = {"conditions": [], "red_flags": [], "care": [], "raw": raw}
         source = "llm"
-        if js is None and fallback_enabled:
-            # Rule fallback
-            fb = _fallback_suggestions(species, age, symptoms)
-            js = {**fb, "raw": raw}
-            source = "fallback"
-        elif js is None:
-            js = {"conditions": [], "red_flags": [], "care": [], "raw": raw}
-            source = "llm"
-    except Exception as e:
-        return jsonify({"error": f"generation failed: {e}"}), 500
 
     # Normalize
     def _to_str(x):
@@ -968,15 +1630,191 @@ def ai_diagnose_llm():
         care = fb.get("care", [])
         source = "fallback"
 
-    return jsonify({
+    return {
         "conditions": norm_conds,
         "red_flags": red_flags[:6],
         "care": care[:6],
         "source": source,
         "raw": js.get("raw", None),
         "disclaimer": "Educational only — not a diagnosis. For urgent symptoms (breathing trouble, seizures, collapse, severe pain, continuous vomiting/diarrhea, blood), seek veterinary care immediately.",
-        "model": os.environ.get("VET_QA_MODEL", "ahmed807762/flan-t5-base-veterinaryQA_data-v2"),
-    })
+        "model": selected_llm_model(),
+    }
+
+
+def _llm_request_args(body):
+    symptoms = (body.get("symptoms") or "").strip()
+    species = (body.get("species") or "").strip()
+    age = body.get("age", None)
+    mode = (body.get("mode") or "").strip().lower()  # llm_only
+    fallback_enabled = os.environ.get("VET_QA_FALLBACK", "1") == "1"
+    if mode == "llm_only":
+        fallback_enabled = False
+    return symptoms, species, age, mode, fallback_enabled
+
+
+def _llm_cache_key(species, age, symptoms, mode, gen_kwargs, fallback_enabled):
+    extra = {**gen_kwargs, "fallback": fallback_enabled, "backend": selected_llm_backend(), "model": selected_llm_model()}
+    return cache_key(species, age, symptoms, mode or "json", extra)
+
+
+_LLM_UNAVAILABLE = {
+    "error": "veterinary QA model not available",
+    "hint": "Install transformers+torch then restart: pip install transformers torch",
+}
+
+
+@app.post("/ai/diagnose_llm")
+def ai_diagnose_llm():
+    """Diagnosis-style answer using a veterinary QA LLM (FLAN-T5 base fine-tune).
+
+    Returns a concise text answer. This is strictly educational — not medical advice.
+    """
+    body = request.json or {}
+    symptoms, species, age, mode, fallback_enabled = _llm_request_args(body)
+
+    if not symptoms:
+        return jsonify({"error": "symptoms is required"}), 400
+
+    fast = _rule_fast_path(species, age, symptoms, fallback_enabled)
+    if fast is not None:
+        return jsonify(fast)
+
+    gen_kwargs = _llm_only_gen_kwargs() if mode == "llm_only" else _json_gen_kwargs()
+    key = None
+    if _cacheable(gen_kwargs):
+        key = _llm_cache_key(species, age, symptoms, mode, gen_kwargs, fallback_enabled)
+        hit = _response_cache.get(key)
+        if hit is not None:
+            return jsonify(hit)
+
+    pipe = get_vet_llm_pipeline()
+    if pipe is None:
+        return jsonify(_LLM_UNAVAILABLE), 500
+
+    # LLM-only response
+    if mode == "llm_only":
+        try:
+            out = _vet_llm_generate(pipe, _llm_only_prompt(species, age, symptoms), **gen_kwargs)
+        except Exception as e:
+            return jsonify({"error": f"generation failed: {e}"}), 500
+
+        resp = _llm_only_response(out)
+        if key is not None:
+            _response_cache.set(key, resp)
+        return jsonify(resp)
+
+    # JSON response
+    prompt = _json_prompt(species, age, symptoms, _triage_category(symptoms))
+    try:
+        raw = _vet_llm_generate(pipe, prompt, **gen_kwargs)
+        js = _try_parse(raw)
+        if js is None:
+            # Fallback prompt
+            raw = _vet_llm_generate(pipe, _alt_json_prompt(species, age, symptoms), **gen_kwargs)
+            js = _try_parse(raw)
+    except Exception as e:
+        return jsonify({"error": f"generation failed: {e}"}), 500
+
+    resp = _normalize_llm_json(js, raw, species, age, symptoms, fallback_enabled)
+    if key is not None:
+        _response_cache.set(key, resp)
+    return jsonify(resp)
+
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _stream_tokens(pipe, prompt, gen_kwargs):
+    """Run generate() on a worker thread and yield decoded text pieces as they arrive."""
+    from transformers import TextIteratorStreamer
+
+    tok = pipe.tokenizer
+    inputs = tok(prompt, return_tensors="pt").to(pipe.model.device)
+    streamer = TextIteratorStreamer(tok, skip_prompt=True, skip_special_tokens=True, timeout=120)
+    errors = []
+
+    def _run():
+        started = time.perf_counter()
+        try:
+            pipe.model.generate(**inputs, streamer=streamer, **gen_kwargs)
+            metrics.LLM_GENERATE_SECONDS.observe(time.perf_counter() - started, "stream")
+        except Exception as e:
+            errors.append(e)
+            streamer.end()
+
+    threading.Thread(target=_run, daemon=True).start()
+    for piece in streamer:
+        if piece:
+            yield piece
+    if errors:
+        raise errors[0]
+
+
+@app.post("/ai/diagnose_llm/stream")
+def ai_diagnose_llm_stream():
+    """Server-Sent Events variant of /ai/diagnose_llm.
+
+    Emits `token` events while generating, then one `result` event carrying the
+    same body /ai/diagnose_llm would return (or an `error` event). Streaming
+    uses greedy/sampling decoding; beam search cannot stream.
+    """
+    body = request.json or {}
+    symptoms, species, age, mode, fallback_enabled = _llm_request_args(body)
+
+    if not symptoms:
+        return jsonify({"error": "symptoms is required"}), 400
+
+    fast = _rule_fast_path(species, age, symptoms, fallback_enabled)
+    if fast is not None:
+        return Response(_sse("result", fast), mimetype="text/event-stream")
+
+    if mode == "llm_only":
+        gen_kwargs = _llm_only_gen_kwargs()
+    else:
+        gen_kwargs = _json_gen_kwargs()
+        if not gen_kwargs.get("do_sample"):
+            # Greedy instead of beams
+            gen_kwargs.update({"num_beams": 1})
+            gen_kwargs.pop("length_penalty", None)
+    gen_kwargs.pop("early_stopping", None)
+
+    key = None
+    if _cacheable(gen_kwargs):
+        key = _llm_cache_key(species, age, symptoms, mode + ":stream", gen_kwargs, fallback_enabled)
+        hit = _response_cache.get(key)
+        if hit is not None:
+            return Response(_sse("result", hit), mimetype="text/event-stream")
+
+    pipe = get_vet_llm_pipeline()
+    if pipe is None:
+        return jsonify(_LLM_UNAVAILABLE), 500
+
+    if mode == "llm_only":
+        prompt = _llm_only_prompt(species, age, symptoms)
+    else:
+        prompt = _json_prompt(species, age, symptoms, _triage_category(symptoms))
+
+    def _events():
+        pieces = []
+        try:
+            for piece in _stream_tokens(pipe, prompt, gen_kwargs):
+                pieces.append(piece)
+                yield _sse("token", {"text": piece})
+        except Exception as e:
+            yield _sse("error", {"error": f"generation failed: {e}"})
+            return
+        raw = "".join(pieces).strip()
+        if mode == "llm_only":
+            resp = _llm_only_response(raw)
+        else:
+            resp = _normalize_llm_json(_try_parse(raw), raw, species, age, symptoms, fallback_enabled)
+        if key is not None:
+            _response_cache.set(key, resp)
+        yield _sse("result", resp)
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return Response(stream_with_context(_events()), mimetype="text/event-stream", headers=headers)
 
 
 # API aliases
@@ -985,4 +1823,6 @@ def api_diagnose_llm():
     return ai_diagnose_llm()
 
 if __name__ == "__main__":
-    app.run(debug=True)
+    # Development server; for several workers use gunicorn -c gunicorn.conf.py wsgi:app
+    warm()
+    app.run(debug=os.environ.get("PETMS_DEBUG", "1") == "1")
@@ -0,0 +1,154 @@
+"""Password hashing and the per-session principal cache.
+
+Passwords are stored as `pbkdf2_sha256$<iterations>$<salt>$<hash>` (base64
+salt and hash). PETMS_PBKDF2_ITERATIONS sets the work factor for new hashes;
+older hashes and legacy plaintext values are upgraded on the next login.
+"""
+import base64
+import hashlib
+import hmac
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import db
+
+
+ALGORITHM = "pbkdf2_sha256"
+ITERATIONS = int(os.environ.get("PETMS_PBKDF2_ITERATIONS", 600000))
+SALT_BYTES = 16
+PRINCIPAL_TTL = float(os.environ.get("PETMS_PRINCIPAL_TTL", 300))
+PRINCIPAL_FIELDS = ("id", "name", "email", "role", "phone", "address")
+
+
+def _b64(raw: bytes) -> str:
+    return base64.b64encode(raw).decode("ascii")
+
+
+def _pbkdf2(password: str, salt: bytes, iterations: int) -> bytes:
+    return hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations)
+
+
+def hash_password(password: str, iterations: int = ITERATIONS) -> str:
+    salt = os.urandom(SALT_BYTES)
+    return f"{ALGORITHM}${iterations}${_b64(salt)}${_b64(_pbkdf2(password, salt, iterations))}"
+
+
+def is_hashed(stored: Optional[str]) -> bool:
+    return bool(stored) and stored.startswith(ALGORITHM + "$")
+
+
+def _parse(stored: str) -> Optional[Tuple[int, bytes, bytes]]:
+    try:
+        _, iterations, salt, digest = stored.split("$")
+        return int(iterations), base64.b64decode(salt), base64.b64decode(digest)
+    except ValueError:
+        return None
+
+
+# Verified against when the email is unknown, so misses cost as much as hits
+_dummy_hash: Optional[str] = None
+
+
+def _dummy() -> str:
+    global _dummy_hash
+    if _dummy_hash is None:
+        _dummy_hash = hash_password("", ITERATIONS)
+    return _dummy_hash
+
+
+def verify_password(password: str, stored: Optional[str]) -> Tuple[bool, bool]:
+    """(matches, needs_rehash). Comparisons are constant-time."""
+    if not stored:
+        reject(password)
+        return False, False
+    if not is_hashed(stored):
+        # Legacy plaintext row
+        ok = hmac.compare_digest(password.encode("utf-8"), stored.encode("utf-8"))
+        return ok, ok
+    parsed = _parse(stored)
+    if parsed is None:
+        return False, False
+    iterations, salt, digest = parsed
+    ok = hmac.compare_digest(_pbkdf2(password, salt, iterations), digest)
+    return ok, ok and iterations < ITERATIONS
+
+
+def reject(password: str) -> None:
+    """Spend one verification on a login with no matching user."""
+    verify_password(password, _dummy())
+
+
+def hash_legacy_passwords(conn: Optional[sqlite3.Connection] = None) -> int:
+    """Hash every plaintext password in place; returns the number of rows changed."""
+    close_after = False
+    if conn is None:
+        conn = db.connect()
+        close_after = True
+    try:
+        rows = conn.execute(
+            "SELECT id, password FROM users WHERE password IS NOT NULL AND password != '' AND password NOT LIKE ?",
+            (ALGORITHM + "$%",),
+        ).fetchall()
+        with conn:
+            conn.executemany(
+                "UPDATE users SET password = ? WHERE id = ?",
+                [(hash_password(r["password"]), r["id"]) for r in rows],
+            )
+        return len(rows)
+    finally:
+        if close_after:
+            conn.close()
+
+
+def principal(user: Dict[str, Any]) -> Dict[str, Any]:
+    """The user fields safe to cache and return to clients (never the password)."""
+    return {k: user.get(k) for k in PRINCIPAL_FIELDS}
+
+
+class PrincipalCache:
+    """user_id -> principal for logged-in sessions.
+
+    Entries expire after `ttl` seconds and are dropped when the user is
+    edited or deleted, so a session check is one dict lookup.
+    """
+
+    def __init__(self, ttl: float = PRINCIPAL_TTL, max_size: int = 10000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: "OrderedDict[Any, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: Any, load: Callable[[Any], Optional[Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+        if user_id is None:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            hit = self._entries.get(user_id)
+            if hit is not None and hit[0] > now:
+                self._entries.move_to_end(user_id)
+                return hit[1]
+        user = load(user_id)
+        if user is None:
+            self.invalidate(user_id)
+            return None
+        return self.put(user)
+
+    def put(self, user: Dict[str, Any]) -> Dict[str, Any]:
+        entry = principal(user)
+        with self._lock:
+            self._entries[entry["id"]] = (time.monotonic() + self.ttl, entry)
+            self._entries.move_to_end(entry["id"])
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, user_id: Any = None) -> None:
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(user_id, None)
@@ -0,0 +1,6 @@
+"""Synthetic clinics and per-endpoint latency benchmarks for the API.
+
+    python -m bench --owners 1000 --requests 200 --out before.json
+    python -m bench --url http://127.0.0.1:5000 --concurrency 16
+    python -m bench --compare before.json after.json
+"""
@@ -0,0 +1,134 @@
+"""Per-endpoint latency benchmark.
+
+    python -m bench [--owners 1000] [--requests 200] [--out results.json]
+    python -m bench --url http://127.0.0.1:5000 --concurrency 16
+    python -m bench --compare before.json after.json
+
+Client mode (default) builds a synthetic clinic in a temporary database and
+drives the app through Flask's test client. HTTP mode drives a server that
+is already running (seed it with --seed-db first). Run from backend/.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from bench import runner, synth
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return ""
+
+
+def _seed(db_file: str, args) -> dict:
+    """Fill db_file with a synthetic clinic; row counts per table."""
+    os.environ["PETMS_DB"] = db_file
+    import db
+
+    data = synth.build_clinic(
+        np.random.default_rng(args.seed), owners=args.owners, pets_per_owner=args.pets_per_owner,
+        records_per_pet=args.records, vets=args.vets,
+    )
+    db.init_db()
+    db.replace_all(data)
+    return {k: len(v) for k, v in data.items()}
+
+
+def _print_report(report: dict) -> None:
+    print(f"{'endpoint':<24}{'n':>6}{'ok':>6}{'p50':>10}{'p95':>10}{'p99':>10}{'rps':>10}")
+    for name, s in report["endpoints"].items():
+        print(f"{name:<24}{s['n']:>6}{s['ok']:>6}{s['p50_ms']:>10.2f}{s['p95_ms']:>10.2f}{s['p99_ms']:>10.2f}{s['rps']:>10.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--owners", type=int, default=500)
+    parser.add_argument("--pets-per-owner", type=float, default=1.5)
+    parser.add_argument("--records", type=int, default=8, help="mean records per pet")
+    parser.add_argument("--vets", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--requests", type=int, default=100, help="timed requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--url", help="benchmark a running server over HTTP instead of the test client")
+    parser.add_argument("--store", choices=["sqlite", "memory"], help="PETMS_STORE for client mode")
+    parser.add_argument("--read-only", action="store_true", help="skip the write endpoints")
+    parser.add_argument("--only", help="comma-separated endpoint names")
+    parser.add_argument("--seed-db", metavar="PATH", help="only write a synthetic clinic to PATH and exit")
+    parser.add_argument("--out", help="write the JSON report here (default: stdout)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two reports and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0], encoding="utf-8") as f:
+            old = json.load(f)
+        with open(args.compare[1], encoding="utf-8") as f:
+            new = json.load(f)
+        rows = runner.compare(old, new)
+        print(f"{'endpoint':<24}{'old p95':>10}{'new p95':>10}{'ratio':>8}")
+        for name, before, after, ratio in rows:
+            print(f"{name:<24}{before:>10.2f}{after:>10.2f}{ratio:>8.2f}")
+        return
+
+    if args.seed_db:
+        print(json.dumps(_seed(args.seed_db, args)))
+        return
+
+    scenario_list = runner.scenarios(writes=not args.read_only)
+    if args.only:
+        wanted = {n.strip() for n in args.only.split(",")}
+        scenario_list = [s for s in scenario_list if s[0] in wanted]
+
+    meta = {
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+    }
+    if args.url:
+        meta.update(mode="http", url=args.url)
+        ids = runner.collect_ids(base_url=args.url)
+        transport = runner.HttpTransport(args.url)
+    else:
+        tmp = tempfile.mkdtemp(prefix="petms-bench-")
+        # Keep the real data.json and the LLM out of the run
+        os.environ["PETMS_SNAPSHOT"] = "0"
+        os.environ["VET_QA_WARMUP"] = "0"
+        if args.store:
+            os.environ["PETMS_STORE"] = args.store
+        meta.update(mode="client", store=os.environ.get("PETMS_STORE", "sqlite"), rows=_seed(os.path.join(tmp, "bench.db"), args))
+        import app as app_module
+
+        app_module.warm(llm=False)
+        ids = runner.collect_ids(app_module.app)
+        transport = runner.TestClientTransport(app_module.app)
+
+    report = {"meta": meta, "endpoints": runner.run(
+        transport, scenario_list, ids, requests=args.requests, concurrency=args.concurrency, seed=args.seed,
+    )}
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+        _print_report(report)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+class TestClientTransport:
+    """In-process calls through Flask's test client (no network, no server)."""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def __call__(self, method: str, path: str, body: Optional[Dict[str, Any]] = None) -> int:
+        resp = self.client.open(path, method=method, json=body)
+        resp.get_data()
+        resp.close()
+        return resp.status_code
+
+
+class HttpTransport:
+    """Real HTTP against a running server (python app.py / wsgi)."""
+
+    def __init__(self, base_url: str, timeout: float = 60.0):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def __call__(self, method: str, path: str, body: Optional[Dict[str, Any]] = None) -> int:
+        data = json.dumps(body).encode() if body is not None else None
+        req = urllib.request.Request(self.base_url + path, data=data, method=method)
+        if data is not None:
+            req.add_header("Content-Type", "application/json")
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+                resp.read()
+                return resp.status
+        except urllib.error.HTTPError as e:
+            e.read()
+            return e.code
+        except (urllib.error.URLError, OSError):
+            return 0
+
+
+# (name, method, builder); a builder takes (ids, rng) and returns (path, json body or None)
+Scenario = Tuple[str, str, Callable[[Dict[str, List[str]], np.random.Generator], Tuple[str, Optional[Dict[str, Any]]]]]
+
+SEARCH_WORDS = ["vomiting", "ear discharge", "limping", "itchy skin", "thirsty", "coughing"]
+
+
+def _pick(rng: np.random.Generator, items: List[str]) -> str:
+    return items[int(rng.integers(0, len(items)))] if items else "none"
+
+
+def scenarios(today: Optional[str] = None, writes: bool = True) -> List[Scenario]:
+    today = today or date.today().isoformat()
+    reads: List[Scenario] = [
+        ("ready", "GET", lambda ids, rng: ("/ready", None)),
+        ("pets", "GET", lambda ids, rng: ("/pets", None)),
+        ("pets_page", "GET", lambda ids, rng: ("/pets?limit=50", None)),
+        ("users", "GET", lambda ids, rng: ("/users", None)),
+        ("medical_by_pet", "GET", lambda ids, rng: (f"/medical/{_pick(rng, ids['pets'])}", None)),
+        ("vaccine_by_pet", "GET", lambda ids, rng: (f"/vaccine/{_pick(rng, ids['pets'])}", None)),
+        ("weight_by_pet", "GET", lambda ids, rng: (f"/weight/{_pick(rng, ids['pets'])}", None)),
+        ("appointment_by_pet", "GET", lambda ids, rng: (f"/appointment/{_pick(rng, ids['pets'])}", None)),
+        ("records_medical", "GET", lambda ids, rng: ("/records/medical", None)),
+        ("records_appointment", "GET", lambda ids, rng: ("/records/appointment", None)),
+        ("dashboard_summary", "GET", lambda ids, rng: (f"/dashboard/summary?days=30&today={today}", None)),
+        ("vaccine_reminders", "GET", lambda ids, rng: (f"/reminders/vaccines?days=30&today={today}", None)),
+        ("vet_schedule", "GET", lambda ids, rng: (f"/schedule/{_pick(rng, ids['vets'])}?date={today}", None)),
+        ("vet_free_slots", "GET", lambda ids, rng: (f"/schedule/{_pick(rng, ids['vets'])}/free?date={today}", None)),
+        ("weight_analytics", "GET", lambda ids, rng: (f"/weight/{_pick(rng, ids['pets'])}/analytics", None)),
+        ("weight_analytics_all", "GET", lambda ids, rng: ("/analytics/weights?flagged=1", None)),
+        ("search_medical", "GET", lambda ids, rng: (f"/search/medical?q={_pick(rng, SEARCH_WORDS).replace(' ', '+')}", None)),
+        ("bulk_export_weights", "GET", lambda ids, rng: ("/bulk/weights", None)),
+        ("login", "POST", lambda ids, rng: ("/login", {"email": "vet0@bench.local", "password": "bench-password"})),
+        ("ai_diagnose", "POST", lambda ids, rng: ("/ai/diagnose", {"species": "Dog", "symptoms": _pick(rng, SEARCH_WORDS)})),
+    ]
+    if not writes:
+        return reads
+    return reads + [
+        ("weight_add", "POST", lambda ids, rng: ("/weight/add", {
+            "petId": _pick(rng, ids["pets"]), "date": today, "weight": round(float(rng.uniform(1, 30)), 2)})),
+        ("medical_add", "POST", lambda ids, rng: ("/medical/add", {
+            "petId": _pick(rng, ids["pets"]), "date": today, "diagnosis": "Bench", "treatment": "None",
+            "notes": _pick(rng, SEARCH_WORDS)})),
+        ("appointment_add", "POST", lambda ids, rng: ("/appointment/add", {
+            "petId": _pick(rng, ids["pets"]), "date": today, "vetId": _pick(rng, ids["vets"]),
+            "time": f"{int(rng.integers(8, 20)):02d}:{int(rng.integers(0, 60)):02d}", "reason": "Bench"})),
+        ("pet_edit", "POST", lambda ids, rng: ("/edit_pet", {"id": _pick(rng, ids["pets"]), "age": int(rng.integers(0, 16))})),
+    ]
+
+
+def collect_ids(transport_app=None, base_url: Optional[str] = None) -> Dict[str, List[str]]:
+    """Pet and vet ids to aim requests at, read through the API itself."""
+    if base_url:
+        def get(path):
+            with urllib.request.urlopen(base_url.rstrip("/") + path, timeout=60) as resp:
+                return json.loads(resp.read())
+    else:
+        client = transport_app.test_client()
+
+        def get(path):
+            return client.get(path).get_json()
+
+    users = get("/users?fields=id,role&limit=1000")
+    pets = get("/pets?fields=id&limit=1000")
+    return {
+        "pets": [p["id"] for p in pets],
+        "vets": [u["id"] for u in users if u.get("role") == "vet"],
+    }
+
+
+def summarize(latencies: List[float], statuses: Dict[int, int], wall: float) -> Dict[str, Any]:
+    ms = np.asarray(latencies) * 1000.0
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99]) if ms.size else (0.0, 0.0, 0.0)
+    ok = sum(n for code, n in statuses.items() if 200 <= code < 400)
+    return {
+        "n": int(ms.size),
+        "ok": ok,
+        "status": {str(k): v for k, v in sorted(statuses.items())},
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+        "mean_ms": round(float(ms.mean()), 3) if ms.size else 0.0,
+        "max_ms": round(float(ms.max()), 3) if ms.size else 0.0,
+        "rps": round(ms.size / wall, 2) if wall > 0 else 0.0,
+    }
+
+
+def run(
+    transport: Callable[..., int],
+    scenario_list: List[Scenario],
+    ids: Dict[str, List[str]],
+    requests: int = 100,
+    concurrency: int = 1,
+    warmup: int = 3,
+    seed: int = 42,
+) -> Dict[str, Dict[str, Any]]:
+    """Drive each scenario `requests` times over `concurrency` threads; stats per scenario."""
+    results = {}
+    for name, method, build in scenario_list:
+        rng = np.random.default_rng(seed)
+        for _ in range(warmup):
+            transport(method, *build(ids, rng))
+        calls = [build(ids, rng) for _ in range(requests)]
+        latencies: List[float] = []
+        statuses: Dict[int, int] = {}
+        lock = threading.Lock()
+
+        def one(call):
+            t0 = time.perf_counter()
+            code = transport(method, *call)
+            dt = time.perf_counter() - t0
+            with lock:
+                latencies.append(dt)
+                statuses[code] = statuses.get(code, 0) + 1
+
+        start = time.perf_counter()
+        if concurrency <= 1:
+            for call in calls:
+                one(call)
+        else:
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                list(pool.map(one, calls))
+        results[name] = summarize(latencies, statuses, time.perf_counter() - start)
+    return results
+
+
+def compare(old: Dict[str, Any], new: Dict[str, Any], metric: str = "p95_ms") -> List[Tuple[str, float, float, float]]:
+    """(endpoint, old, new, ratio) for endpoints present in both reports, worst ratio first."""
+    rows = []
+    for name, stats in new.get("endpoints", {}).items():
+        before = old.get("endpoints", {}).get(name)
+        if before and before.get(metric):
+            rows.append((name, before[metric], stats[metric], stats[metric] / before[metric]))
+    return sorted(rows, key=lambda r: r[3], reverse=True)
@@ -0,0 +1,94 @@
+from datetime import date, timedelta
+from typing import Any, Dict, List
+
+import numpy as np
+
+
+SPECIES = ["Dog", "Cat", "Rabbit", "Bird", "Hamster", "Turtle"]
+SPECIES_P = [0.45, 0.35, 0.08, 0.05, 0.04, 0.03]
+ADULT_KG = {"Dog": 18.0, "Cat": 4.5, "Rabbit": 2.0, "Bird": 0.1, "Hamster": 0.12, "Turtle": 1.0}
+VACCINES = ["Rabies", "DHPP", "FVRCP", "Leptospirosis", "Bordetella", "FeLV"]
+REASONS = ["Annual check-up", "Vaccination", "Follow-up", "Dental cleaning", "Skin problem", "Limping"]
+TREATMENTS = ["Rest and observation", "Antibiotics 7 days", "Anti-inflammatory", "Diet change", "Ear drops", "Flea treatment"]
+PASSWORD = "bench-password"
+
+
+def _uid(rng: np.random.Generator) -> str:
+    return "%032x" % int(rng.integers(0, 2**63)) + "%016x" % int(rng.integers(0, 2**63))
+
+
+def _day(today: date, offset: int) -> str:
+    return (today + timedelta(days=int(offset))).isoformat()
+
+
+def build_clinic(
+    rng: np.random.Generator,
+    owners: int = 200,
+    pets_per_owner: float = 1.5,
+    records_per_pet: int = 8,
+    vets: int = 5,
+    today: date = None,
+) -> Dict[str, List[Dict[str, Any]]]:
+    """A synthetic clinic in the data.json layout (feed it to db.replace_all).
+
+    Medical notes reuse train_models.build_symptom_dataset so the text looks
+    like what the classifier and search see; the same seed gives the same clinic.
+    """
+    from auth import hash_password
+    from train_models import build_symptom_dataset
+
+    today = today or date.today()
+    texts, labels = build_symptom_dataset(rng, n_per_label=60)
+    data: Dict[str, List[Dict[str, Any]]] = {k: [] for k in ("users", "pets", "medical_history", "vaccines", "weights", "appointments")}
+
+    vet_ids = []
+    password_hash = hash_password(PASSWORD)
+    for i in range(vets):
+        vet_ids.append(_uid(rng))
+        data["users"].append({
+            "id": vet_ids[-1], "name": f"Vet {i}", "email": f"vet{i}@bench.local",
+            "password": password_hash, "role": "vet", "phone": None, "address": None,
+        })
+    for i in range(owners):
+        owner_id = _uid(rng)
+        data["users"].append({
+            "id": owner_id, "name": f"Owner {i}", "email": f"owner{i}@bench.local", "password": None,
+            "role": "owner", "phone": f"555{i:07d}", "address": f"{i} Bench Street",
+        })
+        for _ in range(max(1, int(rng.poisson(pets_per_owner)))):
+            species = str(rng.choice(SPECIES, p=SPECIES_P))
+            pet_id = _uid(rng)
+            data["pets"].append({
+                "id": pet_id, "name": f"Pet {len(data['pets'])}", "age": float(rng.integers(0, 16)),
+                "type": species, "photo": "", "ownerId": owner_id,
+            })
+            n = max(1, int(rng.poisson(records_per_pet)))
+            # Weight series: a gentle trend plus noise, a few pets losing fast
+            base = ADULT_KG[species] * float(rng.uniform(0.7, 1.3))
+            trend = float(rng.choice([0.0, 0.01, -0.01, -0.08], p=[0.5, 0.2, 0.2, 0.1]))
+            for k in range(n):
+                data["weights"].append({
+                    "id": _uid(rng), "petId": pet_id, "date": _day(today, -30 * (n - k)),
+                    "weight": round(base * (1 + trend * k) * float(rng.normal(1, 0.02)), 3),
+                })
+            for _ in range(max(1, n // 2)):
+                j = int(rng.integers(0, len(texts)))
+                data["medical_history"].append({
+                    "id": _uid(rng), "petId": pet_id, "date": _day(today, -int(rng.integers(1, 900))),
+                    "diagnosis": labels[j], "treatment": str(rng.choice(TREATMENTS)), "notes": texts[j],
+                    "attachment": None,
+                })
+            for _ in range(int(rng.integers(1, 4))):
+                given = -int(rng.integers(0, 365))
+                data["vaccines"].append({
+                    "id": _uid(rng), "petId": pet_id, "vaccineName": str(rng.choice(VACCINES)),
+                    "dateGiven": _day(today, given), "nextDue": _day(today, given + 365),
+                })
+            for _ in range(int(rng.integers(0, 3))):
+                slot = int(rng.integers(0, 16))
+                data["appointments"].append({
+                    "id": _uid(rng), "petId": pet_id, "date": _day(today, int(rng.integers(-60, 60))),
+                    "time": f"{9 + slot // 2:02d}:{30 * (slot % 2):02d}", "reason": str(rng.choice(REASONS)),
+                    "vetId": str(rng.choice(vet_ids)) if vet_ids else None, "duration": 30,
+                })
+    return data
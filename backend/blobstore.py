@@ -0,0 +1,99 @@
+import hashlib
+import os
+import re
+import tempfile
+from typing import BinaryIO, Optional, Tuple
+
+
+CHUNK_SIZE = 64 * 1024
+THUMB_PX = int(os.environ.get("PETMS_THUMB_PX", 320))
+IMAGE_EXTS = {"jpg", "jpeg", "png", "gif", "webp", "bmp"}
+
+# <sha256>.<ext>: content-addressed; anything else is a legacy uuid upload
+BLOB_NAME = re.compile(r"^([0-9a-f]{64})\.([a-z0-9]{1,10})$")
+
+
+def clean_ext(filename: str) -> str:
+    ext = filename.rsplit(".", 1)[-1].lower() if "." in (filename or "") else ""
+    return ext if re.fullmatch(r"[a-z0-9]{1,10}", ext) else "bin"
+
+
+class BlobStore:
+    """Uploads keyed by the SHA-256 of their content.
+
+    Files stream through the hash into a temp file and are renamed into
+    place, so identical uploads are stored once. Blobs are sharded by the
+    first two hex digits; legacy uploads stay flat in the root.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self.thumbs = os.path.join(root, "thumbs")
+        self.tmp = os.path.join(root, "tmp")
+        os.makedirs(self.thumbs, exist_ok=True)
+        os.makedirs(self.tmp, exist_ok=True)
+
+    def path(self, name: str) -> Optional[str]:
+        """Disk path for a served name, or None if it is not a valid upload name."""
+        m = BLOB_NAME.match(name)
+        if m:
+            return os.path.join(self.root, m.group(1)[:2], name)
+        if "/" in name or "\\" in name or name.startswith("."):
+            return None
+        return os.path.join(self.root, name)
+
+    def put(self, stream: BinaryIO, ext: str) -> Tuple[str, int, bool]:
+        """Store a stream; returns (name, size, deduplicated)."""
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.tmp)
+        try:
+            with os.fdopen(fd, "wb") as out:
+                while True:
+                    chunk = stream.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    out.write(chunk)
+                    size += len(chunk)
+            name = f"{digest.hexdigest()}.{ext}"
+            target = self.path(name)
+            if os.path.exists(target):
+                os.remove(tmp_path)
+                return name, size, True
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(tmp_path, target)
+            return name, size, False
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def thumb_path(self, name: str) -> str:
+        return os.path.join(self.thumbs, name.rsplit(".", 1)[0] + ".jpg")
+
+    def make_thumb(self, name: str) -> Optional[str]:
+        """Downsized JPEG of an image upload (needs Pillow); None if not possible."""
+        if clean_ext(name) not in IMAGE_EXTS:
+            return None
+        src, dst = self.path(name), self.thumb_path(name)
+        if src is None or not os.path.exists(src):
+            return None
+        if os.path.exists(dst):
+            return dst
+        try:
+            from PIL import Image
+        except ImportError:
+            return None
+        fd, tmp_path = tempfile.mkstemp(dir=self.tmp, suffix=".jpg")
+        try:
+            with os.fdopen(fd, "wb") as out, Image.open(src) as img:
+                img.thumbnail((THUMB_PX, THUMB_PX))
+                img.convert("RGB").save(out, "JPEG", quality=80, optimize=True)
+            os.replace(tmp_path, dst)
+            return dst
+        except Exception as e:
+            print(f"Error creating thumbnail for {name}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return None
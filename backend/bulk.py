@@ -0,0 +1,219 @@
+"""Streaming NDJSON import/export per table.
+
+    python bulk.py export pets > pets.ndjson
+    python bulk.py import weights weights.ndjson      # or "-" for stdin
+    python bulk.py check                              # export/import round-trip keeps logins
+
+Import is an upsert (existing ids are updated, nothing is wiped), runs in
+chunked transactions and applies the same FK rules as db.replace_all:
+unknown owners become NULL, rows pointing at unknown pets are skipped.
+Plaintext user passwords are hashed on the way in (one PBKDF2 run each).
+"""
+import json
+import os
+import sqlite3
+import sys
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+import auth
+import db
+
+
+REAL_COLUMNS = {"pets": {"age"}, "weights": {"weight"}}
+# Looked up against other tables, so they must be ids (or absent)
+KEY_COLUMNS = ("petId", "ownerId", "vetId")
+SCALARS = (str, int, float, bool, type(None))
+# Key under which _clean records which columns the input line actually had
+PRESENT = "__present__"
+MAX_ERRORS = 100
+
+
+def export_ndjson(table: str, conn: Optional[sqlite3.Connection] = None, exclude: Iterable[str] = ()) -> Iterator[str]:
+    """Yield one JSON line per row; reads through a cursor, never the whole table."""
+    close_after = False
+    if conn is None:
+        conn = db.connect()
+        close_after = True
+    skip = set(exclude)
+    try:
+        for row in db.iter_rows(table, conn):
+            for k in skip:
+                row.pop(k, None)
+            yield json.dumps(row, ensure_ascii=False) + "\n"
+    finally:
+        if close_after:
+            conn.close()
+
+
+def _clean(table: str, obj: Any) -> Dict[str, Any]:
+    """Validate one record; raises ValueError with a short reason."""
+    if not isinstance(obj, dict):
+        raise ValueError("not a JSON object")
+    row = {k: obj.get(k) for k in db.TABLE_COLUMNS[table]}
+    row[PRESENT] = frozenset(k for k in db.TABLE_COLUMNS[table] if k in obj)
+    if not isinstance(row["id"], str) or not row["id"].strip():
+        raise ValueError("missing id")
+    for col in KEY_COLUMNS:
+        if col in row and row[col] is not None and not isinstance(row[col], str):
+            raise ValueError(f"{col} is not a string")
+    for col, value in row.items():
+        if col != PRESENT and not isinstance(value, SCALARS):
+            raise ValueError(f"{col} is not a plain value")
+    if table == "users" and not row.get("name"):
+        raise ValueError("missing name")
+    if table == "pets" and not row.get("name"):
+        raise ValueError("missing name")
+    if table == "users" and row.get("password"):
+        if not isinstance(row["password"], str):
+            raise ValueError("password is not a string")
+        if not auth.is_hashed(row["password"]):
+            row["password"] = auth.hash_password(row["password"])
+    for col in REAL_COLUMNS.get(table, ()):
+        if row[col] is not None and row[col] != "":
+            try:
+                row[col] = float(row[col])
+            except (TypeError, ValueError):
+                raise ValueError(f"{col} is not a number")
+    return row
+
+
+def _existing(conn: sqlite3.Connection, table: str, ids: List[Any]) -> set:
+    ids = [i for i in set(ids) if i]
+    if not ids:
+        return set()
+    marks = ", ".join("?" for _ in ids)
+    return {r[0] for r in conn.execute(f"SELECT id FROM {table} WHERE id IN ({marks})", ids)}
+
+
+def _upsert_sql(table: str, present: Iterable[str]) -> str:
+    """Upsert that only overwrites the columns a record carries.
+
+    A record without `password` (the HTTP export drops it) must not wipe the
+    stored hash, so absent columns keep their current value on update.
+    """
+    cols = db.TABLE_COLUMNS[table]
+    updates = [f"{c} = excluded.{c}" for c in cols if c != "id" and c in present]
+    # ON CONFLICT DO UPDATE keeps the row (INSERT OR REPLACE would cascade-delete children)
+    conflict = f"DO UPDATE SET {', '.join(updates)}" if updates else "DO NOTHING"
+    return (
+        f"INSERT INTO {table} ({', '.join(cols)}) VALUES ({', '.join(':' + c for c in cols)}) "
+        f"ON CONFLICT(id) {conflict}"
+    )
+
+
+def _flush(conn: sqlite3.Connection, table: str, chunk: List[Dict[str, Any]], stats: Dict[str, Any]) -> None:
+    if not chunk:
+        return
+    if table == "pets":
+        owners = _existing(conn, "users", [r["ownerId"] for r in chunk])
+        for r in chunk:
+            if r["ownerId"] not in owners:
+                r["ownerId"] = None
+    elif "petId" in db.TABLE_COLUMNS[table]:
+        pets = _existing(conn, "pets", [r["petId"] for r in chunk])
+        kept = [r for r in chunk if r["petId"] in pets]
+        stats["skipped_fk"] += len(chunk) - len(kept)
+        chunk = kept
+    groups: Dict[frozenset, List[Dict[str, Any]]] = {}
+    for r in chunk:
+        groups.setdefault(r.pop(PRESENT), []).append(r)
+    with conn, db.bulk_change_log(conn):
+        for present, rows in groups.items():
+            conn.executemany(_upsert_sql(table, present), rows)
+    stats["upserted"] += len(chunk)
+
+
+def import_ndjson(
+    table: str,
+    lines: Iterable[Any],
+    conn: Optional[sqlite3.Connection] = None,
+    chunk_size: int = 1000,
+) -> Dict[str, Any]:
+    """Upsert NDJSON lines (str or bytes) into `table`; memory use is one chunk."""
+    if table not in db.TABLE_COLUMNS:
+        raise ValueError(f"unknown table: {table}")
+    close_after = False
+    if conn is None:
+        conn = db.connect()
+        close_after = True
+    stats: Dict[str, Any] = {"table": table, "lines": 0, "upserted": 0, "skipped_fk": 0, "invalid": 0, "errors": []}
+    chunk: List[Dict[str, Any]] = []
+    try:
+        for n, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            stats["lines"] += 1
+            try:
+                # json.loads accepts UTF-8 bytes too
+                chunk.append(_clean(table, json.loads(line)))
+            except ValueError as e:
+                stats["invalid"] += 1
+                if len(stats["errors"]) < MAX_ERRORS:
+                    stats["errors"].append({"line": n, "error": str(e)})
+                continue
+            if len(chunk) >= chunk_size:
+                _flush(conn, table, chunk, stats)
+                chunk = []
+        _flush(conn, table, chunk, stats)
+    finally:
+        if close_after:
+            conn.close()
+    return stats
+
+
+def check_roundtrip() -> bool:
+    """Re-import a users export without passwords (as GET /bulk/users serves it) into a
+    scratch database and confirm the stored password still verifies; a plaintext
+    password in an import must be stored hashed."""
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = db.connect(os.path.join(tmp, "check.db"))
+        try:
+            db.init_db(conn)
+            db.insert_row("users", {
+                "id": "u1", "name": "Check", "email": "check@example.com",
+                "password": auth.hash_password("secret", iterations=1000), "role": "vet",
+            }, conn=conn)
+            body = list(export_ndjson("users", conn, exclude=("password",)))
+            stats = import_ndjson("users", body, conn=conn)
+            stored = conn.execute("SELECT password FROM users WHERE id = 'u1'").fetchone()[0]
+            import_ndjson("users", [json.dumps({"id": "u2", "name": "Plain", "password": "secret"})], conn=conn)
+            plain = conn.execute("SELECT password FROM users WHERE id = 'u2'").fetchone()[0]
+        finally:
+            conn.close()
+    ok = stats["upserted"] == 1 and auth.verify_password("secret", stored)[0]
+    print("Round-trip OK." if ok else f"Round-trip lost the password: {stats}")
+    hashed = auth.is_hashed(plain) and auth.verify_password("secret", plain)[0]
+    print("Plaintext import hashed." if hashed else "Plaintext import stored the password as given.")
+    return ok and hashed
+
+
+def main() -> None:
+    if sys.argv[1:2] == ["check"]:
+        sys.exit(0 if check_roundtrip() else 1)
+    if len(sys.argv) < 3 or sys.argv[1] not in ("import", "export") or sys.argv[2] not in db.TABLE_COLUMNS:
+        print(__doc__)
+        print("tables:", ", ".join(db.TABLE_COLUMNS))
+        sys.exit(2)
+    cmd, table = sys.argv[1], sys.argv[2]
+    db.init_db()
+    if cmd == "export":
+        for line in export_ndjson(table):
+            sys.stdout.write(line)
+        return
+    path = sys.argv[3] if len(sys.argv) > 3 else "-"
+    if path == "-":
+        stats = import_ndjson(table, sys.stdin)
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            stats = import_ndjson(table, f)
+    print(json.dumps(stats, indent=2))
+
+
+if __name__ == "__main__":
+    main()
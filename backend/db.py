@@ -1,32 +1,130 @@
+import base64
+import json
 import os
+import re
 import sqlite3
-from typing import Dict, List, Any, Optional
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Any, Optional, Tuple
+
+import metrics
+import migrations
 
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DB_FILE = os.path.join(BASE_DIR, "petms.db")
-SCHEMA_FILE = os.path.join(BASE_DIR, "schema.sql")
+DB_FILE = os.environ.get("PETMS_DB") or os.path.join(BASE_DIR, "petms.db")
+
+# Column whitelist per table (insert order = FK order)
+TABLE_COLUMNS: Dict[str, List[str]] = {
+    "users": ["id", "name", "email", "password", "role", "phone", "address"],
+    "pets": ["id", "name", "age", "type", "photo", "ownerId"],
+    "medical_history": ["id", "petId", "date", "diagnosis", "treatment", "notes", "attachment"],
+    "vaccines": ["id", "petId", "vaccineName", "dateGiven", "nextDue"],
+    "weights": ["id", "petId", "weight", "date"],
+    "appointments": ["id", "petId", "date", "time", "reason", "vetId", "duration"],
+}
+
 
+# Pragmas for long-lived pooled connections
+POOL_PRAGMAS = [
+    "PRAGMA journal_mode = WAL;",
+    "PRAGMA synchronous = NORMAL;",
+    "PRAGMA temp_store = MEMORY;",
+    "PRAGMA cache_size = -16000;",
+    "PRAGMA mmap_size = 134217728;",
+    "PRAGMA busy_timeout = 5000;",
+]
 
-def connect(db_path: Optional[str] = None) -> sqlite3.Connection:
+
+def connect(db_path: Optional[str] = None, check_same_thread: bool = True) -> sqlite3.Connection:
     path = db_path or DB_FILE
-    conn = sqlite3.connect(path)
+    conn = sqlite3.connect(path, check_same_thread=check_same_thread, factory=metrics.connection_factory())
     conn.row_factory = sqlite3.Row
     # FK on
     conn.execute("PRAGMA foreign_keys = ON;")
     return conn
 
 
-def init_db(conn: Optional[sqlite3.Connection] = None) -> None:
+class ConnectionManager:
+    """Pool of tuned connections opened via connect().
+
+    Each thread checks out one connection on first use and keeps it until
+    release(); released connections go back to the idle list for reuse.
+    WAL lets readers proceed while a writer commits.
+    """
+
+    def __init__(self, db_path: Optional[str] = None, max_idle: int = 8):
+        self.db_path = db_path
+        self.max_idle = max_idle
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._idle: List[sqlite3.Connection] = []
+
+    def _open(self) -> sqlite3.Connection:
+        conn = connect(self.db_path, check_same_thread=False)
+        for pragma in POOL_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def get(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            with self._lock:
+                conn = self._idle.pop() if self._idle else None
+            if conn is None:
+                conn = self._open()
+            self._local.conn = conn
+        return conn
+
+    def release(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            return
+        self._local.conn = None
+        if conn.in_transaction:
+            conn.rollback()
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def close_all(self) -> None:
+        self.release()
+        with self._lock:
+            conns, self._idle = self._idle, []
+        for conn in conns:
+            conn.close()
+
+
+pool = ConnectionManager()
+
+
+def init_db(conn: Optional[sqlite3.Connection] = None) -> int:
+    """Bring the schema up to date (see migrations.py); call once at startup."""
     close_after = False
     if conn is None:
         conn = connect()
         close_after = True
-    with open(SCHEMA_FILE, "r", encoding="utf-8") as f:
-        conn.executescript(f.read())
-    conn.commit()
+    try:
+        return migrations.migrate(conn)
+    finally:
+        if close_after:
+            conn.close()
+
+
+def is_empty(conn: Optional[sqlite3.Connection] = None) -> bool:
+    close_after = False
+    if conn is None:
+        conn = connect()
+        close_after = True
+    empty = all(
+        conn.execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone() is None
+        for table in TABLE_COLUMNS
+    )
     if close_after:
         conn.close()
+    return empty
 
 
 def fetch_all(conn: Optional[sqlite3.Connection] = None) -> Dict[str, List[Dict[str, Any]]]:
@@ -50,7 +148,7 @@ def fetch_all(conn: Optional[sqlite3.Connection] = None) -> Dict[str, List[Dict[
         ),
         "weights": rows("SELECT id, petId, weight, date FROM weights"),
         "appointments": rows(
-            "SELECT id, petId, date, time, reason, vetId FROM appointments"
+            "SELECT id, petId, date, time, reason, vetId, duration FROM appointments"
         ),
     }
 
@@ -59,6 +157,26 @@ def fetch_all(conn: Optional[sqlite3.Connection] = None) -> Dict[str, List[Dict[
     return data
 
 
+# Bulk writes log one reset marker (workers reload on it) instead of a change_log row per record
+CHANGE_LOG_RESET = "*"
+
+
+@contextmanager
+def bulk_change_log(conn: sqlite3.Connection) -> Iterator[None]:
+    """Mute the per-row change_log triggers within conn's current transaction."""
+    try:
+        conn.execute("INSERT OR IGNORE INTO change_log_mute (id) VALUES (1)")
+    except sqlite3.OperationalError:
+        # Schema older than migration 8: rows are logged one by one
+        yield
+        return
+    try:
+        yield
+    finally:
+        conn.execute("DELETE FROM change_log_mute")
+        conn.execute("INSERT INTO change_log (tbl, rowId) VALUES (?, ?)", (CHANGE_LOG_RESET, CHANGE_LOG_RESET))
+
+
 def replace_all(data: Dict[str, List[Dict[str, Any]]], conn: Optional[sqlite3.Connection] = None) -> None:
     close_after = False
     if conn is None:
@@ -68,83 +186,561 @@ def replace_all(data: Dict[str, List[Dict[str, Any]]], conn: Optional[sqlite3.Co
     cur = conn.cursor()
     cur.execute("PRAGMA foreign_keys = ON;")
 
-    # Clear children
-    for table in ["appointments", "weights", "vaccines", "medical_history", "pets", "users"]:
-        cur.execute(f"DELETE FROM {table}")
-
-    # Insert order
-    def ensure_keys(rows: List[Dict[str, Any]], keys: List[str]) -> List[Dict[str, Any]]:
-        safe: List[Dict[str, Any]] = []
-        for r in rows:
-            d = {}
-            for k in keys:
-                d[k] = r.get(k)
-            safe.append(d)
-        return safe
-    users_rows = ensure_keys(
-        data.get("users", []),
-        ["id", "name", "email", "password", "role", "phone", "address"],
-    )
-    cur.executemany(
-        "INSERT INTO users (id, name, email, password, role, phone, address) VALUES (:id, :name, :email, :password, :role, :phone, :address)",
-        users_rows,
-    )
-    user_ids = {r.get("id") for r in users_rows}
+    with bulk_change_log(conn):
+        # Clear children
+        for table in ["appointments", "weights", "vaccines", "medical_history", "pets", "users"]:
+            cur.execute(f"DELETE FROM {table}")
 
-    pets_rows = ensure_keys(
-        data.get("pets", []),
-        ["id", "name", "age", "type", "photo", "ownerId"],
-    )
-    for pr in pets_rows:
-        oid = pr.get("ownerId")
-        if not oid or oid not in user_ids:
-            pr["ownerId"] = None
-    cur.executemany(
-        "INSERT INTO pets (id, name, age, type, photo, ownerId) VALUES (:id, :name, :age, :type, :photo, :ownerId)",
-        pets_rows,
-    )
-    pet_ids = {r.get("id") for r in pets_rows}
+        # Insert order
+        def ensure_keys(rows: List[Dict[str, Any]], keys: List[str]) -> List[Dict[str, Any]]:
+            safe: List[Dict[str, Any]] = []
+            for r in rows:
+                d = {}
+                for k in keys:
+                    d[k] = r.get(k)
+                safe.append(d)
+            return safe
+        users_rows = ensure_keys(
+            data.get("users", []),
+            ["id", "name", "email", "password", "role", "phone", "address"],
+        )
+        cur.executemany(
+            "INSERT INTO users (id, name, email, password, role, phone, address) VALUES (:id, :name, :email, :password, :role, :phone, :address)",
+            users_rows,
+        )
+        user_ids = {r.get("id") for r in users_rows}
 
-    med_rows = ensure_keys(
-        data.get("medical_history", []),
-        ["id", "petId", "date", "diagnosis", "treatment", "notes", "attachment"],
-    )
-    med_rows = [r for r in med_rows if r.get("petId") in pet_ids]
-    cur.executemany(
-        "INSERT INTO medical_history (id, petId, date, diagnosis, treatment, notes, attachment) VALUES (:id, :petId, :date, :diagnosis, :treatment, :notes, :attachment)",
-        med_rows,
-    )
+        pets_rows = ensure_keys(
+            data.get("pets", []),
+            ["id", "name", "age", "type", "photo", "ownerId"],
+        )
+        for pr in pets_rows:
+            oid = pr.get("ownerId")
+            if not oid or oid not in user_ids:
+                pr["ownerId"] = None
+        cur.executemany(
+            "INSERT INTO pets (id, name, age, type, photo, ownerId) VALUES (:id, :name, :age, :type, :photo, :ownerId)",
+            pets_rows,
+        )
+        pet_ids = {r.get("id") for r in pets_rows}
 
-    vac_rows = ensure_keys(
-        data.get("vaccines", []),
-        ["id", "petId", "vaccineName", "dateGiven", "nextDue"],
-    )
-    vac_rows = [r for r in vac_rows if r.get("petId") in pet_ids]
-    cur.executemany(
-        "INSERT INTO vaccines (id, petId, vaccineName, dateGiven, nextDue) VALUES (:id, :petId, :vaccineName, :dateGiven, :nextDue)",
-        vac_rows,
-    )
+        med_rows = ensure_keys(
+            data.get("medical_history", []),
+            ["id", "petId", "date", "diagnosis", "treatment", "notes", "attachment"],
+        )
+        med_rows = [r for r in med_rows if r.get("petId") in pet_ids]
+        cur.executemany(
+            "INSERT INTO medical_history (id, petId, date, diagnosis, treatment, notes, attachment) VALUES (:id, :petId, :date, :diagnosis, :treatment, :notes, :attachment)",
+            med_rows,
+        )
 
-    wt_rows = ensure_keys(
-        data.get("weights", []),
-        ["id", "petId", "weight", "date"],
-    )
-    wt_rows = [r for r in wt_rows if r.get("petId") in pet_ids]
-    cur.executemany(
-        "INSERT INTO weights (id, petId, weight, date) VALUES (:id, :petId, :weight, :date)",
-        wt_rows,
-    )
+        vac_rows = ensure_keys(
+            data.get("vaccines", []),
+            ["id", "petId", "vaccineName", "dateGiven", "nextDue"],
+        )
+        vac_rows = [r for r in vac_rows if r.get("petId") in pet_ids]
+        cur.executemany(
+            "INSERT INTO vaccines (id, petId, vaccineName, dateGiven, nextDue) VALUES (:id, :petId, :vaccineName, :dateGiven, :nextDue)",
+            vac_rows,
+        )
 
-    appt_rows = ensure_keys(
-        data.get("appointments", []),
-        ["id", "petId", "date", "time", "reason", "vetId"],
-    )
-    appt_rows = [r for r in appt_rows if r.get("petId") in pet_ids]
-    cur.executemany(
-        "INSERT INTO appointments (id, petId, date, time, reason, vetId) VALUES (:id, :petId, :date, :time, :reason, :vetId)",
-        appt_rows,
-    )
+        wt_rows = ensure_keys(
+            data.get("weights", []),
+            ["id", "petId", "weight", "date"],
+        )
+        wt_rows = [r for r in wt_rows if r.get("petId") in pet_ids]
+        cur.executemany(
+            "INSERT INTO weights (id, petId, weight, date) VALUES (:id, :petId, :weight, :date)",
+            wt_rows,
+        )
+
+        appt_rows = ensure_keys(
+            data.get("appointments", []),
+            ["id", "petId", "date", "time", "reason", "vetId", "duration"],
+        )
+        appt_rows = [r for r in appt_rows if r.get("petId") in pet_ids]
+        cur.executemany(
+            "INSERT INTO appointments (id, petId, date, time, reason, vetId, duration) VALUES (:id, :petId, :date, :time, :reason, :vetId, :duration)",
+            appt_rows,
+        )
 
     conn.commit()
     if close_after:
         conn.close()
+
+
+# Row-level writes
+
+def _columns(table: str) -> List[str]:
+    if table not in TABLE_COLUMNS:
+        raise ValueError(f"unknown table: {table}")
+    return TABLE_COLUMNS[table]
+
+
+def _owner_or_none(cur: sqlite3.Cursor, owner_id: Any) -> Any:
+    # Same rule as replace_all: unknown owners become NULL
+    if not owner_id:
+        return None
+    row = cur.execute("SELECT 1 FROM users WHERE id = ?", (owner_id,)).fetchone()
+    return owner_id if row else None
+
+
+def insert_row(table: str, row: Dict[str, Any], conn: Optional[sqlite3.Connection] = None) -> None:
+    """Insert a single row. Raises sqlite3.IntegrityError on duplicate id or unknown petId."""
+    cols = _columns(table)
+    close_after = False
+    if conn is None:
+        conn = connect()
+        close_after = True
+    try:
+        cur = conn.cursor()
+        values = {k: row.get(k) for k in cols}
+        if table == "pets":
+            values["ownerId"] = _owner_or_none(cur, values["ownerId"])
+        placeholders = ", ".join(f":{k}" for k in cols)
+        cur.execute(
+            f"INSERT INTO {table} ({', '.join(cols)}) VALUES ({placeholders})",
+            values,
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        if close_after:
+            conn.close()
+
+
+def update_row(
+    table: str,
+    row_id: Any,
+    changes: Dict[str, Any],
+    conn: Optional[sqlite3.Connection] = None,
+) -> bool:
+    """Update known columns of one row. Returns False if the row does not exist."""
+    cols = [k for k in _columns(table) if k != "id" and k in changes]
+    close_after = False
+    if conn is None:
+        conn = connect()
+        close_after = True
+    try:
+        cur = conn.cursor()
+        values = {k: changes.get(k) for k in cols}
+        if table == "pets" and "ownerId" in values:
+            values["ownerId"] = _owner_or_none(cur, values["ownerId"])
+        if cols:
+            assignments = ", ".join(f"{k} = :{k}" for k in cols)
+            values["_id"] = row_id
+            cur.execute(f"UPDATE {table} SET {assignments} WHERE id = :_id", values)
+            found = cur.rowcount > 0
+        else:
+            found = cur.execute(f"SELECT 1 FROM {table} WHERE id = ?", (row_id,)).fetchone() is not None
+        conn.commit()
+        return found
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        if close_after:
+            conn.close()
+
+
+def delete_row(table: str, row_id: Any, conn: Optional[sqlite3.Connection] = None) -> bool:
+    """Delete one row; FK cascades remove/detach dependants. Returns False if missing."""
+    _columns(table)
+    close_after = False
+    if conn is None:
+        conn = connect()
+        close_after = True
+    try:
+        cur = conn.cursor()
+        cur.execute(f"DELETE FROM {table} WHERE id = ?", (row_id,))
+        conn.commit()
+        return cur.rowcount > 0
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        if close_after:
+            conn.close()
+
+
+# Row-level reads
+
+def _field(table: str, field: str) -> str:
+    if field not in _columns(table):
+        raise ValueError(f"unknown column: {table}.{field}")
+    return field
+
+
+def get_row(table: str, row_id: Any, conn: Optional[sqlite3.Connection] = None) -> Optional[Dict[str, Any]]:
+    conn = conn or pool.get()
+    cols = ", ".join(_columns(table))
+    row = conn.execute(f"SELECT {cols} FROM {table} WHERE id = ?", (row_id,)).fetchone()
+    return dict(row) if row else None
+
+
+def get_rows(table: str, row_ids: List[Any], conn: Optional[sqlite3.Connection] = None) -> Dict[Any, Dict[str, Any]]:
+    """Rows by id (missing ids are simply absent), in chunks under the variable limit."""
+    conn = conn or pool.get()
+    cols = ", ".join(_columns(table))
+    rows: Dict[Any, Dict[str, Any]] = {}
+    for i in range(0, len(row_ids), 500):
+        chunk = row_ids[i:i + 500]
+        marks = ", ".join("?" * len(chunk))
+        for row in conn.execute(f"SELECT {cols} FROM {table} WHERE id IN ({marks})", chunk):
+            rows[row["id"]] = dict(row)
+    return rows
+
+
+def find_rows(
+    table: str, field: str, value: Any, conn: Optional[sqlite3.Connection] = None
+) -> List[Dict[str, Any]]:
+    """Rows where field = value; served by the per-column indexes in schema.sql."""
+    conn = conn or pool.get()
+    cols = ", ".join(_columns(table))
+    q = f"SELECT {cols} FROM {table} WHERE {_field(table, field)} = ?"
+    return [dict(r) for r in conn.execute(q, (value,)).fetchall()]
+
+
+def first_row(
+    table: str, field: str, value: Any, conn: Optional[sqlite3.Connection] = None
+) -> Optional[Dict[str, Any]]:
+    conn = conn or pool.get()
+    cols = ", ".join(_columns(table))
+    q = f"SELECT {cols} FROM {table} WHERE {_field(table, field)} = ? LIMIT 1"
+    row = conn.execute(q, (value,)).fetchone()
+    return dict(row) if row else None
+
+
+def iter_rows(table: str, conn: sqlite3.Connection):
+    """Yield rows one at a time (cursor iteration, no fetchall)."""
+    cols = ", ".join(_columns(table))
+    for r in conn.execute(f"SELECT {cols} FROM {table}"):
+        yield dict(r)
+
+
+def all_rows(table: str, conn: Optional[sqlite3.Connection] = None) -> List[Dict[str, Any]]:
+    conn = conn or pool.get()
+    cols = ", ".join(_columns(table))
+    return [dict(r) for r in conn.execute(f"SELECT {cols} FROM {table}").fetchall()]
+
+
+# Aggregates (one query each, joined on pets)
+
+RECORD_TABLES = ["medical_history", "vaccines", "weights", "appointments"]
+
+
+def list_with_pets(table: str, conn: Optional[sqlite3.Connection] = None) -> List[Dict[str, Any]]:
+    """Every row of a per-pet table with its pet's name and owner."""
+    if table not in RECORD_TABLES:
+        raise ValueError(f"not a per-pet table: {table}")
+    conn = conn or pool.get()
+    cols = ", ".join(f"t.{c}" for c in _columns(table))
+    q = (
+        f"SELECT {cols}, p.name AS petName, p.ownerId AS ownerId "
+        f"FROM {table} t JOIN pets p ON p.id = t.petId ORDER BY t.rowid"
+    )
+    return [dict(r) for r in conn.execute(q).fetchall()]
+
+
+UPCOMING_APPOINTMENTS_SQL = (
+    "SELECT a.id, a.petId, a.date, a.time, a.reason, a.vetId, a.duration, p.name AS petName "
+    "FROM appointments a JOIN pets p ON p.id = a.petId "
+    "WHERE a.date >= ? ORDER BY a.date, a.time LIMIT ?"
+)
+VACCINES_DUE_SQL = (
+    "SELECT v.id, v.petId, v.vaccineName, v.dateGiven, v.nextDue, p.name AS petName, p.ownerId AS ownerId "
+    "FROM vaccines v JOIN pets p ON p.id = v.petId "
+    "WHERE v.dueDate >= ? AND v.dueDate <= ? ORDER BY v.dueDate LIMIT ?"
+)
+VACCINE_REMINDERS_SQL = (
+    "SELECT v.id, v.petId, v.vaccineName, v.dateGiven, v.nextDue, v.dueDate, p.name AS petName, "
+    "p.ownerId AS ownerId, u.name AS ownerName, u.email AS ownerEmail, u.phone AS ownerPhone "
+    "FROM vaccines v JOIN pets p ON p.id = v.petId LEFT JOIN users u ON u.id = p.ownerId "
+    "WHERE v.dueDate >= ? AND v.dueDate <= ? ORDER BY v.dueDate LIMIT ?"
+)
+# petId is a NOT NULL foreign key, so no join is needed to match the reminder rows
+VACCINES_DUE_COUNT_SQL = "SELECT COUNT(*) FROM vaccines WHERE dueDate >= ? AND dueDate <= ?"
+VET_SCHEDULE_SQL = (
+    "SELECT a.id, a.petId, a.date, a.time, a.reason, a.vetId, a.duration, p.name AS petName "
+    "FROM appointments a JOIN pets p ON p.id = a.petId "
+    "WHERE a.vetId = ? AND a.date = ? ORDER BY a.time"
+)
+WEIGHT_SERIES_SQL = "SELECT date, weight FROM weights WHERE petId = ? ORDER BY date"
+WEIGHT_POINTS_SQL = "SELECT petId, date, weight FROM weights ORDER BY petId, date"
+
+
+def upcoming_appointments(today: str, limit: int = 50, conn: Optional[sqlite3.Connection] = None) -> List[Dict[str, Any]]:
+    conn = conn or pool.get()
+    return [dict(r) for r in conn.execute(UPCOMING_APPOINTMENTS_SQL, (today, limit)).fetchall()]
+
+
+def vaccines_due(
+    today: str, until: str, limit: int = 50, conn: Optional[sqlite3.Connection] = None
+) -> List[Dict[str, Any]]:
+    conn = conn or pool.get()
+    return [dict(r) for r in conn.execute(VACCINES_DUE_SQL, (today, until, limit)).fetchall()]
+
+
+def vaccine_reminders(
+    start: str, until: str, limit: int = 1000, conn: Optional[sqlite3.Connection] = None
+) -> List[Dict[str, Any]]:
+    """Vaccines whose normalised due date is in [start, until], soonest first, with owner contact.
+
+    A range seek on idx_vaccines_due_date: O(log n + k).
+    """
+    conn = conn or pool.get()
+    return [dict(r) for r in conn.execute(VACCINE_REMINDERS_SQL, (start, until, limit)).fetchall()]
+
+
+def vaccines_due_count(start: str, until: str, conn: Optional[sqlite3.Connection] = None) -> int:
+    """How many vaccines vaccine_reminders would return without a limit (index-only count)."""
+    conn = conn or pool.get()
+    return conn.execute(VACCINES_DUE_COUNT_SQL, (start, until)).fetchone()[0]
+
+
+def vet_schedule(vet_id: str, day: str, conn: Optional[sqlite3.Connection] = None) -> List[Dict[str, Any]]:
+    """One vet's appointments on one day, in time order."""
+    conn = conn or pool.get()
+    return [dict(r) for r in conn.execute(VET_SCHEDULE_SQL, (vet_id, day)).fetchall()]
+
+
+def weight_series(pet_id: str, conn: Optional[sqlite3.Connection] = None) -> List[Dict[str, Any]]:
+    """(date, weight) points for one pet, oldest first."""
+    conn = conn or pool.get()
+    return [dict(r) for r in conn.execute(WEIGHT_SERIES_SQL, (pet_id,)).fetchall()]
+
+
+def weight_points(conn: Optional[sqlite3.Connection] = None):
+    """Yield (petId, date, weight) for every weight row, read off the covering index."""
+    conn = conn or pool.get()
+    for r in conn.execute(WEIGHT_POINTS_SQL):
+        yield tuple(r)
+
+
+def dashboard_counts(today: str, until: str, conn: Optional[sqlite3.Connection] = None) -> Dict[str, int]:
+    conn = conn or pool.get()
+    row = conn.execute(
+        "SELECT "
+        "(SELECT COUNT(*) FROM pets) AS pets, "
+        "(SELECT COUNT(*) FROM users WHERE role = 'owner') AS owners, "
+        "(SELECT COUNT(*) FROM appointments WHERE date >= :today) AS upcomingAppointments, "
+        "(SELECT COUNT(*) FROM vaccines WHERE dueDate >= :today AND dueDate <= :until) AS vaccinesDue",
+        {"today": today, "until": until},
+    ).fetchone()
+    return dict(row)
+
+
+# Keyset pagination
+
+# Per-pet tables page by (date column, rowid); pets/users by rowid (insertion order).
+# The (petId) indexes already end in rowid, so idx_<table>_pet serves the WHERE;
+# see migrations.py for the (petId, date) indexes that serve the ORDER BY too.
+SORT_COLUMNS: Dict[str, Optional[str]] = {
+    "users": None,
+    "pets": None,
+    "medical_history": "date",
+    "vaccines": "dateGiven",
+    "weights": "date",
+    "appointments": "date",
+}
+
+
+def encode_cursor(values: List[Any]) -> str:
+    raw = json.dumps(values, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> List[Any]:
+    """Raises ValueError on a malformed cursor."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except Exception as e:
+        raise ValueError("invalid cursor") from e
+    if not isinstance(values, list) or not values:
+        raise ValueError("invalid cursor")
+    return values
+
+
+def page_rows(
+    table: str,
+    field: Optional[str] = None,
+    value: Any = None,
+    limit: Optional[int] = None,
+    after: Optional[List[Any]] = None,
+    fields: Optional[List[str]] = None,
+    conn: Optional[sqlite3.Connection] = None,
+):
+    """One page of rows (optionally WHERE field = value) in stable order.
+
+    Returns (rows, next_key); next_key is None on the last page and is what
+    `after` expects for the following page.
+    """
+    conn = conn or pool.get()
+    cols = fields or _columns(table)
+    sort_col = SORT_COLUMNS[table]
+    select = ", ".join(_field(table, c) for c in cols)
+    where, params = [], []
+    if field is not None:
+        where.append(f"{_field(table, field)} = ?")
+        params.append(value)
+    order = _keyset(sort_col, after, where, params)
+    extra = f", {sort_col} AS _sort" if sort_col else ""
+    q = f"SELECT rowid AS _rowid{extra}, {select} FROM {table}"
+    if where:
+        q += " WHERE " + " AND ".join(where)
+    q += f" ORDER BY {order}"
+    if limit is not None:
+        q += " LIMIT ?"
+        params.append(limit + 1)
+    return _keyset_page(conn.execute(q, params).fetchall(), limit, sort_col)
+
+
+def _keyset(sort_col: Optional[str], after: Optional[List[Any]], where: List[str], params: List[Any], alias: str = "") -> str:
+    """Add the "after this key" condition to where/params; returns the ORDER BY."""
+    rowid = f"{alias}rowid"
+    sort = f"{alias}{sort_col}" if sort_col else None
+    if after is not None:
+        if sort is None:
+            where.append(f"{rowid} > ?")
+            params.append(after[-1])
+        elif after[0] is None:
+            # NULLs sort first
+            where.append(f"(({sort} IS NULL AND {rowid} > ?) OR {sort} IS NOT NULL)")
+            params.append(after[-1])
+        else:
+            # Row value comparison lets SQLite seek in the (petId, date) index
+            where.append(f"({sort}, {rowid}) > (?, ?)")
+            params.extend([after[0], after[-1]])
+    return f"{sort}, {rowid}" if sort else rowid
+
+
+def _keyset_page(rows: List[sqlite3.Row], limit: Optional[int], sort_col: Optional[str]):
+    """Trim the LIMIT+1 probe row; (rows without the _rowid/_sort keys, next_key)."""
+    next_key = None
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_key = [last["_sort"], last["_rowid"]] if sort_col else [last["_rowid"]]
+    out = []
+    for r in rows:
+        d = dict(r)
+        d.pop("_rowid", None)
+        d.pop("_sort", None)
+        out.append(d)
+    return out, next_key
+
+
+# Joined pet fields list_with_pets/page_with_pets add to each record
+PET_COLUMNS = ["petName", "ownerId"]
+
+
+def page_with_pets(
+    table: str,
+    limit: Optional[int] = None,
+    after: Optional[List[Any]] = None,
+    fields: Optional[List[str]] = None,
+    conn: Optional[sqlite3.Connection] = None,
+):
+    """list_with_pets in page_rows order and pages (idx_<table>_keyset serves both)."""
+    if table not in RECORD_TABLES:
+        raise ValueError(f"not a per-pet table: {table}")
+    conn = conn or pool.get()
+    sort_col = SORT_COLUMNS[table]
+    pet_cols = {"petName": "p.name AS petName", "ownerId": "p.ownerId AS ownerId"}
+    select = ", ".join(pet_cols[c] if c in pet_cols else f"t.{_field(table, c)}" for c in (fields or _columns(table) + PET_COLUMNS))
+    where: List[str] = []
+    params: List[Any] = []
+    order = _keyset(sort_col, after, where, params, alias="t.")
+    q = f"SELECT t.rowid AS _rowid, t.{sort_col} AS _sort, {select} FROM {table} t JOIN pets p ON p.id = t.petId"
+    if where:
+        q += " WHERE " + " AND ".join(where)
+    q += f" ORDER BY {order}"
+    if limit is not None:
+        q += " LIMIT ?"
+        params.append(limit + 1)
+    return _keyset_page(conn.execute(q, params).fetchall(), limit, sort_col)
+
+
+# Full-text search (medical_fts, see migrations.py)
+
+SEARCH_MEDICAL_SQL = (
+    "SELECT m.id, m.petId, m.date, m.diagnosis, m.treatment, m.notes, p.name AS petName, p.ownerId AS ownerId, "
+    "snippet(medical_fts, -1, '[', ']', '...', 12) AS snippet, bm25(medical_fts) AS score "
+    "FROM medical_fts JOIN medical_history m ON m.rowid = medical_fts.rowid JOIN pets p ON p.id = m.petId "
+    "WHERE medical_fts MATCH :q"
+)
+
+
+def fts_query(text: str) -> str:
+    """User text -> FTS5 query matching every word (quoted, so no operator injection)."""
+    return " ".join(f'"{w}"' for w in re.findall(r"\w+", text or ""))
+
+
+def search_medical(
+    text: str,
+    pet_id: Optional[str] = None,
+    owner_id: Optional[str] = None,
+    limit: int = 20,
+    offset: int = 0,
+    conn: Optional[sqlite3.Connection] = None,
+) -> Tuple[List[Dict[str, Any]], bool]:
+    """BM25-ranked medical records matching all words of `text`; returns (rows, has_more)."""
+    q = fts_query(text)
+    if not q:
+        return [], False
+    conn = conn or pool.get()
+    sql = SEARCH_MEDICAL_SQL
+    params: Dict[str, Any] = {"q": q, "limit": limit + 1, "offset": offset}
+    if pet_id:
+        sql += " AND m.petId = :pet"
+        params["pet"] = pet_id
+    if owner_id:
+        sql += " AND p.ownerId = :owner"
+        params["owner"] = owner_id
+    sql += " ORDER BY score, m.rowid LIMIT :limit OFFSET :offset"
+    rows = [dict(r) for r in conn.execute(sql, params).fetchall()]
+    return rows[:limit], len(rows) > limit
+
+
+# Query plans
+
+# Hot queries with representative parameters; each must be served by an index
+HOT_QUERIES: Dict[str, tuple] = {
+    "upcoming_appointments": (UPCOMING_APPOINTMENTS_SQL, ("2000-01-01", 50)),
+    "vaccines_due": (VACCINES_DUE_SQL, ("2000-01-01", "2000-01-08", 50)),
+    "vaccine_reminders": (VACCINE_REMINDERS_SQL, ("", "2000-01-08", 1000)),
+    "vaccines_due_count": (VACCINES_DUE_COUNT_SQL, ("", "2000-01-08")),
+    "vet_schedule": (VET_SCHEDULE_SQL, ("vet", "2000-01-01")),
+    "weight_series": (WEIGHT_SERIES_SQL, ("pet",)),
+    "weight_points": (WEIGHT_POINTS_SQL, ()),
+    "records_page": (
+        "SELECT t.rowid, t.date, t.id, p.name FROM medical_history t JOIN pets p ON p.id = t.petId "
+        "WHERE (t.date, t.rowid) > (?, ?) ORDER BY t.date, t.rowid LIMIT ?",
+        ("2000-01-01", 0, 51),
+    ),
+}
+
+
+def query_plan(sql: str, params: tuple = (), conn: Optional[sqlite3.Connection] = None) -> List[str]:
+    conn = conn or pool.get()
+    return [r[3] for r in conn.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()]
+
+
+def check_query_plans(conn: Optional[sqlite3.Connection] = None) -> Dict[str, List[str]]:
+    """Plan steps that full-scan a table or sort in a temp B-tree, per hot query.
+
+    An empty dict means every hot query is index-driven.
+    """
+    problems: Dict[str, List[str]] = {}
+    for name, (sql, params) in HOT_QUERIES.items():
+        bad = [
+            step
+            for step in query_plan(sql, params, conn)
+            if "TEMP B-TREE" in step or (step.startswith("SCAN") and " USING " not in step)
+        ]
+        if bad:
+            problems[name] = bad
+    return problems
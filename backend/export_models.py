@@ -0,0 +1,84 @@
+"""One-shot export of the vet QA model for the int8 / onnx inference backends.
+
+    python3 export_models.py                 # ONNX export (encoder + decoder with KV-cache)
+    python3 export_models.py --quantize      # ONNX export + dynamic int8 quantisation
+    python3 export_models.py --torch-int8    # quantised PyTorch state dict
+
+The ONNX export needs the optional packages: pip install -r requirements-onnx.txt
+Then start the app with VET_QA_BACKEND=onnx (or int8). Exports are kept per
+model id (backend/model/vet_qa_onnx/<model>/, backend/model/vet_qa_int8/<model>.pt)
+with the source model recorded next to them; the app ignores an export made
+from a different VET_QA_MODEL.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import shutil
+
+from llm_backend import DEFAULT_MODEL, int8_path, onnx_dir, record_source
+
+
+def export_onnx(model_name: str, out_dir: str, quantize: bool) -> None:
+    from optimum.onnxruntime import ORTModelForSeq2SeqLM
+    from transformers import AutoTokenizer
+
+    model = ORTModelForSeq2SeqLM.from_pretrained(model_name, export=True, use_cache=True)
+    model.save_pretrained(out_dir)
+    AutoTokenizer.from_pretrained(model_name).save_pretrained(out_dir)
+    print("Exported ONNX model to:", out_dir)
+
+    if quantize:
+        quantize_onnx(out_dir)
+    record_source(out_dir, model_name)
+
+
+def quantize_onnx(out_dir: str) -> None:
+    """Dynamic int8 quantisation of every graph in out_dir, in place."""
+    from optimum.onnxruntime import ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+
+    qconfig = AutoQuantizationConfig.avx512_vnni(is_static=False, per_channel=False)
+    tmp_dir = out_dir + ".int8"
+    for onnx_file in sorted(f for f in os.listdir(out_dir) if f.endswith(".onnx")):
+        quantizer = ORTQuantizer.from_pretrained(out_dir, file_name=onnx_file)
+        quantizer.quantize(save_dir=tmp_dir, quantization_config=qconfig)
+    # Keep the original file names so ORTModelForSeq2SeqLM finds them
+    for f in os.listdir(tmp_dir):
+        src = os.path.join(tmp_dir, f)
+        if f.endswith("_quantized.onnx"):
+            os.replace(src, os.path.join(out_dir, f.replace("_quantized.onnx", ".onnx")))
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    print("Applied dynamic int8 quantisation to:", out_dir)
+
+
+def export_torch_int8(model_name: str, out_path: str) -> None:
+    import torch
+    from llm_backend import _load_torch, quantize_int8
+
+    model = quantize_int8(_load_torch(model_name, low_mem=True))
+    torch.save(model.state_dict(), out_path)
+    record_source(out_path, model_name)
+    print("Saved int8 state dict to:", out_path)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=os.environ.get("VET_QA_MODEL", DEFAULT_MODEL))
+    parser.add_argument("--out", help="ONNX output directory (default: per model under backend/model/vet_qa_onnx)")
+    parser.add_argument("--quantize", action="store_true", help="dynamic int8 quantisation of the ONNX graphs")
+    parser.add_argument("--torch-int8", action="store_true", help="save a quantised PyTorch state dict instead")
+    args = parser.parse_args()
+
+    if args.torch_int8:
+        out = int8_path(args.model)
+        os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+        export_torch_int8(args.model, out)
+    else:
+        out = args.out or onnx_dir(args.model)
+        os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+        export_onnx(args.model, out, args.quantize)
+
+
+if __name__ == "__main__":
+    main()
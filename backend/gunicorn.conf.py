@@ -0,0 +1,26 @@
+"""gunicorn settings for multi-worker mode: gunicorn -c gunicorn.conf.py wsgi:app
+
+Every setting can be overridden with the PETMS_* variables below. Each
+worker loads its own copy of the LLM when VET_QA_WARMUP=1 (the default), so
+size PETMS_WORKERS to the memory available.
+"""
+import os
+
+bind = os.environ.get("PETMS_BIND", "127.0.0.1:5000")
+workers = int(os.environ.get("PETMS_WORKERS", 2))
+threads = int(os.environ.get("PETMS_THREADS", 4))
+worker_class = "gthread"
+# LLM generation can take tens of seconds on CPU
+timeout = int(os.environ.get("PETMS_TIMEOUT", 120))
+graceful_timeout = 30
+accesslog = os.environ.get("PETMS_ACCESS_LOG", "-") or None
+
+
+def on_starting(server):
+    # Migrate the schema (and import data.json) once, before the workers fork
+    from app import prepare_db
+
+    try:
+        prepare_db()
+    except Exception as e:
+        print(f"Error preparing database: {e}")
@@ -7,13 +7,28 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 if BASE_DIR not in sys.path:
     sys.path.insert(0, BASE_DIR)
 
-from db import DB_FILE, init_db, replace_all
+from auth import hash_legacy_passwords
+from db import DB_FILE, check_query_plans, connect, init_db, replace_all
 
 
 DATA_FILE = os.path.join(BASE_DIR, "data.json")
 
 
+def check_plans() -> None:
+    """Exit non-zero if a hot query would full-scan or sort (python init_db.py --check-plans)."""
+    init_db()
+    conn = connect()
+    problems = check_query_plans(conn)
+    conn.close()
+    for name, steps in problems.items():
+        print(f"{name}: {'; '.join(steps)}")
+    print("Query plans OK." if not problems else "Query plans need an index.")
+    sys.exit(1 if problems else 0)
+
+
 def main() -> None:
+    if "--check-plans" in sys.argv[1:]:
+        check_plans()
     print("Initializing database at:", DB_FILE)
     init_db()
 
@@ -49,6 +64,10 @@ def main() -> None:
         )
         print("Created empty tables.")
 
+    if "--hash-passwords" in sys.argv[1:]:
+        # Otherwise plaintext passwords are hashed on each user's next login
+        print(f"Hashed {hash_legacy_passwords()} plaintext passwords.")
+
     print("Done.")
 
 
@@ -0,0 +1,132 @@
+import os
+import re
+from typing import Any, Optional, Tuple
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_MODEL = "ahmed807762/flan-t5-base-veterinaryQA_data-v2"
+# Exports live in one subdirectory / file per model id
+DEFAULT_ONNX_DIR = os.path.join(BASE_DIR, "model", "vet_qa_onnx")
+DEFAULT_INT8_DIR = os.path.join(BASE_DIR, "model", "vet_qa_int8")
+# Next to every export: the model id it was made from
+SOURCE_SUFFIX = ".source"
+
+# VET_QA_BACKEND values
+BACKENDS = ("torch", "int8", "onnx")
+
+
+def selected_model() -> str:
+    return os.environ.get("VET_QA_MODEL", DEFAULT_MODEL)
+
+
+def _slug(model_name: str) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", model_name)
+
+
+def onnx_dir(model_name: str) -> str:
+    """Where export_models.py puts model_name's ONNX export (VET_QA_ONNX_DIR overrides)."""
+    return os.environ.get("VET_QA_ONNX_DIR") or os.path.join(DEFAULT_ONNX_DIR, _slug(model_name))
+
+
+def int8_path(model_name: str) -> str:
+    """Where export_models.py puts model_name's int8 state dict (VET_QA_INT8_PATH overrides)."""
+    return os.environ.get("VET_QA_INT8_PATH") or os.path.join(DEFAULT_INT8_DIR, _slug(model_name) + ".pt")
+
+
+def record_source(path: str, model_name: str) -> None:
+    with open(path.rstrip("/\\") + SOURCE_SUFFIX, "w", encoding="utf-8") as f:
+        f.write(model_name)
+
+
+def _export_for(path: str, model_name: str) -> Optional[str]:
+    """path if it exists and was exported from model_name, else None (with a note why)."""
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path.rstrip("/\\") + SOURCE_SUFFIX, encoding="utf-8") as f:
+            source = f.read().strip()
+    except OSError:
+        source = None
+    if source != model_name:
+        print(f"Ignoring {path}: exported from {source or 'an unknown model'}, not {model_name} (re-run export_models.py)")
+        return None
+    return path
+
+
+def selected_backend() -> str:
+    backend = os.environ.get("VET_QA_BACKEND", "torch").strip().lower()
+    if backend not in BACKENDS:
+        print(f"Unknown VET_QA_BACKEND={backend!r}, using torch")
+        return "torch"
+    return backend
+
+
+def _load_torch(model_name: str, low_mem: bool):
+    import torch
+    from transformers import AutoModelForSeq2SeqLM
+
+    try:
+        return AutoModelForSeq2SeqLM.from_pretrained(
+            model_name,
+            dtype=torch.float32,
+            low_cpu_mem_usage=low_mem,
+        )
+    except TypeError:
+        # Older transformers
+        return AutoModelForSeq2SeqLM.from_pretrained(
+            model_name,
+            torch_dtype=torch.float32,
+            low_cpu_mem_usage=low_mem,
+        )
+
+
+def quantize_int8(model):
+    """Dynamic int8 quantisation of every nn.Linear (CPU only)."""
+    import torch
+
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def _load_int8(model_name: str):
+    """Quantised weights from export_models.py if present, otherwise quantise on load."""
+    import torch
+    from transformers import AutoConfig, AutoModelForSeq2SeqLM
+
+    path = _export_for(int8_path(model_name), model_name)
+    if path is not None:
+        mdl = quantize_int8(AutoModelForSeq2SeqLM.from_config(AutoConfig.from_pretrained(model_name)))
+        mdl.load_state_dict(torch.load(path, map_location="cpu"))
+        return mdl
+    return quantize_int8(_load_torch(model_name, low_mem=True))
+
+
+def _load_onnx(model_name: str):
+    from optimum.onnxruntime import ORTModelForSeq2SeqLM
+
+    path = _export_for(onnx_dir(model_name), model_name)
+    if path is not None:
+        return ORTModelForSeq2SeqLM.from_pretrained(path, use_cache=True), path
+    print(f"No ONNX export of {model_name}; exporting in-process (run export_models.py to avoid this)")
+    return ORTModelForSeq2SeqLM.from_pretrained(model_name, export=True, use_cache=True), model_name
+
+
+def load_seq2seq(model_name: str, backend: str, device: str) -> Tuple[Any, Any, str]:
+    """Return (model, tokenizer, device) for the requested backend.
+
+    int8 and onnx always run on CPU.
+    """
+    from transformers import AutoTokenizer
+
+    if backend == "onnx":
+        mdl, tok_src = _load_onnx(model_name)
+        return mdl, AutoTokenizer.from_pretrained(tok_src), "cpu"
+
+    tok = AutoTokenizer.from_pretrained(model_name)
+    if backend == "int8":
+        mdl = _load_int8(model_name)
+        mdl.eval()
+        return mdl, tok, "cpu"
+
+    mdl = _load_torch(model_name, low_mem=False)
+    mdl.eval()
+    return mdl, tok, device
@@ -0,0 +1,119 @@
+import json
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional
+
+import metrics
+
+
+class _Request:
+    __slots__ = ("prompt", "gen_kwargs", "key", "future", "enqueued")
+
+    def __init__(self, prompt: str, gen_kwargs: Dict[str, Any]):
+        self.prompt = prompt
+        self.gen_kwargs = gen_kwargs
+        # Only identical generation settings can share a generate() call
+        self.key = json.dumps(gen_kwargs, sort_keys=True, default=str)
+        self.future: Future = Future()
+        self.enqueued = time.perf_counter()
+
+
+class GenerationBatcher:
+    """Dynamic micro-batching in front of a text2text pipeline.
+
+    Requests arriving within `max_wait` seconds of the first queued one are
+    grouped (up to `max_batch`, per identical gen kwargs) into one padded
+    batch generate() call on a single worker thread.
+    """
+
+    def __init__(
+        self,
+        get_pipe: Callable[[], Any],
+        max_batch: int = 8,
+        max_wait: float = 0.015,
+    ):
+        self.get_pipe = get_pipe
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max(0.0, max_wait)
+        self._queue: "queue.Queue[_Request]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        # Counters
+        self.batches = 0
+        self.requests = 0
+
+    def _ensure_worker(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="llm-batcher", daemon=True)
+                self._thread.start()
+
+    def submit(self, prompt: str, **gen_kwargs) -> Future:
+        req = _Request(prompt, gen_kwargs)
+        self._ensure_worker()
+        self._queue.put(req)
+        return req.future
+
+    def generate(self, prompt: str, timeout: Optional[float] = None, **gen_kwargs) -> str:
+        """Blocking helper: same result as pipe(prompt, **kw)[0]["generated_text"]."""
+        return self.submit(prompt, **gen_kwargs).result(timeout=timeout)
+
+    def _collect(self) -> List[_Request]:
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            groups: Dict[str, List[_Request]] = {}
+            for req in batch:
+                groups.setdefault(req.key, []).append(req)
+            for reqs in groups.values():
+                self._run_group(reqs)
+
+    def _run_group(self, reqs: List[_Request]) -> None:
+        pending = [r for r in reqs if r.future.set_running_or_notify_cancel()]
+        if not pending:
+            return
+        try:
+            pipe = self.get_pipe()
+            if pipe is None:
+                raise RuntimeError("veterinary QA model not available")
+            prompts = [r.prompt for r in pending]
+            started = time.perf_counter()
+            for r in pending:
+                metrics.LLM_QUEUE_SECONDS.observe(started - r.enqueued)
+            outputs = pipe(prompts, batch_size=len(prompts), **pending[0].gen_kwargs)
+            metrics.LLM_GENERATE_SECONDS.observe(time.perf_counter() - started, "batch")
+            metrics.LLM_BATCH_SIZE.observe(len(pending))
+            self.batches += 1
+            self.requests += len(pending)
+            for req, out in zip(pending, outputs):
+                if isinstance(out, list):
+                    out = out[0]
+                req.future.set_result(out["generated_text"].strip())
+        except Exception as e:
+            for req in pending:
+                if not req.future.done():
+                    req.future.set_exception(e)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "batches": self.batches,
+            "requests": self.requests,
+            "queued": self._queue.qsize(),
+            "avg_batch": (self.requests / self.batches) if self.batches else 0.0,
+        }
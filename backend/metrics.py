@@ -0,0 +1,247 @@
+"""In-process metrics in the Prometheus text exposition format.
+
+Counters and histograms live in REGISTRY and are rendered by GET /metrics.
+PETMS_METRICS=0 turns off the SQLite query timing (the HTTP, snapshot and
+LLM metrics are a few perf_counter() calls and always on).
+"""
+import os
+import sqlite3
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+
+ENABLED = os.environ.get("PETMS_METRICS", "1") == "1"
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUERY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.1, 0.5, 1.0)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _num(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_labels(self.labels, key)} {_num(value)}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram; each label set keeps bucket counts, sum and count."""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, *label_values: str) -> None:
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                # per-bucket counts, then +Inf, sum, count
+                series = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        for key, series in items:
+            running = 0
+            for bound, n in zip(self.buckets + (float("inf"),), series):
+                running += n
+                le = 'le="%s"' % _num(bound)
+                lines.append(f"{self.name}_bucket{_labels(self.labels, key, le)} {running}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, key)} {_num(series[-2])}")
+            lines.append(f"{self.name}_count{_labels(self.labels, key)} {series[-1]}")
+        return lines
+
+
+class Gauge:
+    """Read at scrape time from a callback."""
+
+    def __init__(self, name: str, help: str, fn: Callable[[], Optional[float]]):
+        self.name, self.help, self.fn = name, help, fn
+
+    def render(self) -> List[str]:
+        try:
+            value = self.fn()
+        except Exception:
+            value = None
+        if value is None:
+            return []
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge", f"{self.name} {_num(value)}"]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def _add(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        return self._add(Counter(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, help, labels, buckets))
+
+    def gauge(self, name: str, help: str, fn: Callable[[], Optional[float]]) -> Gauge:
+        with self._lock:
+            # Re-registering replaces the callback (e.g. a new store after fallback)
+            self._metrics[name] = Gauge(name, help, fn)
+            return self._metrics[name]
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+HTTP_REQUESTS = REGISTRY.counter("petms_http_requests_total", "HTTP requests by route and status.", ("method", "route", "status"))
+HTTP_SECONDS = REGISTRY.histogram("petms_http_request_duration_seconds", "Request latency by route.", ("method", "route"))
+HTTP_DB_QUERIES = REGISTRY.counter("petms_http_db_queries_total", "SQLite statements run while serving each route.", ("route",))
+HTTP_DB_SECONDS = REGISTRY.counter("petms_http_db_seconds_total", "Time in SQLite statements while serving each route.", ("route",))
+DB_SECONDS = REGISTRY.histogram("petms_db_query_duration_seconds", "SQLite statement time by kind.", ("op",), QUERY_BUCKETS)
+SNAPSHOT_SECONDS = REGISTRY.histogram("petms_snapshot_duration_seconds", "data.json export (serialise + fsync) time.")
+SNAPSHOT_FAILURES = REGISTRY.counter("petms_snapshot_failures_total", "Failed data.json exports.")
+LLM_QUEUE_SECONDS = REGISTRY.histogram("petms_llm_queue_wait_seconds", "Time an LLM prompt waited for its batch.")
+LLM_GENERATE_SECONDS = REGISTRY.histogram("petms_llm_generate_seconds", "LLM generate() time per call.", ("path",))
+LLM_BATCH_SIZE = REGISTRY.histogram("petms_llm_batch_size", "Prompts per batched generate() call.", buckets=SIZE_BUCKETS)
+
+
+# SQLite statement timing (db.connect uses this factory)
+QUERY_OPS = {"select", "insert", "update", "delete", "with", "pragma", "begin", "commit", "rollback", "create", "drop"}
+_request = threading.local()
+
+
+def _record_query(sql: str, seconds: float) -> None:
+    head = sql[:64].split(None, 1)
+    op = head[0].lower() if head else "other"
+    DB_SECONDS.observe(seconds, op if op in QUERY_OPS else "other")
+    if getattr(_request, "active", False):
+        _request.queries += 1
+        _request.db_seconds += seconds
+
+
+class TimedCursor(sqlite3.Cursor):
+    """Cursor whose execute*() calls are timed like TimedConnection's."""
+
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            _record_query(sql, time.perf_counter() - start)
+
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            _record_query(sql, time.perf_counter() - start)
+
+    def executescript(self, sql_script):
+        start = time.perf_counter()
+        try:
+            return super().executescript(sql_script)
+        finally:
+            _record_query(sql_script, time.perf_counter() - start)
+
+
+class TimedConnection(sqlite3.Connection):
+    """sqlite3.Connection that times execute*() calls, its own and its cursors'.
+
+    Only the statement's first step is inside execute(); rows fetched lazily
+    afterwards (iter_rows, streaming exports) are not counted.
+    """
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            _record_query(sql, time.perf_counter() - start)
+
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            _record_query(sql, time.perf_counter() - start)
+
+    def executescript(self, sql_script):
+        start = time.perf_counter()
+        try:
+            return super().executescript(sql_script)
+        finally:
+            _record_query(sql_script, time.perf_counter() - start)
+
+
+def connection_factory():
+    return TimedConnection if ENABLED else sqlite3.Connection
+
+
+# Per-request accounting (called from the app's before/after_request hooks)
+def begin_request() -> float:
+    _request.active = True
+    _request.queries = 0
+    _request.db_seconds = 0.0
+    return time.perf_counter()
+
+
+def end_request(started: float, method: str, route: str, status: int) -> Tuple[float, int, float]:
+    """Record the request; returns (seconds, db queries, db seconds)."""
+    seconds = time.perf_counter() - started
+    queries, db_seconds = getattr(_request, "queries", 0), getattr(_request, "db_seconds", 0.0)
+    _request.active = False
+    HTTP_REQUESTS.inc(method, route, str(status))
+    HTTP_SECONDS.observe(seconds, method, route)
+    if queries:
+        HTTP_DB_QUERIES.inc(route, amount=queries)
+        HTTP_DB_SECONDS.inc(route, amount=db_seconds)
+    return seconds, queries, db_seconds
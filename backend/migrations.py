@@ -0,0 +1,275 @@
+"""Versioned schema migrations tracked in PRAGMA user_version.
+
+Version 1 is schema.sql (the baseline every existing petms.db already has,
+everything in it is IF NOT EXISTS). Append new steps to MIGRATIONS; never
+edit one that has shipped. Each step runs in its own BEGIN IMMEDIATE
+transaction together with the version bump, so a crash leaves the DB at
+the previous version and concurrent processes migrate only once.
+"""
+import os
+import sqlite3
+from typing import Callable, List, Tuple, Union
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SCHEMA_FILE = os.path.join(BASE_DIR, "schema.sql")
+
+# A step is SQL text (one or more statements) or a callable taking the connection
+Step = Union[str, Callable[[sqlite3.Connection], None]]
+
+
+def split_sql(script: str) -> List[str]:
+    """Split a script into complete statements (trigger bodies stay whole)."""
+    statements, buf = [], ""
+    for line in script.splitlines(keepends=True):
+        buf += line
+        if sqlite3.complete_statement(buf):
+            if buf.strip():
+                statements.append(buf.strip())
+            buf = ""
+    if buf.strip() and not buf.strip().startswith("--"):
+        statements.append(buf.strip())
+    return statements
+
+
+def _run_sql(conn: sqlite3.Connection, script: str) -> None:
+    for stmt in split_sql(script):
+        conn.execute(stmt)
+
+
+def _baseline(conn: sqlite3.Connection) -> None:
+    with open(SCHEMA_FILE, "r", encoding="utf-8") as f:
+        _run_sql(conn, f.read())
+
+
+def add_column(table: str, column: str, decl: str) -> Callable[[sqlite3.Connection], None]:
+    """Step that adds a column unless it is already there (ADD COLUMN is O(1) in SQLite)."""
+
+    def step(conn: sqlite3.Connection) -> None:
+        existing = {r[1] for r in conn.execute(f"PRAGMA table_info({table})")}
+        if column not in existing:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+    return step
+
+
+def due_date_sql(col: str) -> str:
+    """SQL for nextDue text -> ISO date (YYYY-MM-DD, YYYY/MM/DD, DD.MM.YYYY, DD/MM/YYYY); NULL if unparseable."""
+    v = f"trim({col})"
+    return (
+        f"date(CASE "
+        f"WHEN {v} GLOB '[0-9][0-9][0-9][0-9][-/.][0-9][0-9][-/.][0-9][0-9]*' "
+        f"THEN substr({v}, 1, 4) || '-' || substr({v}, 6, 2) || '-' || substr({v}, 9, 2) "
+        f"WHEN {v} GLOB '[0-9][0-9][-/.][0-9][0-9][-/.][0-9][0-9][0-9][0-9]*' "
+        f"THEN substr({v}, 7, 4) || '-' || substr({v}, 4, 2) || '-' || substr({v}, 1, 2) "
+        f"END)"
+    )
+
+
+def _vaccine_due_dates(conn: sqlite3.Connection) -> None:
+    # Triggers keep dueDate in step with every write path (API, bulk, replace_all)
+    add_column("vaccines", "dueDate", "TEXT")(conn)
+    _run_sql(
+        conn,
+        f"""
+        UPDATE vaccines SET dueDate = {due_date_sql("nextDue")};
+        CREATE INDEX IF NOT EXISTS idx_vaccines_due_date ON vaccines(dueDate);
+        DROP INDEX IF EXISTS idx_vaccines_next_due;
+        CREATE TRIGGER IF NOT EXISTS trg_vaccines_due_insert AFTER INSERT ON vaccines BEGIN
+          UPDATE vaccines SET dueDate = {due_date_sql("NEW.nextDue")} WHERE rowid = NEW.rowid;
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_vaccines_due_update AFTER UPDATE OF nextDue ON vaccines BEGIN
+          UPDATE vaccines SET dueDate = {due_date_sql("NEW.nextDue")} WHERE rowid = NEW.rowid;
+        END;
+        """,
+    )
+
+
+def _medical_fts(conn: sqlite3.Connection) -> None:
+    # External-content index: the text lives once, in medical_history
+    try:
+        conn.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS medical_fts USING fts5("
+            "diagnosis, treatment, notes, content='medical_history', content_rowid='rowid', "
+            "tokenize='porter unicode61 remove_diacritics 2')"
+        )
+    except sqlite3.OperationalError as e:
+        print(f"SQLite has no FTS5, medical search disabled: {e}")
+        return
+    _run_sql(
+        conn,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_medical_fts_insert AFTER INSERT ON medical_history BEGIN
+          INSERT INTO medical_fts(rowid, diagnosis, treatment, notes)
+          VALUES (NEW.rowid, NEW.diagnosis, NEW.treatment, NEW.notes);
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_medical_fts_delete AFTER DELETE ON medical_history BEGIN
+          INSERT INTO medical_fts(medical_fts, rowid, diagnosis, treatment, notes)
+          VALUES ('delete', OLD.rowid, OLD.diagnosis, OLD.treatment, OLD.notes);
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_medical_fts_update AFTER UPDATE OF diagnosis, treatment, notes ON medical_history BEGIN
+          INSERT INTO medical_fts(medical_fts, rowid, diagnosis, treatment, notes)
+          VALUES ('delete', OLD.rowid, OLD.diagnosis, OLD.treatment, OLD.notes);
+          INSERT INTO medical_fts(rowid, diagnosis, treatment, notes)
+          VALUES (NEW.rowid, NEW.diagnosis, NEW.treatment, NEW.notes);
+        END;
+        INSERT INTO medical_fts(medical_fts) VALUES ('rebuild');
+        """,
+    )
+
+
+CHANGE_LOG_TABLES = ("users", "pets", "medical_history", "vaccines", "weights", "appointments")
+
+
+def _change_log(conn: sqlite3.Connection) -> None:
+    # Every committed write leaves (table, id) here; workers poll it to keep caches coherent (sync.py)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS change_log ("
+        "seq INTEGER PRIMARY KEY AUTOINCREMENT, tbl TEXT NOT NULL, rowId TEXT NOT NULL)"
+    )
+    for table in CHANGE_LOG_TABLES:
+        for event, ref in (("INSERT", "NEW"), ("UPDATE", "NEW"), ("DELETE", "OLD")):
+            conn.execute(
+                f"CREATE TRIGGER IF NOT EXISTS trg_{table}_log_{event.lower()} AFTER {event} ON {table} BEGIN "
+                f"INSERT INTO change_log(tbl, rowId) VALUES ('{table}', {ref}.id); END"
+            )
+
+
+# Columns whose changes are worth a change_log row (not derived ones such as vaccines.dueDate)
+LOGGED_COLUMNS = {
+    "users": ("id", "name", "email", "password", "role", "phone", "address"),
+    "pets": ("id", "name", "age", "type", "photo", "ownerId"),
+    "medical_history": ("id", "petId", "date", "diagnosis", "treatment", "notes", "attachment"),
+    "vaccines": ("id", "petId", "vaccineName", "dateGiven", "nextDue"),
+    "weights": ("id", "petId", "weight", "date"),
+    "appointments": ("id", "petId", "date", "time", "reason", "vetId", "duration"),
+}
+
+
+def _quiet_change_log(conn: sqlite3.Connection) -> None:
+    # Updates log only when a column really changed; while change_log_mute has a row
+    # (a bulk load's own transaction, see db.bulk_change_log) nothing is logged per row
+    conn.execute("CREATE TABLE IF NOT EXISTS change_log_mute (id INTEGER PRIMARY KEY CHECK (id = 1))")
+    unmuted = "NOT EXISTS (SELECT 1 FROM change_log_mute)"
+    for table, cols in LOGGED_COLUMNS.items():
+        changed = " OR ".join(f"OLD.{c} IS NOT NEW.{c}" for c in cols)
+        for event, ref, when in (
+            ("INSERT", "NEW", unmuted),
+            ("UPDATE", "NEW", f"{unmuted} AND ({changed})"),
+            ("DELETE", "OLD", unmuted),
+        ):
+            name = f"trg_{table}_log_{event.lower()}"
+            on = f"UPDATE OF {', '.join(cols)}" if event == "UPDATE" else event
+            conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+            conn.execute(
+                f"CREATE TRIGGER {name} AFTER {on} ON {table} WHEN {when} BEGIN "
+                f"INSERT INTO change_log(tbl, rowId) VALUES ('{table}', {ref}.id); END"
+            )
+
+
+def _medical_rowid_key(conn: sqlite3.Connection) -> None:
+    # medical_fts maps to medical_history.rowid, which VACUUM may renumber while the
+    # primary key is TEXT. Rebuild the table with an INTEGER PRIMARY KEY (a rowid
+    # alias VACUUM keeps), copying the current rowids so the index stays valid.
+    _run_sql(
+        conn,
+        """
+        CREATE TABLE medical_history_new (
+          rid INTEGER PRIMARY KEY,
+          id TEXT NOT NULL UNIQUE,
+          petId TEXT NOT NULL,
+          date TEXT,
+          diagnosis TEXT,
+          treatment TEXT,
+          notes TEXT,
+          attachment TEXT,
+          FOREIGN KEY (petId) REFERENCES pets(id) ON DELETE CASCADE
+        );
+        INSERT INTO medical_history_new (rid, id, petId, date, diagnosis, treatment, notes, attachment)
+          SELECT rowid, id, petId, date, diagnosis, treatment, notes, attachment FROM medical_history;
+        DROP TABLE medical_history;
+        ALTER TABLE medical_history_new RENAME TO medical_history;
+        CREATE INDEX IF NOT EXISTS idx_medical_pet ON medical_history(petId);
+        CREATE INDEX IF NOT EXISTS idx_medical_pet_date ON medical_history(petId, date);
+        """,
+    )
+    # The table's triggers went with it; both steps recreate theirs idempotently
+    _medical_fts(conn)
+    _quiet_change_log(conn)
+
+
+MIGRATIONS: List[Tuple[int, str, Step]] = [
+    (1, "baseline schema", _baseline),
+    (
+        2,
+        "per-pet date indexes for keyset pages",
+        """
+        CREATE INDEX IF NOT EXISTS idx_medical_pet_date ON medical_history(petId, date);
+        CREATE INDEX IF NOT EXISTS idx_vaccines_pet_given ON vaccines(petId, dateGiven);
+        CREATE INDEX IF NOT EXISTS idx_weights_pet_date ON weights(petId, date);
+        CREATE INDEX IF NOT EXISTS idx_appointments_pet_date ON appointments(petId, date);
+        """,
+    ),
+    (
+        3,
+        "indexes for schedule, due-vaccine and weight-series queries",
+        """
+        CREATE INDEX IF NOT EXISTS idx_appointments_vet_date ON appointments(vetId, date, time);
+        CREATE INDEX IF NOT EXISTS idx_appointments_date ON appointments(date, time);
+        CREATE INDEX IF NOT EXISTS idx_vaccines_next_due ON vaccines(nextDue);
+        -- Covering: the series query never touches the table (idx_weights_pet_date still serves keyset pages)
+        CREATE INDEX IF NOT EXISTS idx_weights_pet_date_weight ON weights(petId, date, weight);
+        """,
+    ),
+    (4, "normalised vaccine due dates", _vaccine_due_dates),
+    (5, "appointment duration (minutes)", add_column("appointments", "duration", "INTEGER")),
+    (6, "full-text index over medical history", _medical_fts),
+    (7, "change log for cross-process cache invalidation", _change_log),
+    (8, "change log skips no-op updates and per-row bulk writes", _quiet_change_log),
+    (9, "stable medical_history rowids for the full-text index", _medical_rowid_key),
+    (
+        10,
+        "keyset indexes for the all-records lists",
+        # (sort column, rowid) order for /records/<kind> pages; rowid is implicit at the end
+        """
+        CREATE INDEX IF NOT EXISTS idx_medical_history_keyset ON medical_history(date);
+        CREATE INDEX IF NOT EXISTS idx_vaccines_keyset ON vaccines(dateGiven);
+        CREATE INDEX IF NOT EXISTS idx_weights_keyset ON weights(date);
+        CREATE INDEX IF NOT EXISTS idx_appointments_keyset ON appointments(date);
+        """,
+    ),
+]
+
+LATEST = MIGRATIONS[-1][0]
+
+
+def current_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection) -> int:
+    """Apply pending migrations; returns the resulting version."""
+    if current_version(conn) >= LATEST:
+        return current_version(conn)
+    if conn.in_transaction:
+        conn.commit()
+    for version, name, step in MIGRATIONS:
+        if current_version(conn) >= version:
+            continue
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Re-check under the write lock: another process may have got here first
+            if current_version(conn) >= version:
+                conn.rollback()
+                continue
+            if callable(step):
+                step(conn)
+            else:
+                _run_sql(conn, step)
+            conn.execute(f"PRAGMA user_version = {int(version)}")
+            conn.commit()
+            print(f"Applied migration {version}: {name}")
+        except Exception:
+            conn.rollback()
+            raise
+    return current_version(conn)
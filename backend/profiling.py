@@ -0,0 +1,121 @@
+"""Opt-in per-request profiling.
+
+With PETMS_PROFILE=1 a request carrying `X-Profile: sample` (or `cprofile`)
+is profiled and the result written to PETMS_PROFILE_DIR; the file name comes
+back in the X-Profile-File response header.
+
+- sample: a thread samples the request thread's stack every
+  PETMS_PROFILE_INTERVAL_MS and writes collapsed stacks (`a;b;c count`),
+  the input of flamegraph.pl and speedscope. The sampler needs the GIL,
+  so requests shorter than a few switch intervals (5 ms) get few samples.
+- cprofile: deterministic cProfile, written as a .prof file for pstats or
+  snakeviz. Only one runs at a time; concurrent requests are not profiled.
+"""
+import cProfile
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Optional
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ENABLED = os.environ.get("PETMS_PROFILE", "0") == "1"
+PROFILE_DIR = os.environ.get("PETMS_PROFILE_DIR") or os.path.join(BASE_DIR, "profiles")
+INTERVAL = float(os.environ.get("PETMS_PROFILE_INTERVAL_MS", 1)) / 1000.0
+HEADER = "X-Profile"
+MODES = ("sample", "cprofile")
+
+_cprofile_lock = threading.Lock()
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ",")
+
+
+class StackSampler:
+    """Samples one thread's Python stack on a timer into collapsed-stack counts."""
+
+    def __init__(self, thread_id: int, interval: float = INTERVAL):
+        self.thread_id = thread_id
+        self.interval = max(0.0001, interval)
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                names.append(_frame_name(frame))
+                frame = frame.f_back
+            if names:
+                self.stacks[";".join(reversed(names))] += 1
+
+    def start(self) -> "StackSampler":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def write(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, n in self.stacks.most_common():
+                f.write(f"{stack} {n}\n")
+
+
+class RequestProfile:
+    def __init__(self, mode: str, label: str):
+        self.mode = mode
+        self.label = label
+        self._sampler: Optional[StackSampler] = None
+        self._profile: Optional[cProfile.Profile] = None
+
+    def start(self) -> bool:
+        if self.mode == "cprofile":
+            if not _cprofile_lock.acquire(blocking=False):
+                return False
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        else:
+            self._sampler = StackSampler(threading.get_ident()).start()
+        return True
+
+    def stop(self) -> Optional[str]:
+        """Stop and write the profile; returns the file name. Always frees the cProfile slot."""
+        try:
+            if self._profile is not None:
+                self._profile.disable()
+            else:
+                self._sampler.stop()
+            name = f"{time.strftime('%Y%m%d-%H%M%S')}-{self.label}-{uuid.uuid4().hex[:6]}"
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            if self._profile is not None:
+                name += ".prof"
+                self._profile.dump_stats(os.path.join(PROFILE_DIR, name))
+            else:
+                name += ".folded"
+                self._sampler.write(os.path.join(PROFILE_DIR, name))
+            return name
+        except Exception as e:
+            print(f"Error writing profile: {e}")
+            return None
+        finally:
+            if self._profile is not None:
+                _cprofile_lock.release()
+
+
+def start(mode: str, label: str) -> Optional[RequestProfile]:
+    """Profile for a request asking for `mode`, or None (disabled, unknown mode, busy)."""
+    mode = (mode or "").strip().lower()
+    if not ENABLED or mode not in MODES:
+        return None
+    safe = "".join(c if c.isalnum() else "_" for c in label).strip("_")[:60] or "root"
+    prof = RequestProfile(mode, safe)
+    return prof if prof.start() else None
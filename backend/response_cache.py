@@ -0,0 +1,145 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+
+def age_bucket(age) -> str:
+    try:
+        a = float(age)
+    except (TypeError, ValueError):
+        return "unknown"
+    if a < 1:
+        return "juvenile"
+    if a < 7:
+        return "adult"
+    return "senior"
+
+
+def normalize_text(s) -> str:
+    s = re.sub(r"[^\w\s]", " ", str(s or "").lower())
+    return " ".join(s.split())
+
+
+def make_key(species, age, symptoms, mode: str, gen_kwargs: Optional[Dict[str, Any]] = None) -> str:
+    return json.dumps(
+        [normalize_text(species), age_bucket(age), normalize_text(symptoms), mode or "", gen_kwargs or {}],
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+
+
+class ResponseCache:
+    """Bounded LRU cache with TTL and an optional SQLite tier on disk.
+
+    Values must be JSON-serialisable. Memory misses fall through to the disk
+    tier (if configured) and are promoted on hit.
+    """
+
+    def __init__(self, max_entries: int = 512, ttl: float = 86400.0, path: Optional[str] = None):
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self.path = path
+        self._mem: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.evictions = 0
+        if path:
+            self._disk("PRAGMA journal_mode = WAL;")
+            self._disk(
+                "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL)"
+            )
+            self._disk("DELETE FROM cache WHERE expires < ?", (time.time(),))
+
+    def _disk(self, q: str, params: tuple = ()):
+        conn = sqlite3.connect(self.path, timeout=5)
+        try:
+            with conn:
+                return conn.execute(q, params).fetchone()
+        finally:
+            conn.close()
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            entry = self._mem.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires >= now:
+                    self._mem.move_to_end(key)
+                    self.hits += 1
+                    return json.loads(value)
+                del self._mem[key]
+        if self.path:
+            try:
+                row = self._disk("SELECT value, expires FROM cache WHERE key = ? AND expires >= ?", (key, now))
+            except sqlite3.Error:
+                row = None
+            if row is not None:
+                with self._lock:
+                    self._put_mem(key, row[0], row[1])
+                    self.hits += 1
+                    self.disk_hits += 1
+                return json.loads(row[0])
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def _put_mem(self, key: str, value: str, expires: float) -> None:
+        self._mem[key] = (expires, value)
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_entries:
+            self._mem.popitem(last=False)
+            self.evictions += 1
+
+    def set(self, key: str, value: Any) -> None:
+        payload = json.dumps(value, ensure_ascii=False)
+        expires = time.time() + self.ttl
+        with self._lock:
+            self._put_mem(key, payload, expires)
+        if self.path:
+            try:
+                self._disk(
+                    "INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)",
+                    (key, payload, expires),
+                )
+            except sqlite3.Error as e:
+                print(f"Response cache write failed: {e}")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._mem.clear()
+        if self.path:
+            self._disk("DELETE FROM cache")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._mem),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_hits": self.disk_hits,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits / total) if total else 0.0,
+                "persistent": bool(self.path),
+            }
+
+
+def cache_from_env() -> Optional[ResponseCache]:
+    if os.environ.get("VET_QA_CACHE", "1") != "1":
+        return None
+    return ResponseCache(
+        max_entries=int(os.environ.get("VET_QA_CACHE_SIZE", 512)),
+        ttl=float(os.environ.get("VET_QA_CACHE_TTL", 86400)),
+        path=os.environ.get("VET_QA_CACHE_PATH") or None,
+    )
@@ -0,0 +1,188 @@
+import bisect
+import os
+import threading
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+
+DEFAULT_DURATION = int(os.environ.get("PETMS_APPT_MINUTES", 30))
+CLINIC_OPEN = os.environ.get("PETMS_CLINIC_OPEN", "09:00")
+CLINIC_CLOSE = os.environ.get("PETMS_CLINIC_CLOSE", "17:00")
+
+
+def parse_minutes(value: Any) -> Optional[int]:
+    """'HH:MM' (or 'HH:MM:SS') -> minutes after midnight, None if not a time."""
+    try:
+        parts = str(value).strip().split(":")
+        h, m = int(parts[0]), int(parts[1])
+    except (IndexError, ValueError):
+        return None
+    if 0 <= h < 24 and 0 <= m < 60:
+        return h * 60 + m
+    return None
+
+
+def format_minutes(minutes: int) -> str:
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def duration_of(row: Dict[str, Any]) -> int:
+    try:
+        d = int(row.get("duration") or DEFAULT_DURATION)
+    except (TypeError, ValueError):
+        d = DEFAULT_DURATION
+    return d if d > 0 else DEFAULT_DURATION
+
+
+class DaySlots:
+    """One vet's bookings on one day as a start-sorted interval list.
+
+    Lookups bisect on start; only bookings starting within `longest` minutes
+    before the probe can reach it, so a clash check is O(log n) plus the
+    (normally zero or one) overlapping neighbours.
+    """
+
+    def __init__(self):
+        self.starts: List[int] = []
+        self.items: List[Tuple[int, int, str]] = []
+        self.longest = 0
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def add(self, start: int, end: int, appt_id: str) -> None:
+        i = bisect.bisect_right(self.starts, start)
+        self.starts.insert(i, start)
+        self.items.insert(i, (start, end, appt_id))
+        self.longest = max(self.longest, end - start)
+
+    def remove(self, start: int, appt_id: str) -> None:
+        i = bisect.bisect_left(self.starts, start)
+        while i < len(self.items) and self.starts[i] == start:
+            if self.items[i][2] == appt_id:
+                del self.starts[i]
+                del self.items[i]
+                return
+            i += 1
+
+    def clash(self, start: int, end: int, ignore: Optional[str] = None) -> Optional[Tuple[int, int, str]]:
+        """First booking overlapping [start, end), if any."""
+        i = bisect.bisect_left(self.starts, start - self.longest)
+        while i < len(self.items) and self.starts[i] < end:
+            s, e, appt_id = self.items[i]
+            if e > start and appt_id != ignore:
+                return self.items[i]
+            i += 1
+        return None
+
+
+class Scheduler:
+    """Per-(vet, date) slot index over appointments, built lazily from `source`.
+
+    Hold `lock` around check-then-write so two requests cannot book the same
+    slot. invalidate() drops the index; the next call rebuilds it.
+    """
+
+    def __init__(self, source: Callable[[], Iterable[Dict[str, Any]]]):
+        self.source = source
+        self.lock = threading.RLock()
+        self._days: Optional[Dict[Tuple[str, str], DaySlots]] = None
+        self._where: Dict[str, Tuple[Tuple[str, str], int]] = {}
+
+    def _index(self) -> Dict[Tuple[str, str], DaySlots]:
+        with self.lock:
+            if self._days is None:
+                self._days, self._where = {}, {}
+                for row in self.source():
+                    self._add(row)
+            return self._days
+
+    @staticmethod
+    def _interval(row: Dict[str, Any]) -> Optional[Tuple[Tuple[str, str], int, int]]:
+        start = parse_minutes(row.get("time"))
+        if not row.get("vetId") or not row.get("date") or start is None:
+            return None
+        return (row["vetId"], row["date"]), start, start + duration_of(row)
+
+    def _add(self, row: Dict[str, Any]) -> None:
+        iv = self._interval(row)
+        if iv is None:
+            return
+        key, start, end = iv
+        self._days.setdefault(key, DaySlots()).add(start, end, row["id"])
+        self._where[row["id"]] = (key, start)
+
+    def invalidate(self) -> None:
+        with self.lock:
+            self._days = None
+            self._where = {}
+
+    def refresh(self, appt_ids: Iterable[Any], load: Callable[[Any], Optional[Dict[str, Any]]]) -> None:
+        """Re-read changed bookings (e.g. written by another worker); no-op until the index is built."""
+        with self.lock:
+            if self._days is None:
+                return
+            for appt_id in appt_ids:
+                self.remove(appt_id)
+                row = load(appt_id)
+                if row is not None:
+                    self._add(row)
+
+    def add(self, row: Dict[str, Any]) -> None:
+        with self.lock:
+            self._index()
+            self._add(row)
+
+    def remove(self, appt_id: Any) -> None:
+        with self.lock:
+            self._index()
+            hit = self._where.pop(appt_id, None)
+            if hit is not None:
+                key, start = hit
+                self._days[key].remove(start, appt_id)
+
+    def conflict(self, row: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """The booking `row` would overlap (same vet and date), ignoring row's own id."""
+        iv = self._interval(row)
+        if iv is None:
+            return None
+        key, start, end = iv
+        day = self._index().get(key)
+        hit = day.clash(start, end, ignore=row.get("id")) if day else None
+        if hit is None:
+            return None
+        s, e, appt_id = hit
+        return {"id": appt_id, "date": key[1], "time": format_minutes(s), "duration": e - s}
+
+    def free_slots(
+        self,
+        vet_id: str,
+        day: str,
+        after: Optional[str] = None,
+        count: int = 5,
+        duration: Optional[int] = None,
+        days: int = 14,
+    ) -> List[Dict[str, Any]]:
+        """Next `count` free slots of `duration` minutes within clinic hours, from `day` [after]."""
+        duration = duration or DEFAULT_DURATION
+        open_m, close_m = parse_minutes(CLINIC_OPEN), parse_minutes(CLINIC_CLOSE)
+        first = date.fromisoformat(day)
+        index = self._index()
+        slots: List[Dict[str, Any]] = []
+        # Stop at the end of the calendar rather than overflow past 9999-12-31
+        for n in range(min(max(1, days), (date.max - first).days + 1)):
+            d = (first + timedelta(days=n)).isoformat()
+            booked = index.get((vet_id, d))
+            cursor = open_m
+            if n == 0 and after is not None:
+                cursor = max(cursor, parse_minutes(after) or 0)
+            while cursor + duration <= close_m and len(slots) < count:
+                hit = booked.clash(cursor, cursor + duration) if booked else None
+                if hit is None:
+                    slots.append({"date": d, "time": format_minutes(cursor), "duration": duration})
+                    cursor += duration
+                else:
+                    cursor = hit[1]
+            if len(slots) >= count:
+                break
+        return slots
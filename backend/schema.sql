@@ -1,5 +1,5 @@
--- SQLite schema for Pet Management System
--- Creates tables if they do not exist.
+-- SQLite schema for Pet Management System (migration 1, the baseline).
+-- Do not edit: later changes go into migrations.py.
 
 PRAGMA foreign_keys = ON;
 
@@ -14,7 +14,6 @@ CREATE TABLE IF NOT EXISTS users (
 );
 
 -- Email is not enforced unique because owner entries may share emails
-DROP INDEX IF EXISTS idx_users_email;
 CREATE INDEX IF NOT EXISTS idx_users_email ON users(email);
 
 CREATE TABLE IF NOT EXISTS pets (
@@ -0,0 +1,182 @@
+import atexit
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, ContextManager, Dict, Iterable, Optional
+
+import db
+import metrics
+
+
+TABLES = ["users", "pets", "medical_history", "vaccines", "weights", "appointments"]
+
+
+Source = Callable[[], ContextManager[Dict[str, Iterable[Dict[str, Any]]]]]
+
+
+@contextmanager
+def sqlite_source():
+    """Stream every table from one consistent read transaction."""
+    conn = db.connect()
+    try:
+        conn.execute("BEGIN")
+        yield {t: db.iter_rows(t, conn) for t in TABLES}
+    finally:
+        conn.close()
+
+
+@contextmanager
+def process_lock(path: str):
+    """Exclusive lock on `path` across processes (fcntl; threads-only elsewhere).
+
+    Workers that export the same data.json take turns, so each export reads
+    the database after the previous one finished and a slow export cannot
+    overwrite a newer file.
+    """
+    try:
+        import fcntl
+    except ImportError:
+        yield
+        return
+    with open(path, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def write_snapshot(path: str, source: Source = sqlite_source) -> None:
+    """Write the legacy data.json layout row by row, then atomically swap it in."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(prefix=".data-", suffix=".json.tmp", dir=directory)
+    try:
+        with source() as tables, os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write("{")
+            for ti, table in enumerate(TABLES):
+                f.write(",\n" if ti else "\n")
+                f.write(f"    {json.dumps(table)}: [")
+                for ri, row in enumerate(tables.get(table, [])):
+                    f.write(",\n        " if ri else "\n        ")
+                    f.write(json.dumps(row, ensure_ascii=False))
+                f.write("\n    ]")
+            f.write("\n}\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except Exception:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+class SnapshotExporter:
+    """Background data.json exporter.
+
+    Writers call mark_dirty(); a daemon thread exports once `dirty_threshold`
+    changes have piled up or `interval` seconds have passed since the first
+    unsaved change. Nothing is serialised on the request thread.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        source: Source = sqlite_source,
+        interval: float = 30.0,
+        dirty_threshold: int = 100,
+        enabled: bool = True,
+    ):
+        self.path = path
+        self.lock_path = os.path.join(os.path.dirname(os.path.abspath(path)), "." + os.path.basename(path) + ".lock")
+        self.source = source
+        self.interval = interval
+        self.dirty_threshold = max(1, dirty_threshold)
+        self.enabled = enabled
+        self.dirty = 0
+        self.last_export: Optional[float] = None
+        self._first_dirty: Optional[float] = None
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = False
+
+    def mark_dirty(self, n: int = 1) -> None:
+        if not self.enabled:
+            return
+        with self._cond:
+            self.dirty += n
+            if self._first_dirty is None:
+                self._first_dirty = time.monotonic()
+            self._ensure_thread()
+            if self.dirty >= self.dirty_threshold:
+                self._cond.notify()
+
+    def _ensure_thread(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="json-snapshot", daemon=True)
+            self._thread.start()
+            atexit.register(self.flush)
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._stopped:
+                    if self.dirty >= self.dirty_threshold:
+                        break
+                    if self._first_dirty is not None:
+                        remaining = self.interval - (time.monotonic() - self._first_dirty)
+                        if remaining <= 0:
+                            break
+                        self._cond.wait(remaining)
+                    else:
+                        self._cond.wait()
+                if self._stopped:
+                    return
+            if not self.flush():
+                # Back off before retrying a failed export
+                with self._cond:
+                    self._cond.wait(self.interval)
+
+    def flush(self) -> bool:
+        """Export now if anything changed. Safe to call from any thread."""
+        with self._cond:
+            if not self.dirty:
+                return False
+            pending = self.dirty
+            self.dirty = 0
+            self._first_dirty = None
+        try:
+            with self._write_lock, process_lock(self.lock_path):
+                started = time.perf_counter()
+                write_snapshot(self.path, self.source)
+                metrics.SNAPSHOT_SECONDS.observe(time.perf_counter() - started)
+            self.last_export = time.time()
+            return True
+        except Exception as e:
+            print(f"Error saving legacy JSON: {e}")
+            metrics.SNAPSHOT_FAILURES.inc()
+            with self._cond:
+                self.dirty += pending
+                if self._first_dirty is None:
+                    self._first_dirty = time.monotonic()
+            return False
+
+    def stop(self) -> None:
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+
+
+def exporter_from_env(path: str, source=sqlite_source) -> SnapshotExporter:
+    return SnapshotExporter(
+        path,
+        source=source,
+        interval=float(os.environ.get("PETMS_SNAPSHOT_INTERVAL", 30)),
+        dirty_threshold=int(os.environ.get("PETMS_SNAPSHOT_DIRTY", 100)),
+        enabled=os.environ.get("PETMS_SNAPSHOT", "1") == "1",
+    )
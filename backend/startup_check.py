@@ -0,0 +1,56 @@
+"""Import-time budget for app.py.
+
+    python startup_check.py [--budget-ms 1000] [--runs 5]
+
+Imports app in fresh interpreters and fails (exit 1) when the median import
+time exceeds the budget. Importing must stay cheap: data, models and the
+LLM load in app.warm() or on first use, never at import.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+PROBE = (
+    "import sys, time; t = time.perf_counter(); import app; "
+    "ms = (time.perf_counter() - t) * 1000; "
+    "heavy = sorted(m for m in ('torch', 'transformers', 'sklearn', 'numpy') if m in sys.modules); "
+    "print(ms, ','.join(heavy))"
+)
+
+
+def measure(runs: int):
+    times, heavy = [], set()
+    env = dict(os.environ, VET_QA_WARMUP="0")
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", PROBE], cwd=BASE_DIR, env=env, capture_output=True, text=True, check=True
+        ).stdout.strip().splitlines()[-1]
+        ms, _, mods = out.partition(" ")
+        times.append(float(ms))
+        heavy.update(m for m in mods.split(",") if m)
+    return times, sorted(heavy)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budget-ms", type=float, default=float(os.environ.get("PETMS_IMPORT_BUDGET_MS", 1000)))
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    times, heavy = measure(max(1, args.runs))
+    median = statistics.median(times)
+    print(f"import app: median {median:.0f} ms over {len(times)} runs (budget {args.budget_ms:.0f} ms)")
+    failed = median > args.budget_ms
+    if heavy:
+        print(f"heavy modules imported eagerly: {', '.join(heavy)}")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,434 @@
+import os
+import re
+import threading
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+import db
+
+
+# Secondary indexes per table
+INDEXES: Dict[str, List[str]] = {
+    "users": ["email"],
+    "pets": ["ownerId"],
+    "medical_history": ["petId"],
+    "vaccines": ["petId"],
+    "weights": ["petId"],
+    "appointments": ["petId", "vetId"],
+}
+
+# Schema FKs mirrored in memory
+CASCADE_DELETE: Dict[str, List[tuple]] = {
+    "pets": [
+        ("medical_history", "petId"),
+        ("vaccines", "petId"),
+        ("weights", "petId"),
+        ("appointments", "petId"),
+    ],
+}
+SET_NULL: Dict[str, List[tuple]] = {
+    "users": [("pets", "ownerId")],
+}
+
+# Same formats as migrations.due_date_sql (used where there is no DB)
+DUE_DATE_PATTERNS = [
+    (re.compile(r"^(\d{4})[-/.](\d{2})[-/.](\d{2})"), (1, 2, 3)),
+    (re.compile(r"^(\d{2})[-/.](\d{2})[-/.](\d{4})"), (3, 2, 1)),
+]
+
+
+def due_date(text: Any) -> Optional[str]:
+    s = str(text or "").strip()
+    for pattern, (y, m, d) in DUE_DATE_PATTERNS:
+        match = pattern.match(s)
+        if match:
+            try:
+                return date(int(match.group(y)), int(match.group(m)), int(match.group(d))).isoformat()
+            except ValueError:
+                return None
+    return None
+
+
+class Table:
+    """Rows keyed by id plus hash indexes on selected fields.
+
+    Index buckets are dicts keyed by row id, so insert/delete are O(1) and
+    listing a bucket costs O(result) while keeping insertion order.
+    """
+
+    def __init__(self, name: str, indexed: Iterable[str] = ()):
+        self.name = name
+        self.rows: Dict[Any, Dict[str, Any]] = {}
+        self.indexes: Dict[str, Dict[Any, Dict[Any, Dict[str, Any]]]] = {f: {} for f in indexed}
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def _index_add(self, row: Dict[str, Any]) -> None:
+        for field, idx in self.indexes.items():
+            idx.setdefault(row.get(field), {})[row.get("id")] = row
+
+    def _index_remove(self, row: Dict[str, Any]) -> None:
+        for field, idx in self.indexes.items():
+            key = row.get(field)
+            bucket = idx.get(key)
+            if bucket is None:
+                continue
+            bucket.pop(row.get("id"), None)
+            if not bucket:
+                del idx[key]
+
+    def get(self, row_id: Any) -> Optional[Dict[str, Any]]:
+        return self.rows.get(row_id)
+
+    def find(self, field: str, value: Any) -> List[Dict[str, Any]]:
+        if field not in self.indexes:
+            raise KeyError(f"{self.name}.{field} is not indexed")
+        return list(self.indexes[field].get(value, {}).values())
+
+    def first(self, field: str, value: Any) -> Optional[Dict[str, Any]]:
+        bucket = self.indexes[field].get(value)
+        if not bucket:
+            return None
+        return next(iter(bucket.values()))
+
+    def all(self) -> List[Dict[str, Any]]:
+        return list(self.rows.values())
+
+    def insert(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        row_id = row.get("id")
+        if row_id in self.rows:
+            raise KeyError(f"duplicate id in {self.name}: {row_id}")
+        self.rows[row_id] = row
+        self._index_add(row)
+        return row
+
+    def update(self, row_id: Any, changes: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        row = self.rows.get(row_id)
+        if row is None:
+            return None
+        self._index_remove(row)
+        row.update({k: v for k, v in changes.items() if k != "id"})
+        self._index_add(row)
+        return row
+
+    def delete(self, row_id: Any) -> Optional[Dict[str, Any]]:
+        row = self.rows.pop(row_id, None)
+        if row is not None:
+            self._index_remove(row)
+        return row
+
+
+class EntityStore:
+    """In-memory copy of the six tables with FK-consistent writes."""
+
+    def __init__(self):
+        self.tables: Dict[str, Table] = {name: Table(name, fields) for name, fields in INDEXES.items()}
+
+    def __getitem__(self, table: str) -> Table:
+        return self.tables[table]
+
+    def load(self, data: Dict[str, List[Dict[str, Any]]]) -> None:
+        self.tables = {name: Table(name, fields) for name, fields in INDEXES.items()}
+        for name, table in self.tables.items():
+            for row in data.get(name, []):
+                if row.get("id") in table.rows:
+                    continue
+                table.insert(row)
+
+    def as_dict(self) -> Dict[str, List[Dict[str, Any]]]:
+        return {name: table.all() for name, table in self.tables.items()}
+
+    def get(self, table: str, row_id: Any) -> Optional[Dict[str, Any]]:
+        return self.tables[table].get(row_id)
+
+    def find(self, table: str, field: str, value: Any) -> List[Dict[str, Any]]:
+        return self.tables[table].find(field, value)
+
+    def first(self, table: str, field: str, value: Any) -> Optional[Dict[str, Any]]:
+        return self.tables[table].first(field, value)
+
+    def all(self, table: str) -> List[Dict[str, Any]]:
+        return self.tables[table].all()
+
+    def insert(self, table: str, row: Dict[str, Any]) -> Dict[str, Any]:
+        return self.tables[table].insert(row)
+
+    def update(self, table: str, row_id: Any, changes: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        return self.tables[table].update(row_id, changes)
+
+    def page(self, table, field=None, value=None, limit=None, after=None, fields=None):
+        """Same contract as db.page_rows (keys are (sort value, id) here)."""
+        rows = self.find(table, field, value) if field is not None else self.all(table)
+        return self._page_of(rows, db.SORT_COLUMNS[table], limit, after, fields)
+
+    def page_with_pets(self, table, limit=None, after=None, fields=None):
+        """Same contract as db.page_with_pets."""
+        return self._page_of(self.list_with_pets(table), db.SORT_COLUMNS[table], limit, after, fields)
+
+    @staticmethod
+    def _page_of(rows, sort_col, limit, after, fields):
+        def key(r):
+            v = r.get(sort_col) if sort_col else None
+            return (v is not None, v if v is not None else "", str(r.get("id")))
+
+        rows = sorted(rows, key=key)
+        if after is not None:
+            a = (after[0] is not None, after[0] if after[0] is not None else "", str(after[-1]))
+            rows = [r for r in rows if key(r) > a]
+        next_key = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_key = [last.get(sort_col) if sort_col else None, last.get("id")]
+        if fields:
+            rows = [{k: r.get(k) for k in fields} for r in rows]
+        return rows, next_key
+
+    def list_with_pets(self, table: str) -> List[Dict[str, Any]]:
+        pets = self.tables["pets"]
+        out = []
+        for row in self.tables[table].all():
+            pet = pets.get(row.get("petId"))
+            if pet is not None:
+                out.append({**row, "petName": pet.get("name"), "ownerId": pet.get("ownerId")})
+        return out
+
+    def dashboard(self, today: str, until: str, limit: int = 50) -> Dict[str, Any]:
+        appts = sorted(
+            (a for a in self.list_with_pets("appointments") if (a.get("date") or "") >= today),
+            key=lambda a: (a.get("date") or "", a.get("time") or ""),
+        )
+        vacs = sorted(
+            (v for v in self.list_with_pets("vaccines") if today <= (due_date(v.get("nextDue")) or "") <= until),
+            key=lambda v: due_date(v.get("nextDue")),
+        )
+        return {
+            "counts": {
+                "pets": len(self.tables["pets"]),
+                "owners": sum(1 for u in self.tables["users"].all() if u.get("role") == "owner"),
+                "upcomingAppointments": len(appts),
+                "vaccinesDue": len(vacs),
+            },
+            "appointments": appts[:limit],
+            "vaccines": vacs[:limit],
+        }
+
+    def search_medical(self, text, pet_id=None, owner_id=None, limit=20, offset=0):
+        """Substring stand-in for the FTS5 search: every word must occur, more occurrences rank first."""
+        words = [w.lower() for w in re.findall(r"\w+", text or "")]
+        if not words:
+            return [], False
+        hits = []
+        for r in self.list_with_pets("medical_history"):
+            if (pet_id and r.get("petId") != pet_id) or (owner_id and r.get("ownerId") != owner_id):
+                continue
+            body = " ".join(str(r.get(k) or "") for k in ("diagnosis", "treatment", "notes"))
+            low = body.lower()
+            if all(w in low for w in words):
+                hits.append({**r, "snippet": body[:120], "score": -sum(low.count(w) for w in words)})
+        hits.sort(key=lambda h: h["score"])
+        return hits[offset:offset + limit], len(hits) > offset + limit
+
+    def weight_series(self, pet_id: str) -> List[Dict[str, Any]]:
+        rows = sorted(self.tables["weights"].find("petId", pet_id), key=lambda w: w.get("date") or "")
+        return [{"date": w.get("date"), "weight": w.get("weight")} for w in rows]
+
+    def weight_points(self):
+        for w in self.tables["weights"].all():
+            yield w.get("petId"), w.get("date"), w.get("weight")
+
+    def vet_schedule(self, vet_id: str, day: str) -> List[Dict[str, Any]]:
+        pets = self.tables["pets"]
+        rows = [a for a in self.tables["appointments"].find("vetId", vet_id) if a.get("date") == day]
+        rows.sort(key=lambda a: a.get("time") or "")
+        return [{**a, "petName": (pets.get(a.get("petId")) or {}).get("name")} for a in rows]
+
+    def vaccine_reminders(self, start: str, until: str, limit: int = 1000) -> List[Dict[str, Any]]:
+        users = self.tables["users"]
+        out = []
+        for v in self.list_with_pets("vaccines"):
+            due = due_date(v.get("nextDue"))
+            if due is not None and start <= due <= until:
+                owner = users.get(v.get("ownerId")) or {}
+                out.append({
+                    **v,
+                    "dueDate": due,
+                    "ownerName": owner.get("name"),
+                    "ownerEmail": owner.get("email"),
+                    "ownerPhone": owner.get("phone"),
+                })
+        out.sort(key=lambda v: v["dueDate"])
+        return out[:limit]
+
+    def vaccines_due_count(self, start: str, until: str) -> int:
+        dues = (due_date(v.get("nextDue")) for v in self.list_with_pets("vaccines"))
+        return sum(1 for due in dues if due is not None and start <= due <= until)
+
+    def delete(self, table: str, row_id: Any) -> bool:
+        row = self.tables[table].delete(row_id)
+        if row is None:
+            return False
+        for child, field in CASCADE_DELETE.get(table, []):
+            for dep in self.tables[child].find(field, row_id):
+                self.delete(child, dep["id"])
+        for child, field in SET_NULL.get(table, []):
+            for dep in self.tables[child].find(field, row_id):
+                self.tables[child].update(dep["id"], {field: None})
+        return True
+
+    def apply_changes(self, changes: Dict[str, Set[Any]]) -> None:
+        """Nothing to do: the JSON fallback has no shared database to follow."""
+
+
+class SqliteStore:
+    """Same interface as EntityStore, served directly from SQLite via db.pool."""
+
+    def get(self, table: str, row_id: Any) -> Optional[Dict[str, Any]]:
+        return db.get_row(table, row_id)
+
+    def find(self, table: str, field: str, value: Any) -> List[Dict[str, Any]]:
+        return db.find_rows(table, field, value)
+
+    def first(self, table: str, field: str, value: Any) -> Optional[Dict[str, Any]]:
+        return db.first_row(table, field, value)
+
+    def all(self, table: str) -> List[Dict[str, Any]]:
+        return db.all_rows(table)
+
+    def load(self) -> None:
+        pass
+
+    def page(self, table, field=None, value=None, limit=None, after=None, fields=None):
+        return db.page_rows(table, field, value, limit=limit, after=after, fields=fields)
+
+    def list_with_pets(self, table: str) -> List[Dict[str, Any]]:
+        return db.list_with_pets(table)
+
+    def page_with_pets(self, table, limit=None, after=None, fields=None):
+        return db.page_with_pets(table, limit=limit, after=after, fields=fields)
+
+    def dashboard(self, today: str, until: str, limit: int = 50) -> Dict[str, Any]:
+        return {
+            "counts": db.dashboard_counts(today, until),
+            "appointments": db.upcoming_appointments(today, limit),
+            "vaccines": db.vaccines_due(today, until, limit),
+        }
+
+    def search_medical(self, text, pet_id=None, owner_id=None, limit=20, offset=0):
+        return db.search_medical(text, pet_id, owner_id, limit=limit, offset=offset)
+
+    def weight_series(self, pet_id: str) -> List[Dict[str, Any]]:
+        return db.weight_series(pet_id)
+
+    def weight_points(self):
+        return db.weight_points()
+
+    def vet_schedule(self, vet_id: str, day: str) -> List[Dict[str, Any]]:
+        return db.vet_schedule(vet_id, day)
+
+    def vaccine_reminders(self, start: str, until: str, limit: int = 1000) -> List[Dict[str, Any]]:
+        return db.vaccine_reminders(start, until, limit)
+
+    def vaccines_due_count(self, start: str, until: str) -> int:
+        return db.vaccines_due_count(start, until)
+
+    def insert(self, table: str, row: Dict[str, Any]) -> Dict[str, Any]:
+        conn = db.pool.get()
+        db.insert_row(table, row, conn=conn)
+        return db.get_row(table, row.get("id"), conn=conn)
+
+    def update(self, table: str, row_id: Any, changes: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        if not db.update_row(table, row_id, changes, conn=db.pool.get()):
+            return None
+        return db.get_row(table, row_id)
+
+    def delete(self, table: str, row_id: Any) -> bool:
+        return db.delete_row(table, row_id, conn=db.pool.get())
+
+    def apply_changes(self, changes: Dict[str, Set[Any]]) -> None:
+        """Nothing to do: every read goes to the database."""
+
+
+class CachedStore(SqliteStore):
+    """Write-through cache: SQLite stays authoritative, reads hit an EntityStore copy."""
+
+    def __init__(self):
+        self.cache = EntityStore()
+        # Own writes and change-log replays (apply_changes) both patch the copy
+        self._lock = threading.RLock()
+
+    def get(self, table: str, row_id: Any) -> Optional[Dict[str, Any]]:
+        return self.cache.get(table, row_id)
+
+    def find(self, table: str, field: str, value: Any) -> List[Dict[str, Any]]:
+        return self.cache.find(table, field, value)
+
+    def first(self, table: str, field: str, value: Any) -> Optional[Dict[str, Any]]:
+        return self.cache.first(table, field, value)
+
+    def all(self, table: str) -> List[Dict[str, Any]]:
+        return self.cache.all(table)
+
+    def load(self) -> None:
+        data = db.fetch_all(db.pool.get())
+        with self._lock:
+            self.cache.load(data)
+
+    def insert(self, table: str, row: Dict[str, Any]) -> Dict[str, Any]:
+        conn = db.pool.get()
+        db.insert_row(table, row, conn=conn)
+        # Cache what was stored (known columns, unknown owners nulled), not the request
+        saved = db.get_row(table, row.get("id"), conn=conn)
+        with self._lock:
+            if self.cache.get(table, saved["id"]) is not None:
+                # Already replayed from the change log by another thread
+                return self.cache.update(table, saved["id"], saved)
+            return self.cache.insert(table, saved)
+
+    def update(self, table: str, row_id: Any, changes: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        if self.cache.get(table, row_id) is None:
+            return None
+        conn = db.pool.get()
+        db.update_row(table, row_id, changes, conn=conn)
+        saved = db.get_row(table, row_id, conn=conn)
+        with self._lock:
+            if saved is None:
+                # Deleted by another worker in between
+                self.cache.delete(table, row_id)
+                return None
+            return self.cache.update(table, row_id, saved)
+
+    def delete(self, table: str, row_id: Any) -> bool:
+        if not super().delete(table, row_id):
+            return False
+        with self._lock:
+            self.cache.delete(table, row_id)
+        return True
+
+    def apply_changes(self, changes: Dict[str, Set[Any]]) -> None:
+        """Re-read rows named in the change log (parents first) and patch the copy."""
+        conn = db.pool.get()
+        for table in db.TABLE_COLUMNS:
+            ids = changes.get(table)
+            if not ids:
+                continue
+            fresh = db.get_rows(table, list(ids), conn=conn)
+            with self._lock:
+                rows = self.cache[table]
+                for row_id in ids:
+                    row = fresh.get(row_id)
+                    if row is None:
+                        rows.delete(row_id)
+                    elif rows.get(row_id) is None:
+                        rows.insert(row)
+                    else:
+                        rows.update(row_id, row)
+
+
+def open_store(kind: Optional[str] = None):
+    """PETMS_STORE=sqlite (default) reads from the DB; =memory keeps an indexed copy."""
+    kind = (kind or os.environ.get("PETMS_STORE", "sqlite")).strip().lower()
+    if kind == "memory":
+        return CachedStore()
+    return SqliteStore()
@@ -0,0 +1,128 @@
+"""Cross-process cache coherence for multi-worker deployments.
+
+SQLite is the only source of truth. Triggers (migrations 7-8) append
+(table, id) to change_log on every committed insert/update/delete that
+changes a row, from any process; bulk loads append a single reset marker
+instead (db.bulk_change_log). Each worker remembers the last seq it
+applied and, before serving a request, reads the rows past it and hands
+the changed ids to its caches (CachedStore copy, scheduler index,
+principal cache). On a reset marker, or if it fell too far behind or the
+rows it needs were pruned, it reloads everything instead.
+"""
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Set
+
+import db
+
+
+POLL_INTERVAL = float(os.environ.get("PETMS_SYNC_INTERVAL_MS", 0)) / 1000.0
+MAX_BATCH = int(os.environ.get("PETMS_SYNC_MAX_BATCH", 5000))
+KEEP = int(os.environ.get("PETMS_CHANGE_LOG_KEEP", 20000))
+PRUNE_EVERY = 60.0
+
+Changes = Dict[str, Set[Any]]
+
+
+class ChangeFeed:
+    """Follows change_log; subscribers get {table: {ids}} or a full-reset call."""
+
+    def __init__(self, interval: float = POLL_INTERVAL, max_batch: int = MAX_BATCH, keep: int = KEEP):
+        self.interval = interval
+        self.max_batch = max(1, max_batch)
+        self.keep = max(1, keep)
+        self.enabled = os.environ.get("PETMS_SYNC", "1") == "1"
+        self.last_seq: Optional[int] = None
+        self._lock = threading.Lock()
+        self._next_poll = 0.0
+        self._next_prune = 0.0
+        self._on_changes: List[Callable[[Changes], None]] = []
+        self._on_reset: List[Callable[[], None]] = []
+        # Counters
+        self.polls = 0
+        self.applied = 0
+        self.resets = 0
+
+    def subscribe(self, on_changes: Callable[[Changes], None], on_reset: Callable[[], None]) -> None:
+        self._on_changes.append(on_changes)
+        self._on_reset.append(on_reset)
+
+    def start(self, conn: Optional[sqlite3.Connection] = None) -> None:
+        """Begin following from the current end of the log (call before loading caches)."""
+        conn = conn or db.pool.get()
+        try:
+            self.last_seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM change_log").fetchone()[0]
+        except sqlite3.OperationalError:
+            # No change_log (database not migrated): nothing to follow
+            self.last_seq = None
+
+    def stop(self) -> None:
+        self.last_seq = None
+
+    def poll(self, conn: Optional[sqlite3.Connection] = None, force: bool = False) -> int:
+        """Apply changes committed since the last poll; returns how many log rows were read."""
+        if self.last_seq is None:
+            return 0
+        now = time.monotonic()
+        if not self.enabled:
+            # Nobody reads the log, but the triggers still fill it
+            self._maybe_prune(now, conn)
+            return 0
+        if not force and now < self._next_poll:
+            return 0
+        conn = conn or db.pool.get()
+        with self._lock:
+            self._next_poll = now + self.interval
+            rows = conn.execute(
+                "SELECT seq, tbl, rowId FROM change_log WHERE seq > ? ORDER BY seq LIMIT ?",
+                (self.last_seq, self.max_batch + 1),
+            ).fetchall()
+            self.polls += 1
+            if rows:
+                bulk = any(row["tbl"] == db.CHANGE_LOG_RESET for row in rows)
+                if rows[0]["seq"] != self.last_seq + 1 or len(rows) > self.max_batch or bulk:
+                    # Pruned past us, or a bulk write: rebuild rather than replay
+                    self.last_seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM change_log").fetchone()[0]
+                    self.resets += 1
+                    for reset in self._on_reset:
+                        reset()
+                else:
+                    changes: Changes = {}
+                    for row in rows:
+                        changes.setdefault(row["tbl"], set()).add(row["rowId"])
+                    self.last_seq = rows[-1]["seq"]
+                    self.applied += len(rows)
+                    for apply in self._on_changes:
+                        apply(changes)
+        self._maybe_prune(now, conn)
+        return len(rows)
+
+    def _maybe_prune(self, now: float, conn: Optional[sqlite3.Connection] = None) -> None:
+        if now >= self._next_prune:
+            self._next_prune = now + PRUNE_EVERY
+            self.prune(conn)
+
+    def prune(self, conn: Optional[sqlite3.Connection] = None) -> None:
+        """Drop all but the newest `keep` log rows."""
+        conn = conn or db.pool.get()
+        if conn.in_transaction:
+            return
+        try:
+            with conn:
+                conn.execute(
+                    "DELETE FROM change_log WHERE seq <= (SELECT MAX(seq) FROM change_log) - ?", (self.keep,)
+                )
+        except sqlite3.OperationalError as e:
+            # Busy: another worker is writing; try again next round
+            print(f"Error pruning change log: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled and self.last_seq is not None,
+            "last_seq": self.last_seq,
+            "polls": self.polls,
+            "applied": self.applied,
+            "resets": self.resets,
+        }
@@ -0,0 +1,185 @@
+import re
+import threading
+from typing import Dict, FrozenSet, List
+
+
+# Symptom flag -> keywords (substring match, same lists the fallback rules used)
+FLAG_KEYWORDS: Dict[str, List[str]] = {
+    "lethargy": ["letharg", "tired"],
+    "anorexia": ["no appetite", "not eating", "reduced appetite", "anorex"],
+    "gi": ["vomit", "diarr", "stool", "poop", "constipat"],
+    "resp": ["cough", "sneez", "wheeze", "breath", "runny nose", "nasal"],
+    "pain": ["pain", "aggress", "hunch", "limp", "sore", "guard"],
+    "blood": ["bleed", "blood"],
+    "paw": ["paw", "pad", "nail", "claw", "dewclaw", "toe"],
+    "limb": ["foot", "leg"],
+    "wound": ["cut", "wound", "tear", "lacer", "broken", "rip"],
+    "lameness": ["limp", "non weight", "non-weight", "not weight", "not pressing", "holding up", "favoring", "not putting weight"],
+    # Bleeding that is not a paw injury even when a leg or paw is mentioned
+    "urinary": ["urin", "peeing", "bladder", "litter box", "straining"],
+    "mass": ["tumor", "tumour", "mass", "lump", "growth", "cancer", "cyst"],
+    # Triage categories
+    "cat_trauma": ["bleed", "blood", "cut", "wound", "lacer", "nail", "claw", "paw", "pad", "limp", "non weight", "not pressing", "holding up"],
+    "cat_gi": ["vomit", "diarr", "stool", "poop", "constipat", "nausea"],
+    "cat_resp": ["cough", "sneez", "wheeze", "breath", "nasal", "runny nose"],
+    "cat_derm": ["itch", "rash", "skin", "flea", "hot spot", "wound"],
+    "cat_neuro": ["seizure", "collapse", "stagger", "head tilt"],
+}
+
+# Category order matters: first match wins
+CATEGORIES = [
+    ("cat_trauma", "wound/trauma"),
+    ("cat_gi", "gastrointestinal"),
+    ("cat_resp", "respiratory"),
+    ("cat_derm", "dermatologic"),
+    ("cat_neuro", "neurologic"),
+]
+
+SPECIES_KEYWORDS = [
+    ("small_mammal", ["hamster", "guinea", "rabbit", "gerbil", "rat", "mouse", "chinch"]),
+    ("bird", ["parrot", "budg", "cockatiel", "finch", "bird"]),
+    ("reptile", ["turtle", "tortoise", "snake", "lizard", "gecko", "dragon"]),
+    ("dogcat", ["dog", "cat", "canine", "feline"]),
+]
+SPECIES_EXACT = {
+    "small_mammal": {"hamster", "guinea pig", "guinea-pig", "rabbit", "bunny", "gerbil", "rat", "mouse", "mice", "chinchilla"},
+    "bird": {"bird", "parrot", "budgie", "budgerigar", "cockatiel", "finch"},
+    "reptile": {"reptile", "turtle", "tortoise", "snake", "lizard", "gecko", "bearded dragon"},
+}
+
+
+class KeywordAutomaton:
+    """All keywords in one compiled regex, matched in a single pass.
+
+    A zero-width lookahead at every position finds the longest keyword starting
+    there, so overlapping occurrences are all seen. Each keyword carries the
+    flags of every keyword it contains, which makes the result identical to
+    running `k in text` for each keyword separately.
+    """
+
+    def __init__(self, keyword_flags: Dict[str, List[str]]):
+        kw_to_flags: Dict[str, set] = {}
+        for flag, words in keyword_flags.items():
+            for w in words:
+                kw_to_flags.setdefault(w, set()).add(flag)
+        self.flags_for: Dict[str, FrozenSet[str]] = {}
+        for kw in kw_to_flags:
+            flags = set()
+            for other, other_flags in kw_to_flags.items():
+                if other in kw:
+                    flags |= other_flags
+            self.flags_for[kw] = frozenset(flags)
+        alternation = "|".join(re.escape(k) for k in sorted(kw_to_flags, key=len, reverse=True))
+        self.pattern = re.compile(f"(?=({alternation}))")
+
+    def scan(self, text: str) -> FrozenSet[str]:
+        found = set()
+        for m in self.pattern.finditer(text):
+            found |= self.flags_for[m.group(1)]
+        return frozenset(found)
+
+
+SYMPTOMS = KeywordAutomaton(FLAG_KEYWORDS)
+
+# Body sites whose bleeding the paw rules must not claim (whole words: "ear" is in "tear")
+OTHER_SITES = {"ear", "ears", "eye", "eyes", "nose", "mouth", "gum", "gums", "anus", "rectum", "vulva", "penis"}
+# Max words between a blood word and a paw/limb word for them to describe one injury
+NEAR_WORDS = 5
+WORD = re.compile(r"[a-z]+")
+SPECIES = KeywordAutomaton({grp: words for grp, words in SPECIES_KEYWORDS})
+
+
+def species_group(name: str) -> str:
+    s = (name or "").strip().lower()
+    hits = SPECIES.scan(s)
+    for grp, _ in SPECIES_KEYWORDS:
+        if s in SPECIES_EXACT.get(grp, ()) or grp in hits:
+            return grp
+    return "other"
+
+
+def symptom_flags(symptoms: str) -> FrozenSet[str]:
+    return SYMPTOMS.scan((symptoms or "").lower())
+
+
+def triage_category(flags: FrozenSet[str]) -> str:
+    for flag, name in CATEGORIES:
+        if flag in flags:
+            return name
+    return "general"
+
+
+def _near(words: List[str], first: List[str], second: List[str], window: int = NEAR_WORDS) -> bool:
+    """True if a word containing a `first` keyword is within `window` words of a `second` one."""
+    a = [i for i, w in enumerate(words) if any(k in w for k in first)]
+    b = [i for i, w in enumerate(words) if any(k in w for k in second)]
+    return any(abs(i - j) <= window for i in a for j in b)
+
+
+def assess(species: str, symptoms: str) -> Dict:
+    """One-pass rule assessment with a confidence score in [0, 1].
+
+    Only unambiguous patterns (e.g. a bleeding paw in a dog/cat) score high
+    enough to answer without the LLM.
+    """
+    grp = species_group(species)
+    text = (symptoms or "").lower()
+    flags = SYMPTOMS.scan(text)
+    category = triage_category(flags)
+
+    words = WORD.findall(text)
+    # Blood next to the paw/leg, and not urinary, a mass or another body site
+    bleeding = (
+        "blood" in flags
+        and ("paw" in flags or "limb" in flags)
+        and _near(words, FLAG_KEYWORDS["blood"], FLAG_KEYWORDS["paw"] + FLAG_KEYWORDS["limb"])
+        and not {"urinary", "mass"} & flags
+        and not OTHER_SITES.intersection(words)
+    )
+    paw_wound = "paw" in flags and "wound" in flags
+    lameness = "lameness" in flags
+    other_systems = len({"cat_gi", "cat_resp", "cat_neuro"} & flags)
+
+    if grp == "dogcat" and bleeding and (paw_wound or lameness) and not other_systems:
+        confidence, rule = 0.95, "paw_bleeding_trauma"
+    elif grp == "dogcat" and bleeding and not other_systems:
+        # Below the default VET_QA_FASTPATH_MIN (0.9): blood near a paw alone still goes to the LLM
+        confidence, rule = 0.8, "paw_bleeding"
+    elif grp == "dogcat" and paw_wound and lameness and not other_systems:
+        confidence, rule = 0.85, "paw_wound_lameness"
+    else:
+        n_cats = sum(1 for flag, _ in CATEGORIES if flag in flags)
+        confidence = 0.6 if n_cats == 1 else (0.4 if n_cats else 0.2)
+        rule = None
+
+    return {
+        "group": grp,
+        "flags": sorted(flags),
+        "category": category,
+        "confidence": confidence,
+        "rule": rule,
+    }
+
+
+class FastPathStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.evaluated = 0
+        self.absorbed = 0
+        self.by_rule: Dict[str, int] = {}
+
+    def record(self, absorbed: bool, rule=None) -> None:
+        with self._lock:
+            self.evaluated += 1
+            if absorbed:
+                self.absorbed += 1
+                self.by_rule[rule] = self.by_rule.get(rule, 0) + 1
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "evaluated": self.evaluated,
+                "absorbed": self.absorbed,
+                "absorbed_ratio": (self.absorbed / self.evaluated) if self.evaluated else 0.0,
+                "by_rule": dict(self.by_rule),
+            }
@@ -0,0 +1,142 @@
+import os
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+
+DAYS_PER_MONTH = 30.4375
+# Losing at least this % of body weight per month counts as rapid loss
+RAPID_LOSS_PCT = float(os.environ.get("PETMS_RAPID_LOSS_PCT", 5))
+# Trends over shorter spans than this are too noisy to flag
+MIN_SPAN_DAYS = float(os.environ.get("PETMS_RAPID_LOSS_MIN_DAYS", 7))
+
+
+def _point(d: Any, w: Any) -> Optional[Tuple[int, float]]:
+    """(days since epoch, kg), or None if either value is unusable."""
+    try:
+        day = np.datetime64(str(d)[:10], "D")
+        value = float(w)
+    except (TypeError, ValueError):
+        return None
+    if np.isnat(day) or not np.isfinite(value):
+        return None
+    return int(day.astype(np.int64)), value
+
+
+def to_arrays(points: Iterable[Tuple[Any, Any]]) -> Tuple[np.ndarray, np.ndarray]:
+    """(date, weight) pairs -> (days since epoch, kg) sorted by date; unparseable pairs dropped."""
+    days, kg = [], []
+    for d, w in points:
+        p = _point(d, w)
+        if p is not None:
+            days.append(p[0])
+            kg.append(p[1])
+    x = np.asarray(days, dtype=np.float64)
+    y = np.asarray(kg, dtype=np.float64)
+    order = np.argsort(x, kind="stable")
+    return x[order], y[order]
+
+
+def rolling_mean(y: np.ndarray, window: int) -> np.ndarray:
+    """Trailing mean over `window` points (shorter at the start)."""
+    if y.size == 0:
+        return y
+    c = np.cumsum(np.insert(y, 0, 0.0))
+    idx = np.arange(1, y.size + 1)
+    lo = np.maximum(idx - window, 0)
+    return (c[idx] - c[lo]) / (idx - lo)
+
+
+def _slope(x: np.ndarray, y: np.ndarray) -> float:
+    """Least-squares kg/day (0 for fewer than two distinct days)."""
+    dx = x - x.mean()
+    denom = float(dx @ dx)
+    return float(dx @ (y - y.mean()) / denom) if denom else 0.0
+
+
+def analyze(points: Iterable[Tuple[Any, Any]], window: int = 3, z_threshold: float = 2.5) -> Dict[str, Any]:
+    """Trend summary of one pet's (date, weight) series.
+
+    Anomalies are points whose residual from the linear trend has |z| above
+    `z_threshold`.
+    """
+    x, y = to_arrays(points)
+    n = int(y.size)
+    if n == 0:
+        return {"points": 0}
+    slope = _slope(x, y)
+    resid = y - (y.mean() + slope * (x - x.mean()))
+    sd = resid.std()
+    z = resid / sd if sd > 0 else np.zeros_like(resid)
+    dates = x.astype("datetime64[D]").astype(str)
+    span = float(x[-1] - x[0])
+    slope_month = slope * DAYS_PER_MONTH
+    rate = slope_month / y.mean() * 100 if y.mean() else 0.0
+    return {
+        "points": n,
+        "first": {"date": str(dates[0]), "weight": float(y[0])},
+        "last": {"date": str(dates[-1]), "weight": float(y[-1])},
+        "spanDays": span,
+        "slopeKgPerMonth": float(slope_month),
+        "ratePctPerMonth": float(rate),
+        "pctChange": float((y[-1] - y[0]) / y[0] * 100) if y[0] else None,
+        "rapidLoss": bool(n >= 2 and span >= MIN_SPAN_DAYS and rate <= -RAPID_LOSS_PCT),
+        "series": [
+            {"date": str(d), "weight": float(w), "rollingMean": float(m), "z": float(s)}
+            for d, w, m, s in zip(dates, y, rolling_mean(y, max(1, window)), z)
+        ],
+        "anomalies": [str(d) for d in dates[np.abs(z) > z_threshold]],
+    }
+
+
+def score_all(points: Iterable[Tuple[Any, Any, Any]]) -> List[Dict[str, Any]]:
+    """Trend per pet for (petId, date, weight) rows, all pets in one vectorised pass.
+
+    Per-pet sums come from np.add.reduceat over the (pet, date)-sorted arrays,
+    so the cost is one sort plus O(n) however many pets there are.
+    """
+    pets, days, kg = [], [], []
+    for pet_id, d, w in points:
+        p = _point(d, w)
+        if p is not None:
+            pets.append(pet_id)
+            days.append(p[0])
+            kg.append(p[1])
+    if not pets:
+        return []
+    ids, group = np.unique(np.asarray(pets, dtype=object), return_inverse=True)
+    x = np.asarray(days, dtype=np.float64)
+    y = np.asarray(kg, dtype=np.float64)
+    order = np.lexsort((x, group))
+    g, x, y = group[order], x[order], y[order]
+    starts = np.flatnonzero(np.r_[True, g[1:] != g[:-1]])
+    ends = np.r_[starts[1:], g.size] - 1
+
+    n = np.diff(np.r_[starts, g.size]).astype(np.float64)
+    # Centre x per pet so the sums stay well conditioned
+    x = x - x[starts].repeat(n.astype(np.int64))
+    sx, sy = np.add.reduceat(x, starts), np.add.reduceat(y, starts)
+    sxx, sxy = np.add.reduceat(x * x, starts), np.add.reduceat(x * y, starts)
+    denom = n * sxx - sx * sx
+    with np.errstate(divide="ignore", invalid="ignore"):
+        slope = np.where(denom > 0, (n * sxy - sx * sy) / denom, 0.0)
+        mean = sy / n
+        slope_month = slope * DAYS_PER_MONTH
+        rate = np.where(mean != 0, slope_month / mean * 100, 0.0)
+        pct = np.where(y[starts] != 0, (y[ends] - y[starts]) / y[starts] * 100, np.nan)
+    span = x[ends]
+    rapid = (n >= 2) & (span >= MIN_SPAN_DAYS) & (rate <= -RAPID_LOSS_PCT)
+
+    out = []
+    for i, pet_id in enumerate(ids[g[starts]]):
+        out.append({
+            "petId": pet_id,
+            "points": int(n[i]),
+            "spanDays": float(span[i]),
+            "lastWeight": float(y[ends[i]]),
+            "slopeKgPerMonth": float(slope_month[i]),
+            "ratePctPerMonth": float(rate[i]),
+            "pctChange": None if np.isnan(pct[i]) else float(pct[i]),
+            "rapidLoss": bool(rapid[i]),
+        })
+    return out
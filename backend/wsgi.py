@@ -0,0 +1,16 @@
+"""WSGI entry point: gunicorn -c gunicorn.conf.py wsgi:app (from backend/).
+
+Each worker imports this and warms up its own data access and classifier.
+SQLite is the single source of truth; workers keep their caches in step
+through the change log (see sync.py).
+"""
+import os
+import sys
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from app import create_app
+
+app = application = create_app()
@@ -531,32 +531,13 @@ function updateDashboard() {
 }
 
 function fetchStats(pets) {
-    let appointmentCount = 0;
-    let vaccineCount = 0;
-    const today = new Date();
-    const nextMonth = new Date();
-    nextMonth.setDate(today.getDate() + 30);
-
-    const promises = pets.map(p => {
-        const p1 = fetch(`http://127.0.0.1:5000/appointment/${p.id}`).then(r => r.json()).then(apps => {
-            apps.forEach(a => {
-                const d = new Date(a.date);
-                if (d >= today) appointmentCount++;
-            });
-        });
-        const p2 = fetch(`http://127.0.0.1:5000/vaccine/${p.id}`).then(r => r.json()).then(vacs => {
-            vacs.forEach(v => {
-                const d = new Date(v.nextDue);
-                if (d >= today && d <= nextMonth) vaccineCount++;
-            });
+    // One aggregate request instead of two per pet
+    fetch("http://127.0.0.1:5000/dashboard/summary?days=30")
+        .then(r => r.json())
+        .then(data => {
+            document.getElementById("dashAppointments").textContent = data.counts.upcomingAppointments;
+            document.getElementById("dashVaccines").textContent = data.counts.vaccinesDue;
         });
-        return Promise.all([p1, p2]);
-    });
-
-    Promise.all(promises).then(() => {
-        document.getElementById("dashAppointments").textContent = appointmentCount;
-        document.getElementById("dashVaccines").textContent = vaccineCount;
-    });
 }
 
 
@@ -674,48 +655,51 @@ async function aiDiagnoseLLM() {
 
     loading.style.display = 'inline';
     try {
-        const res = await fetch('http://127.0.0.1:5000/ai/diagnose_llm', {
+        const res = await fetch('http://127.0.0.1:5000/ai/diagnose_llm/stream', {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
             body: JSON.stringify({ species, age, symptoms, mode })
         });
-        const data = await res.json();
         if (!res.ok) {
-            throw new Error(data?.error || 'Request failed');
+            const err = await res.json().catch(() => ({}));
+            throw new Error(err?.error || 'Request failed');
         }
-        // Prefer structured
-        const hasConds = Array.isArray(data.conditions) && data.conditions.length > 0;
-        const hasFlags = Array.isArray(data.red_flags) && data.red_flags.length > 0;
-        const hasCare  = Array.isArray(data.care) && data.care.length > 0;
-
-        if (hasConds || hasFlags || hasCare) {
-            const lines = [];
-            if (hasConds) {
-                lines.push('Likely conditions:');
-                data.conditions.forEach(c => {
-                    const nm = (c && c.name) ? c.name : '';
-                    const rs = (c && c.reason) ? c.reason : '';
-                    lines.push(`- ${nm}${rs ? ' — ' + rs : ''}`);
+
+        // Read SSE events
+        const reader = res.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let streamed = '';
+        let data = null;
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            let sep;
+            while ((sep = buffer.indexOf('\n\n')) !== -1) {
+                const block = buffer.slice(0, sep);
+                buffer = buffer.slice(sep + 2);
+                let event = 'message';
+                let payload = '';
+                block.split('\n').forEach(line => {
+                    if (line.startsWith('event: ')) event = line.slice(7);
+                    else if (line.startsWith('data: ')) payload += line.slice(6);
                 });
+                const msg = payload ? JSON.parse(payload) : {};
+                if (event === 'token') {
+                    streamed += msg.text || '';
+                    out.textContent = streamed;
+                } else if (event === 'result') {
+                    data = msg;
+                } else if (event === 'error') {
+                    throw new Error(msg.error || 'Generation failed');
+                }
             }
-            if (hasFlags) {
-                lines.push('\nRed flags:');
-                data.red_flags.forEach(x => lines.push(`- ${x}`));
-            }
-            if (hasCare) {
-                lines.push('\nSupportive care:');
-                data.care.forEach(x => lines.push(`- ${x}`));
-            }
-            out.textContent = lines.join('\n');
-        } else {
-            // Use raw text
-            out.textContent = data.answer || data.raw || '(No answer)';
         }
-        disc.textContent = data.disclaimer || '';
-        if (srcEl) {
-            const src = (data.source === 'fallback') ? 'Assisted (fallback used)' : 'LLM';
-            srcEl.textContent = `Source: ${src}`;
+        if (!data) {
+            throw new Error('No result received');
         }
+        renderLLMResult(data, out, disc, srcEl);
     } catch (e) {
         out.textContent = `Error: ${e.message}`;
     } finally {
@@ -723,7 +707,50 @@ async function aiDiagnoseLLM() {
     }
 }
 
+function renderLLMResult(data, out, disc, srcEl) {
+    // Prefer structured
+    const hasConds = Array.isArray(data.conditions) && data.conditions.length > 0;
+    const hasFlags = Array.isArray(data.red_flags) && data.red_flags.length > 0;
+    const hasCare  = Array.isArray(data.care) && data.care.length > 0;
+
+    if (hasConds || hasFlags || hasCare) {
+        const lines = [];
+        if (hasConds) {
+            lines.push('Likely conditions:');
+            data.conditions.forEach(c => {
+                const nm = (c && c.name) ? c.name : '';
+                const rs = (c && c.reason) ? c.reason : '';
+                lines.push(`- ${nm}${rs ? ' — ' + rs : ''}`);
+            });
+        }
+        if (hasFlags) {
+            lines.push('\nRed flags:');
+            data.red_flags.forEach(x => lines.push(`- ${x}`));
+        }
+        if (hasCare) {
+            lines.push('\nSupportive care:');
+            data.care.forEach(x => lines.push(`- ${x}`));
+        }
+        out.textContent = lines.join('\n');
+    } else {
+        // Use raw text
+        out.textContent = data.answer || data.raw || '(No answer)';
+    }
+    disc.textContent = data.disclaimer || '';
+    if (srcEl) {
+        const src = (data.source === 'fallback') ? 'Assisted (fallback used)'
+            : (data.source === 'rules') ? 'Rule engine (high-confidence case)' : 'LLM';
+        srcEl.textContent = `Source: ${src}`;
+    }
+}
+
 // Photo upload
+
+// List views load the server-side thumbnail of uploaded photos
+function thumbSrc(url) {
+    if (url && url.includes("/uploads/") && !url.includes("/uploads/thumb/")) return url.replace("/uploads/", "/uploads/thumb/");
+    return url;
+}
 const petPhotoFile = document.getElementById("petPhotoFile");
 if (petPhotoFile) {
     petPhotoFile.addEventListener("change", function () {
@@ -795,7 +822,7 @@ function loadPets() {
             data.forEach(p => {
                 list.innerHTML += `
                 <div class="pet-card">
-                    <img src="${p.photo}" onerror="this.src='https://via.placeholder.com/150'" onclick="openPetDetail('${p.id}')">
+                    <img src="${thumbSrc(p.photo)}" loading="lazy" onerror="this.src='https://via.placeholder.com/150'" onclick="openPetDetail('${p.id}')">
                     <h3 onclick="openPetDetail('${p.id}')">${p.name}</h3>
                     <p>${p.type} — Age: ${p.age}</p>
                     <p>Owner: ${p.ownerId}</p>
@@ -879,10 +906,9 @@ function ensurePets(callback) {
 
 function loadMedical() {
     return new Promise((resolve) => {
-        ensurePets((pets) => {
-            let promises = pets.map(p => fetch(`http://127.0.0.1:5000/medical/${p.id}`).then(r => r.json()));
-            Promise.all(promises).then(results => {
-                medicalCache = results.flat();
+        ensurePets(() => {
+            fetch("http://127.0.0.1:5000/records/medical").then(r => r.json()).then(list => {
+                medicalCache = list;
                 renderMedical(medicalCache);
                 resolve(medicalCache);
             });
@@ -913,10 +939,9 @@ function renderMedical(list) {
 
 function loadVaccines() {
     return new Promise((resolve) => {
-        ensurePets((pets) => {
-            let promises = pets.map(p => fetch(`http://127.0.0.1:5000/vaccine/${p.id}`).then(r => r.json()));
-            Promise.all(promises).then(results => {
-                vaccineCache = results.flat();
+        ensurePets(() => {
+            fetch("http://127.0.0.1:5000/records/vaccine").then(r => r.json()).then(list => {
+                vaccineCache = list;
                 renderVaccines(vaccineCache);
                 resolve(vaccineCache);
             });
@@ -945,10 +970,9 @@ function renderVaccines(list) {
 
 function loadWeight() {
     return new Promise((resolve) => {
-        ensurePets((pets) => {
-            let promises = pets.map(p => fetch(`http://127.0.0.1:5000/weight/${p.id}`).then(r => r.json()));
-            Promise.all(promises).then(results => {
-                weightCache = results.flat();
+        ensurePets(() => {
+            fetch("http://127.0.0.1:5000/records/weight").then(r => r.json()).then(list => {
+                weightCache = list;
                 renderWeight(weightCache);
                 updateWeightChart(weightCache);
                 resolve(weightCache);
@@ -980,10 +1004,9 @@ function renderWeight(list) {
 
 function loadAppointments() {
     return new Promise((resolve) => {
-        ensurePets((pets) => {
-            let promises = pets.map(p => fetch(`http://127.0.0.1:5000/appointment/${p.id}`).then(r => r.json()));
-            Promise.all(promises).then(results => {
-                appointmentCache = results.flat();
+        ensurePets(() => {
+            fetch("http://127.0.0.1:5000/records/appointment").then(r => r.json()).then(list => {
+                appointmentCache = list;
                 renderAppointments(appointmentCache);
                 resolve(appointmentCache);
             });
@@ -1172,6 +1195,10 @@ function addAppointment() {
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify(data)
     })
+        .then(r => r.json().then(res => {
+            if (r.status === 409) alert(`${res.error} (${res.conflict.time}, ${res.conflict.duration} min)`);
+            else if (!r.ok) alert(res.error || "Could not add appointment");
+        }))
         .then(() => loadAppointments());
 }
 
@@ -1187,7 +1214,7 @@ function getOwnerPets() {
             list.forEach(p => {
                 container.innerHTML += `
                 <div class="pet-card">
-                    <img src="${p.photo}" onerror="this.src='https://via.placeholder.com/150'">
+                    <img src="${thumbSrc(p.photo)}" loading="lazy" onerror="this.src='https://via.placeholder.com/150'">
                     <h3>${p.name}</h3>
                     <p>${p.type}</p>
                     <p>Age: ${p.age}</p>